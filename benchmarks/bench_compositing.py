@@ -0,0 +1,103 @@
+"""
+Benchmark: สร้างภาพรวม + Mask ของ Virtual Studio (ต่อ 1 รูป)
+- legacy: Loop getpixel/putpixel ทีละ Pixel (โค้ดเดิมใน VirtualStudioTab)
+- vectorized: src.logic.compositing (PIL channel ops)
+
+รัน: python benchmarks/bench_compositing.py [--sizes 512 1024 2048] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.logic.compositing import compose_product  # noqa: E402
+
+
+def make_product(size):
+    """สินค้าจำลอง: วงรีสีมีขอบนุ่ม (เหมือนผลจาก rembg)"""
+    w, h = size
+    alpha = Image.new("L", size, 0)
+    ImageDraw.Draw(alpha).ellipse((w * 0.1, h * 0.05, w * 0.9, h * 0.95), fill=255)
+    alpha = alpha.filter(ImageFilter.GaussianBlur(max(1, w // 200)))
+    product = Image.new("RGBA", size, (200, 80, 40, 0))
+    product.putalpha(alpha)
+    return product
+
+
+def legacy_compose(product, background, scale, position):
+    """สำเนาของ Logic เดิม (ก่อน Vectorize) ไว้เทียบเวลาและผลลัพธ์"""
+    img_pil = product.convert("RGBA")
+    canvas_size = background.size
+    target_w = int(canvas_size[0] * scale)
+    target_h = int(canvas_size[1] * scale)
+    img_pil.thumbnail((target_w, target_h), Image.Resampling.LANCZOS)
+
+    pw, ph = img_pil.size
+    cw, ch = canvas_size
+    x, y = (cw - pw) // 2, (ch - ph) // 2
+    if position == "bottom":
+        y = ch - ph - 50
+
+    final_comp = background.copy()
+    final_comp.paste(img_pil, (x, y), img_pil)
+
+    mask = Image.new("L", canvas_size, 255)
+    product_mask = Image.new("L", img_pil.size, 0)
+    for px in range(img_pil.width):
+        for py in range(img_pil.height):
+            if img_pil.getpixel((px, py))[3] > 0:
+                product_mask.putpixel((px, py), 0)
+            else:
+                product_mask.putpixel((px, py), 255)
+    mask.paste(product_mask, (x, y), img_pil)
+    return final_comp, mask
+
+
+def best_of(repeat, fn, *args):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=0.8)
+    args = parser.parse_args()
+
+    print(
+        f"{'canvas':>8} {'legacy (s)':>12} {'vectorized (s)':>15} "
+        f"{'speedup':>9}  same"
+    )
+    for size in args.sizes:
+        canvas = (size, size)
+        product = make_product(canvas)
+        background = Image.new("RGB", canvas, (255, 255, 255))
+
+        legacy_t, (legacy_comp, legacy_mask) = best_of(
+            args.repeat, legacy_compose, product, background, args.scale, "center"
+        )
+        new_t, (new_comp, new_mask) = best_of(
+            args.repeat, compose_product, product, background, args.scale, "center"
+        )
+        same = (
+            ImageChops.difference(legacy_mask, new_mask).getbbox() is None
+            and ImageChops.difference(legacy_comp, new_comp).getbbox() is None
+        )
+        print(
+            f"{size:>8} {legacy_t:>12.3f} {new_t:>15.4f} "
+            f"{legacy_t / new_t:>8.0f}x  {same}"
+        )
+
+
+if __name__ == "__main__":
+    main()
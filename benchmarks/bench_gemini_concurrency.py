@@ -0,0 +1,128 @@
+"""
+Benchmark: สร้างรูปหลาย Prompt พร้อมกันผ่าน GeminiImageProvider กับ Stub Server ในเครื่อง
+- sync: เรียก client.models.generate_content (Sync) ใน asyncio.gather แบบโค้ดเดิม
+  -> บล็อก Event Loop ทำให้รันทีละ Prompt
+- async: GeminiImageProvider.generate_image (client.aio + Semaphore ต่อโมเดล)
+
+Stub ตอบ generateContent ด้วยรูป PNG 1x1 หลังหน่วงเวลา --delay วินาที
+ผลที่คาดหวัง: async ~ delay, sync ~ delay x จำนวน Prompt
+
+รัน: python benchmarks/bench_gemini_concurrency.py [--prompts 10] [--delay 1.0]
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from google import genai
+from google.genai import types
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.logic.image_providers.gemini_image import GeminiImageProvider  # noqa: E402
+
+MODEL = "gemini-2.5-flash-image"
+
+
+def make_stub_handler(delay):
+    buffer = io.BytesIO()
+    Image.new("RGB", (1, 1), (255, 0, 0)).save(buffer, format="PNG")
+    body = json.dumps(
+        {
+            "candidates": [
+                {
+                    "content": {
+                        "role": "model",
+                        "parts": [
+                            {
+                                "inlineData": {
+                                    "mimeType": "image/png",
+                                    "data": base64.b64encode(
+                                        buffer.getvalue()
+                                    ).decode(),
+                                }
+                            }
+                        ],
+                    }
+                }
+            ]
+        }
+    ).encode()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+def make_provider(base_url):
+    provider = GeminiImageProvider()
+    provider.api_key = "stub"
+    provider.client = genai.Client(
+        api_key="stub", http_options=types.HttpOptions(base_url=base_url)
+    )
+    return provider
+
+
+async def run_sync(provider, prompts):
+    """แบบเดิม: async def ที่เรียก SDK แบบ Sync ข้างใน"""
+
+    async def one(prompt):
+        response = provider.client.models.generate_content(
+            model=MODEL, contents=[prompt]
+        )
+        return response.candidates[0].content.parts[0].inline_data.data
+
+    return await asyncio.gather(*(one(p) for p in prompts))
+
+
+async def run_async(provider, prompts):
+    return await asyncio.gather(
+        *(provider.generate_image(prompt=p, model=MODEL) for p in prompts)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prompts", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_stub_handler(args.delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    provider = make_provider(base_url)
+    prompts = [f"product shot {i}" for i in range(args.prompts)]
+
+    for name, runner in (("sync", run_sync), ("async", run_async)):
+        start = time.perf_counter()
+        results = asyncio.run(runner(provider, prompts))
+        elapsed = time.perf_counter() - start
+        ok = sum(isinstance(r, bytes) for r in results)
+        print(f"{name:<6} {elapsed:>6.2f}s  ({ok}/{len(prompts)} images)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
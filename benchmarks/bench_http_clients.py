@@ -0,0 +1,104 @@
+"""
+Benchmark: Latency ของ Request ไปยัง Mock Server ในเครื่อง
+- per-call: สร้าง httpx.AsyncClient ใหม่ทุก Request (โค้ดเดิมของ Ollama / Pollinations)
+- shared: Client จาก src.core.http_clients (Keep-Alive, ใช้ Connection ซ้ำ)
+
+Mock Server ตอบ JSON สั้นๆ แบบ HTTP/1.1 Keep-Alive (หน่วง --delay วินาที)
+รัน: python benchmarks/bench_http_clients.py [--requests 200] [--concurrency 8]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.http_clients import get_http_client, get_http_clients  # noqa: E402
+
+
+def make_handler(delay):
+    body = json.dumps({"response": "ok"}).encode()
+
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if delay:
+                time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return MockHandler
+
+
+async def per_call(url, payload):
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        response = await client.post(url, json=payload)
+    return response.status_code
+
+
+async def shared(url, payload):
+    response = await get_http_client("ollama").post(url, json=payload)
+    return response.status_code
+
+
+async def run(fn, url, total, concurrency):
+    payload = {"model": "bench", "prompt": "hello", "stream": False}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            status = await fn(url, payload)
+            latencies.append(time.perf_counter() - start)
+            return status
+
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    await get_http_clients().aclose()
+    return elapsed, latencies, statuses.count(200)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/generate"
+
+    print(f"{'client':<9} {'total (s)':>9} {'p50 (ms)':>9} {'p95 (ms)':>9}  ok")
+    for name, fn in (("per-call", per_call), ("shared", shared)):
+        elapsed, latencies, ok = asyncio.run(
+            run(fn, url, args.requests, args.concurrency)
+        )
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+        print(f"{name:<9} {elapsed:>9.2f} {p50:>9.2f} {p95:>9.2f}  {ok}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
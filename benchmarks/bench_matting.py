@@ -0,0 +1,97 @@
+"""
+Benchmark: ตัดพื้นหลังสินค้า 1 รูปของ Virtual Studio
+- full: ย่อไม่เกิน 1500px -> PNG -> rembg.remove -> ย่อให้พอดี Canvas (โหมดเดิม)
+- fast: ย่อเป็นขนาด Input ของโมเดล -> predict Mask -> Guided Upsample
+  -> ใส่ alpha ให้ Pixel ต้นฉบับที่ขนาดบน Canvas
+วัดเวลา (ไม่ใช้ Cache) และ IoU ของ Mask (alpha > 127) เทียบกับโหมดเดิม
+
+ต้องติดตั้ง rembg + onnxruntime และจะโหลดโมเดลครั้งแรกจากอินเทอร์เน็ต
+รัน: python benchmarks/bench_matting.py photo1.jpg photo2.jpg [--tier standard]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+from PIL import Image
+from rembg import remove
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.config import SEGMENTATION_TIERS  # noqa: E402
+from src.logic.compositing import CANVAS_SIZE  # noqa: E402
+from src.logic.matting import apply_alpha, guided_upsample, mask_iou  # noqa: E402
+from src.logic.segmentation_service import (  # noqa: E402
+    SegmentationService,
+    input_size_for_tier,
+)
+
+MAX_INPUT_SIDE = 1500
+# วัดใน Process เดียว (ไม่ผ่าน Worker Pool ของแอพ) -> Session เดียวพอ
+service = SegmentationService(pool_size=1)
+
+
+def full_path(input_bytes, target, tier):
+    img = Image.open(io.BytesIO(input_bytes))
+    img.thumbnail((MAX_INPUT_SIDE, MAX_INPUT_SIDE))
+    buffered = io.BytesIO()
+    img.save(buffered, format="PNG")
+    with service.borrow(tier) as session:
+        cutout = remove(buffered.getvalue(), session=session)
+    product = Image.open(io.BytesIO(cutout)).convert("RGBA")
+    product.thumbnail(target, Image.Resampling.LANCZOS)
+    return product
+
+
+def fast_path(input_bytes, target, tier):
+    img = Image.open(io.BytesIO(input_bytes))
+    img.draft("RGB", target)
+    working = img.convert("RGB")
+    working.thumbnail(target, Image.Resampling.LANCZOS)
+    size = input_size_for_tier(tier)
+    model_input = working.resize((size, size), Image.Resampling.LANCZOS)
+    low_mask = service.predict_mask(model_input, tier)
+    return apply_alpha(working, guided_upsample(low_mask, working))
+
+
+def best_of(repeat, fn, *args):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--tier", default="standard", choices=SEGMENTATION_TIERS)
+    parser.add_argument("--scale", type=float, default=0.8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    target = (int(CANVAS_SIZE[0] * args.scale), int(CANVAS_SIZE[1] * args.scale))
+    service.warm_up(args.tier)
+
+    print(f"{'image':<30} {'full (s)':>9} {'fast (s)':>9} {'speedup':>8} {'IoU':>7}")
+    for path in args.images:
+        with open(path, "rb") as f:
+            input_bytes = f.read()
+        job = (input_bytes, target, args.tier)
+        full_t, full_img = best_of(args.repeat, full_path, *job)
+        fast_t, fast_img = best_of(args.repeat, fast_path, *job)
+        # ขนาดอาจต่างกัน 1px จากการปัดเศษ -> เทียบที่ขนาดของโหมดเดิม
+        fast_alpha = fast_img.getchannel("A").resize(full_img.size)
+        iou = mask_iou(full_img.getchannel("A"), fast_alpha)
+        name = os.path.basename(path)[:30]
+        print(
+            f"{name:<30} {full_t:>9.3f} {fast_t:>9.3f} "
+            f"{full_t / fast_t:>7.1f}x {iou:>7.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
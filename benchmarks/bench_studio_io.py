@@ -0,0 +1,116 @@
+"""
+Benchmark: ค่าใช้จ่ายด้าน encode/decode ของ Studio Pipeline ต่อ 1 รูป
+- legacy: bytes ไหลระหว่าง Stage (PNG -> rembg -> PNG -> compose -> PNG x2
+  -> edit_image decode -> SDK encode อีกรอบ)
+- in-memory: PIL Image ไหลระหว่าง Stage แล้ว encode PNG ครั้งเดียวตอนส่งขึ้น API
+
+ไม่รวมเวลา Inference ของโมเดล (เท่ากันทั้งสองแบบ) -> ใช้ segment() ที่สร้าง
+alpha แบบวงรีแทน เพื่อวัดเฉพาะส่วนที่เปลี่ยน
+- CPU: time.process_time (ทุก Thread ใน Process)
+- Alloc: tracemalloc (peak) นับเฉพาะ Object ของ Python เช่น bytes ของ PNG
+  (Buffer ภายในของ PIL ไม่ถูกนับ)
+
+รัน: python benchmarks/bench_studio_io.py [--size 3000] [--repeat 3]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.logic.compositing import compose_product, encode_png  # noqa: E402
+
+MAX_INPUT_SIDE = 1500
+
+
+def make_photo(size):
+    """รูปสินค้าจำลอง (JPEG เหมือนรูปจากกล้อง)"""
+    w, h = size
+    img = Image.effect_noise(size, 40).convert("RGB")
+    ImageDraw.Draw(img).ellipse((w * 0.2, h * 0.1, w * 0.8, h * 0.9), fill="orange")
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def segment(img):
+    """แทน rembg: คืน RGBA ที่ alpha เป็นวงรีตรงกลาง"""
+    w, h = img.size
+    alpha = Image.new("L", img.size, 0)
+    ImageDraw.Draw(alpha).ellipse((w * 0.2, h * 0.1, w * 0.8, h * 0.9), fill=255)
+    out = img.convert("RGBA")
+    out.putalpha(alpha)
+    return out
+
+
+def legacy(input_bytes, background):
+    img = Image.open(io.BytesIO(input_bytes))
+    img.thumbnail((MAX_INPUT_SIDE, MAX_INPUT_SIDE))
+    rembg_input = encode_png(img)
+    # rembg.remove(bytes): decode -> ตัด -> encode PNG
+    rembg_output = encode_png(segment(Image.open(io.BytesIO(rembg_input))))
+    composite, mask = compose_product(
+        Image.open(io.BytesIO(rembg_output)), background, 0.8, "center"
+    )
+    base_bytes, mask_bytes = encode_png(composite), encode_png(mask)
+    # edit_image เดิม: decode ทั้งสองรูป แล้ว SDK encode ใหม่ก่อนส่ง
+    base_pil = Image.open(io.BytesIO(base_bytes))
+    mask_pil = Image.open(io.BytesIO(mask_bytes))
+    return encode_png(base_pil), encode_png(mask_pil)
+
+
+def in_memory(input_bytes, background):
+    img = Image.open(io.BytesIO(input_bytes))
+    img.draft("RGB", (MAX_INPUT_SIDE, MAX_INPUT_SIDE))
+    img.thumbnail((MAX_INPUT_SIDE, MAX_INPUT_SIDE))
+    composite, mask = compose_product(segment(img), background, 0.8, "center")
+    return encode_png(composite), encode_png(mask)
+
+
+def measure(repeat, fn, *args):
+    best_cpu, best_wall = float("inf"), float("inf")
+    for _ in range(repeat):
+        cpu, wall = time.process_time(), time.perf_counter()
+        fn(*args)
+        best_cpu = min(best_cpu, time.process_time() - cpu)
+        best_wall = min(best_wall, time.perf_counter() - wall)
+
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best_cpu, best_wall, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    input_bytes = make_photo((args.size, args.size * 3 // 4))
+    background = Image.new("RGB", (1024, 1024), (255, 255, 255))
+
+    print(f"{'path':<10} {'cpu (s)':>8} {'wall (s)':>9} {'peak alloc':>11}")
+    rows = {}
+    for name, fn in (("legacy", legacy), ("in-memory", in_memory)):
+        cpu, wall, peak = measure(args.repeat, fn, input_bytes, background)
+        rows[name] = (cpu, peak)
+        print(f"{name:<10} {cpu:>8.3f} {wall:>9.3f} {peak / 1024 / 1024:>9.1f}MB")
+
+    (old_cpu, old_peak), (new_cpu, new_peak) = rows["legacy"], rows["in-memory"]
+    print(
+        f"saved per image: {old_cpu - new_cpu:.3f}s CPU "
+        f"({(1 - new_cpu / old_cpu) * 100:.0f}%), "
+        f"{(old_peak - new_peak) / 1024 / 1024:.1f}MB peak Python allocations"
+    )
+
+
+if __name__ == "__main__":
+    main()
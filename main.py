@@ -1,7 +1,11 @@
+import multiprocessing
 import flet as ft
 from src.ui.main_layout import get_main_layout
 from src.core.config import APP_TITLE
 from src.core.theme_manager import load_theme_key, apply_theme  # Import ตัวใหม่
+from src.core.history_manager import flush_history
+from src.core.history_maintenance import get_history_maintenance
+from src.core.http_clients import get_http_clients
 
 
 def main(page: ft.Page):
@@ -15,9 +19,18 @@ def main(page: ft.Page):
     apply_theme(page, saved_key)
     # ------------------------------------
 
+    # บันทึก History ที่ค้างในคิวก่อนปิด Session
+    page.on_disconnect = lambda e: flush_history()
+    # ปิด HTTP Connection ที่เปิดค้างไว้ (Keep-Alive) เมื่อ Session จบ
+    page.on_close = lambda e: page.run_task(get_http_clients().aclose)
+    # กวาดไฟล์ขยะ / คุมพื้นที่ history_images เป็นระยะ (Background)
+    get_history_maintenance().start()
+
     app_layout = get_main_layout(page)
     page.add(app_layout)
 
 
 if __name__ == "__main__":
+    # จำเป็นสำหรับ Worker Process (spawn) ตอน Build เป็นไฟล์ .exe
+    multiprocessing.freeze_support()
     ft.app(target=main)
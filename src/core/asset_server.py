@@ -0,0 +1,173 @@
+import hmac
+import mimetypes
+import os
+import secrets
+import shutil
+import threading
+import urllib.parse
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.core.config import STUDIO_OUTPUT_DIR
+from src.core.history_store import HISTORY_IMG_DIR
+
+# โฟลเดอร์ที่อนุญาตให้เสิร์ฟ {ชื่อใน URL: โฟลเดอร์บน Disk}
+ASSET_ROOTS = {
+    "history": HISTORY_IMG_DIR,
+    "studio": STUDIO_OUTPUT_DIR,
+}
+
+# URL ที่มี ?v=<mtime> ถือว่าไม่เปลี่ยนแล้ว -> ให้ Client Cache ได้ยาวๆ
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "no-cache"
+
+mimetypes.add_type("image/webp", ".webp")
+
+
+def _is_within(root, path):
+    try:
+        return os.path.commonpath([root, path]) == root
+    except ValueError:
+        # คนละ Drive (Windows)
+        return False
+
+
+class _AssetRequestHandler(BaseHTTPRequestHandler):
+    server_version = "AIGenAssets/1.0"
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _resolve(self, url_path):
+        """
+        แปลง /<token>/<root>/<relpath> -> path บน Disk
+        (token ต้องตรงกับของ Process นี้ / กัน ../ หลุดออกนอกโฟลเดอร์)
+        """
+        parts = url_path.lstrip("/").split("/", 2)
+        if len(parts) != 3 or not hmac.compare_digest(parts[0], self.server.token):
+            return None
+        if parts[1] not in self.server.roots:
+            return None
+        root = os.path.realpath(self.server.roots[parts[1]])
+        full_path = os.path.realpath(
+            os.path.join(root, urllib.parse.unquote(parts[2]))
+        )
+        if not _is_within(root, full_path):
+            return None
+        return full_path if os.path.isfile(full_path) else None
+
+    def _serve(self, send_body):
+        parsed = urllib.parse.urlsplit(self.path)
+        file_path = self._resolve(parsed.path)
+        if not file_path:
+            self.send_error(404)
+            return
+
+        st = os.stat(file_path)
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        versioned = "v=" in parsed.query
+        cache_control = IMMUTABLE_CACHE_CONTROL if versioned else DEFAULT_CACHE_CONTROL
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return
+
+        content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(st.st_size))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(st.st_mtime, usegmt=True))
+        self.send_header("Cache-Control", cache_control)
+        self.end_headers()
+
+        if send_body:
+            with open(file_path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile)
+
+    def log_message(self, format, *args):
+        pass  # ไม่ต้อง print ทุก Request
+
+
+class AssetServer:
+    """
+    HTTP Server เล็กๆ (localhost) สำหรับเสิร์ฟรูปให้ ft.Image ผ่าน URL
+    แทนการยัด base64 ลงใน Control (ลดขนาดข้อมูลที่วิ่งผ่าน Websocket)
+    - ทุก URL ขึ้นต้นด้วย token สุ่มต่อ Process (เว็บอื่นเดา URL ไม่ได้)
+    - ไม่ส่ง CORS Header: <img> โหลดได้ แต่เว็บอื่น fetch() มาอ่านไม่ได้
+    """
+
+    def __init__(self, roots=ASSET_ROOTS, host="127.0.0.1", port=0):
+        self.roots = dict(roots)
+        self.host = host
+        self.port = port
+        self.token = secrets.token_urlsafe(16)
+        self._httpd = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._httpd:
+                return
+            httpd = ThreadingHTTPServer((self.host, self.port), _AssetRequestHandler)
+            httpd.daemon_threads = True
+            httpd.roots = self.roots
+            httpd.token = self.token
+            self.port = httpd.server_address[1]
+            self._thread = threading.Thread(
+                target=httpd.serve_forever, name="asset-server", daemon=True
+            )
+            self._thread.start()
+            self._httpd = httpd
+            print(f"Asset server running at http://{self.host}:{self.port}")
+
+    def stop(self):
+        with self._lock:
+            if self._httpd:
+                self._httpd.shutdown()
+                self._httpd.server_close()
+                self._httpd = None
+
+    def url_for(self, file_path):
+        """คืนค่า URL ของไฟล์ (None ถ้าไฟล์อยู่นอกโฟลเดอร์ที่อนุญาต)"""
+        self.start()
+        full_path = os.path.realpath(file_path)
+        for name, root in self.roots.items():
+            root = os.path.realpath(root)
+            if not _is_within(root, full_path):
+                continue
+            try:
+                version = os.stat(full_path).st_mtime_ns
+            except OSError:
+                return None
+            rel_path = os.path.relpath(full_path, root).replace(os.sep, "/")
+            return (
+                f"http://{self.host}:{self.port}/{self.token}/{name}/"
+                f"{urllib.parse.quote(rel_path)}?v={version}"
+            )
+        return None
+
+
+# --- Singleton ---
+_asset_server = None
+_asset_server_lock = threading.Lock()
+
+
+def get_asset_server():
+    global _asset_server
+    with _asset_server_lock:
+        if _asset_server is None:
+            _asset_server = AssetServer()
+        return _asset_server
+
+
+def asset_url(file_path):
+    """Shortcut: path บน Disk -> URL สำหรับ ft.Image(src=...)"""
+    return get_asset_server().url_for(file_path)
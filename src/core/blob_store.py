@@ -0,0 +1,151 @@
+import hashlib
+import io
+import os
+import threading
+from collections import Counter
+
+from PIL import Image
+
+from src.core.config import HISTORY_IMG_DIR
+
+# ไฟล์จริงอยู่ที่ history_images/blobs/<2 ตัวแรกของ hash>/<hash><ext>
+BLOB_DIR = os.path.join(HISTORY_IMG_DIR, "blobs")
+
+# นามสกุลมาตรฐานต่อ Format (เนื้อเดียวกันได้ชื่อเดียวกัน ไม่ว่าต้นฉบับเป็น .jpeg/.JPG)
+FORMAT_EXTENSIONS = {
+    "PNG": ".png",
+    "JPEG": ".jpg",
+    "WEBP": ".webp",
+    "GIF": ".gif",
+    "BMP": ".bmp",
+    "TIFF": ".tif",
+}
+
+
+def blob_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sniff_extension(data, default=".png"):
+    """นามสกุลจากเนื้อไฟล์จริง (อ่านแค่ Header) / อ่านไม่ออก -> default"""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return FORMAT_EXTENSIONS.get(img.format, default)
+    except Exception:
+        return default
+
+
+class BlobStore:
+    """
+    ที่เก็บไฟล์รูปแบบ Content-addressed (ชื่อไฟล์ = SHA-256 ของเนื้อไฟล์)
+    - ไฟล์เนื้อหาเดียวกันถูกเก็บแค่ครั้งเดียว (รูปซ้ำ / รูป Input ที่ใช้ซ้ำ)
+    - จำนวนการอ้างอิง (refcount) อยู่ในตาราง blobs ของ HistoryStore
+    - pin(): กันไฟล์ที่เขียนแล้วแต่ยังไม่ได้บันทึกลง DB ไม่ให้ถูกลบทิ้ง
+    """
+
+    def __init__(self, blob_dir=BLOB_DIR):
+        self.blob_dir = blob_dir
+        self._lock = threading.Lock()
+        self._pins = Counter()
+
+    def path_for(self, digest, ext=".png"):
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}{ext}")
+
+    # --- Write ---
+    def find_existing(self, digest):
+        """path ของไฟล์ hash นี้ที่มีอยู่แล้ว (นามสกุลใดก็ได้) / None ถ้ายังไม่มี"""
+        folder = os.path.join(self.blob_dir, digest[:2])
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    name, ext = os.path.splitext(entry.name)
+                    if name == digest and ext != ".tmp":
+                        return entry.path
+        except OSError:
+            pass
+        return None
+
+    def put_bytes(self, data, ext=".png"):
+        """
+        เก็บ bytes (ถ้ามีไฟล์ hash นี้อยู่แล้วจะไม่เขียนซ้ำ) และ pin ไว้
+        นามสกุลมาจาก Format จริงของไฟล์ (ext ใช้เมื่อระบุ Format ไม่ได้)
+        คืนค่า (hash, path, size) -> ต้องเรียก unpin(hash) หลังบันทึกลง DB แล้ว
+        """
+        digest = blob_hash(data)
+        self.pin(digest)
+        try:
+            # Blob เดิมที่ชื่อต่างนามสกุล (ก่อนใช้นามสกุลมาตรฐาน) -> ใช้ไฟล์นั้นเลย
+            path = self.find_existing(digest) or self.path_for(
+                digest, sniff_extension(data, ext)
+            )
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # เขียนไฟล์ชั่วคราวก่อนแล้วค่อย rename (กันอ่านไฟล์ที่เขียนไม่เสร็จ)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+        except Exception:
+            self.unpin(digest)
+            raise
+        return digest, path, len(data)
+
+    def put_file(self, source_path):
+        """นำไฟล์ภายนอก (เช่นรูป Input ของผู้ใช้) เข้ามาเก็บ (คืนค่าเหมือน put_bytes)"""
+        with open(source_path, "rb") as f:
+            data = f.read()
+        ext = os.path.splitext(source_path)[1].lower() or ".png"
+        return self.put_bytes(data, ".jpg" if ext == ".jpeg" else ext)
+
+    # --- Pin ---
+    def pin(self, digest):
+        with self._lock:
+            self._pins[digest] += 1
+
+    def unpin(self, digest):
+        with self._lock:
+            self._pins[digest] -= 1
+            if self._pins[digest] <= 0:
+                del self._pins[digest]
+
+    def is_pinned(self, digest):
+        with self._lock:
+            return self._pins[digest] > 0
+
+    # --- Delete ---
+    def remove_files(self, paths):
+        """
+        ลบไฟล์ที่ Store ตัดสินแล้วว่าไม่มีใครอ้างอิง คืนค่าจำนวน bytes ที่ลบได้
+        เช็ค pin ซ้ำภายใต้ Lock: put_bytes ที่ pin hash เดียวกันไว้จะไม่เสียไฟล์ไป
+        (ถ้าลบก่อน pin -> find_existing จะหาไม่เจอแล้วเขียนไฟล์ใหม่เอง)
+        """
+        freed = 0
+        for path in paths:
+            digest = os.path.splitext(os.path.basename(path))[0]
+            with self._lock:
+                if self._pins[digest] > 0:
+                    continue
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    # ไฟล์ที่ลบไม่ได้จะถูกเก็บโดย History Maintenance รอบถัดไป
+                    print(f"Error removing history file {path}: {e}")
+                    continue
+            freed += size
+        return freed
+
+
+# --- Singleton ---
+_blob_store = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    global _blob_store
+    with _blob_store_lock:
+        if _blob_store is None:
+            _blob_store = BlobStore()
+        return _blob_store
@@ -3,6 +3,13 @@
 APP_TITLE = "AI Prompt Studio"
 DEFAULT_THEME_MODE = "light"
 
+# โฟลเดอร์เก็บผลลัพธ์จาก Virtual Studio (เสิร์ฟผ่าน Asset Server)
+STUDIO_OUTPUT_DIR = "studio_outputs"
+# ผลลัพธ์ Studio ที่เก่ากว่านี้ (วัน) ถูกลบโดย History Maintenance
+STUDIO_OUTPUT_MAX_AGE_DAYS = 7
+# โฟลเดอร์เก็บรูปของ History (รวมถึง blobs/ และ .thumbs/)
+HISTORY_IMG_DIR = "history_images"
+
 # === Text Generation Models ===
 AI_MODELS_MAP = {
     "Google (Gemini)": [
@@ -38,14 +45,50 @@ IMAGE_GEN_MODELS_MAP = {
     ],
 }
 
+# จำนวน Request สร้าง/แก้รูปที่รอผลพร้อมกันได้ต่อโมเดล (กันชน Rate Limit ของ API)
+# โมเดลที่ไม่มีในนี้ใช้ DEFAULT_IMAGE_CONCURRENCY
+IMAGE_MODEL_CONCURRENCY = {
+    "gemini-3-pro-image-preview": 4,
+    "imagen-4.0-ultra-generate-001": 4,
+}
+DEFAULT_IMAGE_CONCURRENCY = 10
+
 # === Image Edit Models ===
 IMAGE_EDIT_MODELS_MAP = {
     "Google (Gemini/Imagen)": [
         {"id": "gemini-2.5-flash-image", "name": "Nano Banana"},
         {"id": "gemini-3-pro-image-preview", "name": "Nano Banana Pro"},
+        {"id": "imagen-3.0-capability-001", "name": "Imagen 3 Edit (Inpaint)"},
     ]
 }
 
+# โมเดลสร้างฉากหลังของ Studio (สร้างฉากครั้งเดียว)
+# ใช้เมื่อโมเดล Edit ที่เลือกสร้างรูปจาก Prompt ไม่ได้ (เช่น Imagen Edit)
+DEFAULT_BACKGROUND_MODEL = "gemini-2.5-flash-image"
+
+# === Background Removal (rembg) ===
+# เรียงจากเร็วสุด -> คุณภาพสูงสุด
+# {tier: {"model": ชื่อโมเดล rembg, "name": ชื่อที่แสดง, "input_size": Input ของโมเดล}}
+SEGMENTATION_TIERS = {
+    "fast": {"model": "u2netp", "name": "Fast (u2netp)", "input_size": 320},
+    "balanced": {"model": "silueta", "name": "Balanced (silueta)", "input_size": 320},
+    "standard": {"model": "u2net", "name": "Standard (u2net)", "input_size": 320},
+    "quality": {
+        "model": "isnet-general-use",
+        "name": "Quality (isnet-general-use)",
+        "input_size": 1024,
+    },
+}
+DEFAULT_SEGMENTATION_TIER = "standard"
+# จำนวน Session สูงสุดต่อโมเดล (= จำนวนรูปที่ตัดพื้นหลังพร้อมกันได้)
+SEGMENTATION_POOL_SIZE = 2
+# Thread ที่ onnxruntime ใช้ต่อ 1 Session (0 = แบ่ง CPU ตาม POOL_SIZE อัตโนมัติ)
+SEGMENTATION_INTRA_OP_THREADS = 0
+# Process แยกสำหรับตัดพื้นหลังใน Studio (0 = จำนวน Core - 1, สูงสุด 4)
+SEGMENTATION_WORKERS = 0
+# Worker ที่ไม่ตอบเกินเวลานี้ (วินาที) ถือว่าค้าง -> Kill แล้วเปิดใหม่
+SEGMENTATION_TIMEOUT = 120
+
 # === Helper for Settings Tab (Flat list of display names) ===
 SUPPORTED_MODELS = []
 for category in [AI_MODELS_MAP, IMAGE_GEN_MODELS_MAP]:
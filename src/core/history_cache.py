@@ -0,0 +1,135 @@
+import os
+from collections import deque
+
+# จำนวน Change ล่าสุดที่เก็บไว้ตอบ "เปลี่ยนอะไรไปบ้างตั้งแต่ generation N"
+MAX_CHANGE_LOG = 1000
+
+
+class HistoryCache:
+    """
+    Cache ของ History ทั้ง Process (อยู่คู่กับ HistoryStore)
+    - Store แจ้ง note_change() ทุกครั้งที่เขียน -> โหลดใหม่เฉพาะ entry ที่เปลี่ยน
+    - ถ้าไฟล์ DB ถูกแก้จากภายนอก (mtime/size เปลี่ยน) -> โหลดใหม่ทั้งหมด
+    - generation เพิ่มขึ้นทุกครั้งที่มีการเปลี่ยนแปลง
+    หมายเหตุ: dict ที่คืนไปเป็นตัวเดียวกับใน Cache ห้ามแก้ไขโดยตรง
+    """
+
+    def __init__(self, store):
+        self.store = store
+        # ใช้ Lock เดียวกับ Store เพื่อกัน Deadlock (Store เรียก Cache ระหว่างถือ Lock)
+        self._lock = store._lock
+        self._entries = None  # None = ยังไม่ได้โหลด / ต้องโหลดใหม่ทั้งหมด
+        self._dirty_ids = set()
+        self._generation = 0
+        self._change_log = deque(maxlen=MAX_CHANGE_LOG)  # (generation, entry_id)
+        self._log_floor = 0  # generation ที่เก่ากว่านี้ตอบไม่ได้แล้ว
+        self._signature = None
+
+    @property
+    def generation(self):
+        return self._generation
+
+    # --- Invalidation ---
+    def _stat_signature(self):
+        signature = []
+        for path in (self.store.db_path, self.store.db_path + "-wal"):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def note_change(self, entry_ids):
+        """Store เรียกหลัง Commit: บันทึก entry ที่เปลี่ยนและขยับ generation"""
+        with self._lock:
+            self._generation += 1
+            for entry_id in entry_ids:
+                self._dirty_ids.add(entry_id)
+                if len(self._change_log) == self._change_log.maxlen:
+                    self._log_floor = self._change_log[0][0]
+                self._change_log.append((self._generation, entry_id))
+            # การเขียนของเราเองไม่นับเป็นการแก้จากภายนอก
+            self._signature = self._stat_signature()
+
+    def note_write(self):
+        """การเขียนที่ไม่เปลี่ยนเนื้อหา (เช่น last_viewed_at) -> ไม่ขยับ generation"""
+        with self._lock:
+            self._signature = self._stat_signature()
+
+    def invalidate_all(self):
+        with self._lock:
+            self._generation += 1
+            self._entries = None
+            self._dirty_ids.clear()
+            self._change_log.clear()
+            self._log_floor = self._generation
+            self._signature = self._stat_signature()
+
+    # --- Read ---
+    def changes_since(self, generation):
+        """
+        คืนค่า list ของ entry_id ที่เปลี่ยนหลัง generation ที่ให้มา (ไม่แตะ Disk)
+        - [] = ไม่มีอะไรเปลี่ยน
+        - None = เก่าเกินกว่าที่เก็บไว้ ให้โหลดใหม่ทั้งหมด
+        """
+        with self._lock:
+            if generation >= self._generation:
+                return []
+            if generation < self._log_floor:
+                return None
+            changed = []
+            for gen, entry_id in self._change_log:
+                if gen > generation and entry_id not in changed:
+                    changed.append(entry_id)
+            return changed
+
+    def get_all(self):
+        with self._lock:
+            if self._entries is not None and self._stat_signature() != self._signature:
+                print("History database changed externally, reloading cache.")
+                self.invalidate_all()
+
+            if self._entries is None:
+                self._entries = self.store.load_all()
+                self._dirty_ids.clear()
+                self._signature = self._stat_signature()
+            elif self._dirty_ids:
+                self._refresh_dirty()
+            return list(self._entries)
+
+    def get(self, entry_id):
+        with self._lock:
+            if self._entries is None:
+                # ยังไม่ได้โหลดทั้งหมด -> อ่านแค่ entry เดียวจาก Store
+                return self.store.get_entry(entry_id)
+            for item in self.get_all():
+                if item["id"] == entry_id:
+                    return item
+            return None
+
+    def latest_id(self):
+        with self._lock:
+            if self._entries is None:
+                return self.store.get_latest_id()
+            entries = self.get_all()
+            return entries[0]["id"] if entries else None
+
+    def _refresh_dirty(self):
+        dirty, self._dirty_ids = self._dirty_ids, set()
+        fresh = {}
+        for entry_id in dirty:
+            item = self.store.get_entry(entry_id)
+            if item:
+                fresh[entry_id] = item
+
+        # แทนที่ตัวเดิม / ลบตัวที่หายไป / เพิ่มตัวใหม่ (เรียงตาม id ใหม่สุดก่อน)
+        entries = [
+            fresh.pop(item["id"], item)
+            for item in self._entries
+            if item["id"] not in dirty or item["id"] in fresh
+        ]
+        if fresh:
+            entries.extend(fresh.values())
+            entries.sort(key=lambda item: item["id"], reverse=True)
+        self._entries = entries
@@ -0,0 +1,16 @@
+from dataclasses import dataclass, field
+
+# --- ประเภทของ Change Event ---
+ENTRY_ADDED = "entry_added"  # payload = entry dict ทั้งก้อน
+IMAGE_ADDED = "image_added"  # payload = {"index", "path", "image_model"}
+ENTRY_DELETED = "entry_deleted"  # payload = {}
+HISTORY_CLEARED = "history_cleared"  # entry_id = None
+
+
+@dataclass(frozen=True)
+class HistoryEvent:
+    """Event ที่ Store ส่งออกหลัง Commit (ส่งเป็น list ต่อ 1 Transaction)"""
+
+    kind: str
+    entry_id: int = None
+    payload: dict = field(default_factory=dict)
@@ -0,0 +1,336 @@
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from src.core.blob_store import BLOB_DIR, get_blob_store
+from src.core.config import (
+    HISTORY_IMG_DIR,
+    STUDIO_OUTPUT_DIR,
+    STUDIO_OUTPUT_MAX_AGE_DAYS,
+)
+from src.core.history_store import get_history_store
+from src.core.storage_manager import load_storage_settings
+
+# จำนวนไฟล์/entry ที่ทำต่อ 1 รอบ แล้วพักให้ Thread อื่น (UI) ได้ทำงาน
+BATCH_SIZE = 200
+BATCH_PAUSE = 0.05
+# ไฟล์ที่ใหม่กว่านี้ (วินาที) ยังไม่นับเป็นขยะ (อาจกำลังรอ Flush ลง DB)
+ORPHAN_GRACE_SECONDS = 10 * 60
+# Thumbnail สร้างใหม่ได้เสมอ -> ไฟล์ที่ไม่ถูกแตะนานเกินนี้ลบทิ้งได้
+# (ไม่นับรวมใน Disk Budget: ไม่ควรลบ entry จริงเพื่อแลกกับ Thumbnail)
+THUMB_MAX_AGE_DAYS = 30
+# รันอัตโนมัติทุกๆ (วินาที) / หน่วงรอบแรกหลังเปิดแอพ
+AUTO_INTERVAL_SECONDS = 6 * 60 * 60
+AUTO_FIRST_DELAY_SECONDS = 60
+
+THUMB_DIR_NAME = ".thumbs"
+
+
+@dataclass
+class MaintenanceReport:
+    orphans_removed: int = 0
+    entries_expired: int = 0
+    entries_evicted: int = 0
+    studio_outputs_removed: int = 0
+    bytes_reclaimed: int = 0
+    # พื้นที่ของไฟล์ที่ History อ้างอิงอยู่ (ลบ entry แล้วได้คืน) ใช้เทียบกับ Budget
+    bytes_in_use: int = 0
+    finished_at: float = 0.0
+
+    def summary(self):
+        return (
+            f"คืนพื้นที่ {format_bytes(self.bytes_reclaimed)} "
+            f"(ไฟล์ขยะ {self.orphans_removed}, หมดอายุ {self.entries_expired}, "
+            f"เกินโควตา {self.entries_evicted}, Studio {self.studio_outputs_removed}) "
+            f"ใช้อยู่ {format_bytes(self.bytes_in_use)}"
+        )
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class HistoryMaintenance:
+    """
+    งานดูแลพื้นที่ของ history_images (รันใน Background Thread)
+    1. กวาดไฟล์ที่ไม่มีใครอ้างอิง: blobs/, ไฟล์รูปแบบเดิมชั้นบนสุดของ history_images/
+       และ .thumbs/ (ไฟล์ขยะ / .tmp ค้าง / Thumbnail เก่า)
+    2. ลบ entry ที่เก่าเกิน retention_days
+    3. ถ้ายังเกิน disk_budget_mb -> ลบ entry ที่ไม่ได้เปิดดูนานที่สุดก่อน (LRU)
+    4. ลบผลลัพธ์ Virtual Studio ที่เก่ากว่า STUDIO_OUTPUT_MAX_AGE_DAYS
+    ทุกขั้นที่ลบไฟล์จะถูกข้ามจนกว่า history.json จะย้ายเข้า DB สำเร็จ
+    ทำทีละ Batch (ถือ Lock ของ Store แค่ช่วงสั้นๆ) จึงไม่บล็อก UI แม้โฟลเดอร์ใหญ่มาก
+    """
+
+    def __init__(
+        self,
+        img_dir=HISTORY_IMG_DIR,
+        blob_dir=BLOB_DIR,
+        studio_dir=STUDIO_OUTPUT_DIR,
+    ):
+        self.img_dir = img_dir
+        self.blob_dir = blob_dir
+        self.thumb_dir = os.path.join(img_dir, THUMB_DIR_NAME)
+        self.studio_dir = studio_dir
+        self.last_report = None
+        self._run_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._auto_thread = None
+
+    # --- Scheduling ---
+    def start(self):
+        """เริ่มรันอัตโนมัติเป็นระยะ (ตาม auto_cleanup ใน Storage Settings)"""
+        if self._auto_thread:
+            return
+        self._auto_thread = threading.Thread(
+            target=self._auto_loop, name="history-maintenance", daemon=True
+        )
+        self._auto_thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _auto_loop(self):
+        delay = AUTO_FIRST_DELAY_SECONDS
+        while not self._stop_event.wait(delay):
+            delay = AUTO_INTERVAL_SECONDS
+            if load_storage_settings().get("auto_cleanup"):
+                self.run()
+
+    def run_in_background(self, callback=None):
+        """สั่งรันทันที (ไม่รอ) callback(report) ถูกเรียกจาก Background Thread"""
+
+        def task():
+            report = self.run()
+            if callback:
+                callback(report)
+
+        threading.Thread(
+            target=task, name="history-maintenance-now", daemon=True
+        ).start()
+
+    # --- Run ---
+    def run(self):
+        """รัน 1 รอบ (คืนค่า MaintenanceReport / None ถ้ามีรอบอื่นรันอยู่)"""
+        if not self._run_lock.acquire(blocking=False):
+            return None
+        try:
+            settings = load_storage_settings()
+            report = MaintenanceReport()
+            if get_history_store().legacy_migration_done():
+                self.sweep_orphans(report)
+                if settings.get("retention_days"):
+                    self.expire_entries(settings["retention_days"], report)
+                if settings.get("disk_budget_mb"):
+                    budget_bytes = settings["disk_budget_mb"] * 1024 * 1024
+                    self.enforce_budget(budget_bytes, report)
+                self.prune_studio_outputs(report)
+            else:
+                # history.json ยังย้ายไม่สำเร็จ -> DB อาจยังไม่รู้จักไฟล์ของผู้ใช้
+                print("History maintenance: legacy history not migrated, skipped")
+                self.measure_usage(report)
+            report.finished_at = time.time()
+            self.last_report = report
+            print(f"History maintenance: {report.summary()}")
+            return report
+        except Exception as e:
+            print(f"Error running history maintenance: {e}")
+            return None
+        finally:
+            self._run_lock.release()
+
+    def _pause(self):
+        # พักระหว่าง Batch (และหยุดทันทีถ้าแอพกำลังปิด)
+        return self._stop_event.wait(BATCH_PAUSE)
+
+    def _iter_legacy_files(self):
+        """ไฟล์ชั้นบนสุดของ history_images/ (รูปแบบเดิม {id}_{index}.png)"""
+        try:
+            with os.scandir(self.img_dir) as it:
+                for entry in it:
+                    if entry.is_file(follow_symlinks=False):
+                        yield entry
+        except OSError:
+            return
+
+    def _iter_files(self, root):
+        """เดินทุกไฟล์ใต้ root แบบ Lazy (ไม่สร้าง list ของทั้งโฟลเดอร์)"""
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry
+            except OSError:
+                continue
+
+    def _remove(self, path, size, report):
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        report.bytes_reclaimed += size
+        return True
+
+    # --- 1. Orphan Sweep ---
+    def measure_usage(self, report):
+        """นับพื้นที่ของ blobs/ และไฟล์รูปแบบเดิม โดยไม่ลบอะไร"""
+        for entry in itertools.chain(
+            self._iter_files(self.blob_dir), self._iter_legacy_files()
+        ):
+            try:
+                report.bytes_in_use += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                continue
+
+    def sweep_orphans(self, report):
+        if not get_history_store().legacy_migration_done():
+            # กันเรียกตรงโดยไม่ผ่าน run(): ไฟล์รูปแบบเดิมอาจยังไม่อยู่ใน DB
+            self.measure_usage(report)
+            return
+        now = time.time()
+        if self.sweep_thumbnails(now, report):
+            return
+        batch = []
+        # Blob + ไฟล์รูปแบบเดิม ตรวจกับ DB ชุดเดียวกัน (referenced_paths)
+        for entry in itertools.chain(
+            self._iter_files(self.blob_dir), self._iter_legacy_files()
+        ):
+            batch.append(entry)
+            if len(batch) >= BATCH_SIZE:
+                self._sweep_batch(batch, now, report)
+                batch = []
+                if self._pause():
+                    return
+        self._sweep_batch(batch, now, report)
+
+    def sweep_thumbnails(self, now, report):
+        """ลบ Thumbnail ที่เก่าแล้ว (คืนค่า True ถ้าถูกสั่งหยุดกลางทาง)"""
+        thumb_cutoff = now - THUMB_MAX_AGE_DAYS * 24 * 60 * 60
+        for i, entry in enumerate(self._iter_files(self.thumb_dir), start=1):
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            stale_tmp = (
+                entry.name.endswith(".tmp")
+                and now - st.st_mtime >= ORPHAN_GRACE_SECONDS
+            )
+            if st.st_mtime < thumb_cutoff or stale_tmp:
+                if self._remove(entry.path, st.st_size, report):
+                    report.orphans_removed += 1
+            if i % BATCH_SIZE == 0 and self._pause():
+                return True
+        return False
+
+    def _sweep_batch(self, batch, now, report):
+        if not batch:
+            return
+        blob_store = get_blob_store()
+        files = []
+        for entry in batch:
+            try:
+                files.append((entry, entry.stat(follow_symlinks=False)))
+            except OSError:
+                continue
+
+        referenced = get_history_store().referenced_paths(
+            [entry.path for entry, _ in files]
+        )
+        for entry, st in files:
+            digest = os.path.splitext(entry.name)[0]
+            if entry.path in referenced:
+                report.bytes_in_use += st.st_size
+            elif now - st.st_mtime < ORPHAN_GRACE_SECONDS or blob_store.is_pinned(
+                digest
+            ):
+                # อาจกำลังรอ Flush ลง DB -> ยังไม่ลบ แต่ก็ไม่นับใน Budget
+                # (ลบ entry เท่าไหร่ก็ไม่ได้พื้นที่ส่วนนี้คืน)
+                continue
+            elif self._remove(entry.path, st.st_size, report):
+                report.orphans_removed += 1
+
+    # --- 2. Retention ---
+    def expire_entries(self, retention_days, report):
+        cutoff_id = int(time.time() - retention_days * 24 * 60 * 60)
+        while True:
+            entry_ids = get_history_store().expired_entry_ids(cutoff_id, BATCH_SIZE)
+            if not entry_ids:
+                return
+            for entry_id in entry_ids:
+                freed = self._delete_entry(entry_id)
+                report.bytes_reclaimed += freed
+                report.bytes_in_use = max(0, report.bytes_in_use - freed)
+                report.entries_expired += 1
+            if self._pause():
+                return
+
+    # --- 3. Disk Budget ---
+    def enforce_budget(self, budget_bytes, report):
+        # bytes_in_use ได้จากรอบ Sweep (ไม่ต้องเดินโฟลเดอร์ซ้ำ)
+        # นับเฉพาะไฟล์ที่ entry อ้างอิงอยู่ -> ลบ entry แล้วได้คืนจริง
+        while report.bytes_in_use > budget_bytes:
+            entry_ids = get_history_store().lru_entry_ids(BATCH_SIZE)
+            if not entry_ids:
+                return
+            freed_batch = 0
+            for entry_id in entry_ids:
+                freed = self._delete_entry(entry_id)
+                freed_batch += freed
+                report.bytes_reclaimed += freed
+                report.bytes_in_use = max(0, report.bytes_in_use - freed)
+                report.entries_evicted += 1
+                if report.bytes_in_use <= budget_bytes:
+                    return
+            if not freed_batch:
+                # ลบทั้ง Batch แล้วไม่ได้พื้นที่คืนเลย (เช่น ไฟล์ลบไม่ได้) -> หยุด
+                # ไม่ไล่ลบ History ที่เหลือทั้งหมดโดยที่ยังเกิน Budget อยู่ดี
+                print("History maintenance: eviction freed nothing, budget skipped")
+                return
+            if self._pause():
+                return
+
+    # --- 4. Studio Outputs ---
+    def prune_studio_outputs(self, report):
+        cutoff = time.time() - STUDIO_OUTPUT_MAX_AGE_DAYS * 24 * 60 * 60
+        try:
+            with os.scandir(self.studio_dir) as it:
+                entries = [e for e in it if e.is_file(follow_symlinks=False)]
+        except OSError:
+            return  # ยังไม่เคยใช้ Studio
+        for i, entry in enumerate(entries, start=1):
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if st.st_mtime < cutoff and self._remove(entry.path, st.st_size, report):
+                report.studio_outputs_removed += 1
+            if i % BATCH_SIZE == 0 and self._pause():
+                return
+
+    def _delete_entry(self, entry_id):
+        """ลบ entry (Gallery ได้ Event ตามปกติ) คืนค่าจำนวน bytes ที่คืนได้"""
+        store = get_history_store()
+        return store.remove_files(store.delete_entry(entry_id))
+
+
+# --- Singleton ---
+_maintenance = None
+_maintenance_lock = threading.Lock()
+
+
+def get_history_maintenance():
+    global _maintenance
+    with _maintenance_lock:
+        if _maintenance is None:
+            _maintenance = HistoryMaintenance()
+        return _maintenance
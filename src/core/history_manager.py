@@ -1,11 +1,10 @@
-import json
 import os
-import time
-import shutil
-from datetime import datetime
 
+from src.core.history_store import HISTORY_IMG_DIR, get_history_store
+from src.core.history_writer import get_history_writer
+
+# เก็บไว้เพื่อความเข้ากันได้ (ข้อมูลจริงย้ายไปอยู่ใน history.db แล้ว)
 HISTORY_FILE = "history.json"
-HISTORY_IMG_DIR = "history_images"
 
 
 def ensure_history_dir():
@@ -14,11 +13,8 @@ def ensure_history_dir():
 
 
 def load_history():
-    if not os.path.exists(HISTORY_FILE):
-        return []
     try:
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return get_history_store().cache.get_all()
     except Exception as e:
         print(f"Error loading history: {e}")
         return []
@@ -27,107 +23,147 @@ def load_history():
 # --- ฟังก์ชันที่ขาดหายไป (เพิ่มกลับมาแล้ว) ---
 def get_latest_history_id():
     """ดึง ID ของประวัติรายการล่าสุด"""
-    history = load_history()
-    if history:
-        return history[0]["id"]
-    return None
+    try:
+        return get_history_store().cache.latest_id()
+    except Exception as e:
+        print(f"Error reading latest history id: {e}")
+        return None
+
+
+def get_history_generation():
+    """เลข generation ของ History (เพิ่มขึ้นทุกครั้งที่มีการเปลี่ยนแปลง)"""
+    return get_history_store().cache.generation
+
+
+def get_history_changes_since(generation):
+    """
+    entry_id ที่เปลี่ยนไปหลัง generation ที่ให้มา (ตอบจาก Memory ไม่แตะ Disk)
+    คืนค่า None ถ้าต้องโหลดใหม่ทั้งหมด
+    """
+    return get_history_store().cache.changes_since(generation)
 
 
 # ----------------------------------------
 
 
 def save_to_history(provider, model, input_text, image_paths, prompts):
-    current_history = load_history()
-    entry_id = int(time.time())
-    new_entry = {
-        "id": entry_id,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "provider": provider,
-        "model": model,
-        "image_model": None,  # รองรับการเก็บชื่อ Image Model
-        "input_text": input_text,
-        "image_paths": image_paths,
-        "prompts": prompts,
-        "generated_images": [],
-    }
-    current_history.insert(0, new_entry)
     try:
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(current_history, f, indent=4, ensure_ascii=False)
-        return entry_id
+        return get_history_store().add_entry(
+            provider, model, input_text, image_paths, prompts
+        )
     except Exception as e:
         print(f"Error saving history: {e}")
         return None
 
 
 def update_history_images(entry_id, prompt_index, image_bytes, image_model=None):
-    """บันทึกรูปภาพลง Disk และอัปเดตข้อมูล"""
-    ensure_history_dir()
-    current_history = load_history()
+    """บันทึกรูปภาพลง Blob Store และอัปเดตข้อมูล (upsert แค่ 1 แถว)"""
+    try:
+        get_history_writer().submit_image(
+            entry_id, prompt_index, image_bytes, image_model=image_model
+        )
+        flush_history()
+    except Exception as e:
+        print(f"Error updating image history: {e}")
+
 
-    target = next((item for item in current_history if item["id"] == entry_id), None)
-    if not target:
-        return
+def query_history(offset=0, limit=20, filters=None):
+    """
+    ดึง History ทีละหน้า (ใหม่สุดก่อน)
+    filters: provider, model, image_model, text, has_images, before_id
+    """
+    try:
+        return get_history_store().query_entries(offset, limit, filters)
+    except Exception as e:
+        print(f"Error querying history: {e}")
+        return []
 
-    filename = f"{entry_id}_{prompt_index}.png"
-    file_path = os.path.join(HISTORY_IMG_DIR, filename)
 
+def search_history(text, offset=0, limit=20, filters=None):
+    """ค้นหาใน input_text / prompts / provider / model (ตรงมากสุดก่อน)"""
     try:
-        with open(file_path, "wb") as f:
-            f.write(image_bytes)
+        return get_history_store().search_entries(text, offset, limit, filters)
+    except Exception as e:
+        print(f"Error searching history: {e}")
+        return []
 
-        if "generated_images" not in target:
-            target["generated_images"] = []
 
-        existing_img = next(
-            (img for img in target["generated_images"] if img["index"] == prompt_index),
-            None,
-        )
-        if not existing_img:
-            target["generated_images"].append(
-                {"index": prompt_index, "path": file_path}
-            )
+def count_history(filters=None):
+    try:
+        return get_history_store().count_entries(filters)
+    except Exception as e:
+        print(f"Error counting history: {e}")
+        return 0
 
-        # อัปเดตชื่อโมเดลรูปภาพถ้ามีส่งมา
-        if image_model:
-            target["image_model"] = image_model
 
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(current_history, f, indent=4, ensure_ascii=False)
+def get_history_item(entry_id):
+    """ดึงข้อมูล 1 รายการ (จาก Cache)"""
+    try:
+        return get_history_store().cache.get(entry_id)
+    except Exception as e:
+        print(f"Error loading history item: {e}")
+        return None
 
+
+def queue_history_image(entry_id, prompt_index, image_bytes, image_model=None):
+    """
+    บันทึกรูปแบบ Write-behind (ใช้ตอน Gen หลายรูปพร้อมกัน)
+    ไฟล์ถูกเขียนทันที ส่วน DB จะถูกรวบ Flush เป็นรอบเดียว
+    """
+    try:
+        return get_history_writer().submit_image(
+            entry_id, prompt_index, image_bytes, image_model=image_model
+        )
     except Exception as e:
-        print(f"Error updating image history: {e}")
+        print(f"Error queueing image history: {e}")
+        return None
+
+
+def flush_history():
+    """บังคับบันทึกรายการที่ค้างอยู่ทั้งหมด"""
+    return get_history_writer().flush()
+
+
+def subscribe_history_changes(callback):
+    """
+    callback(events) จะถูกเรียก 1 ครั้งต่อ 1 Transaction (เช่น 1 Flush ของ Writer)
+    events = list ของ HistoryEvent (entry_added / image_added / entry_deleted / ...)
+    """
+    get_history_store().add_listener(callback)
+
+
+def unsubscribe_history_changes(callback):
+    get_history_store().remove_listener(callback)
 
 
 def delete_history_item(timestamp_id):
-    current_history = load_history()
-    target = next(
-        (item for item in current_history if item["id"] == timestamp_id), None
-    )
-
-    if target and "generated_images" in target:
-        for img in target["generated_images"]:
-            if os.path.exists(img["path"]):
-                try:
-                    os.remove(img["path"])
-                except:
-                    pass
-
-    new_history = [item for item in current_history if item["id"] != timestamp_id]
     try:
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(new_history, f, indent=4, ensure_ascii=False)
-        return True
-    except:
+        image_paths = get_history_store().delete_entry(timestamp_id)
+    except Exception as e:
+        print(f"Error deleting history: {e}")
         return False
 
+    get_history_store().remove_files(image_paths)
+    return True
+
+
+def touch_history_item(entry_id):
+    """บันทึกว่าเพิ่งเปิดดู entry นี้ (ใช้จัดลำดับ LRU ตอนเกิน Disk Budget)"""
+    try:
+        get_history_store().touch_entries([entry_id])
+    except Exception as e:
+        print(f"Error touching history item: {e}")
+
 
 def clear_all_history():
     try:
+        flush_history()
+        store = get_history_store()
+        # ลบเฉพาะไฟล์ที่ Store คืนมา (ไม่ rmtree: Blob ที่ Writer ยัง pin ต้องอยู่ต่อ)
+        store.remove_files(store.clear())
         if os.path.exists(HISTORY_FILE):
             os.remove(HISTORY_FILE)
-        if os.path.exists(HISTORY_IMG_DIR):
-            shutil.rmtree(HISTORY_IMG_DIR)
         return True
-    except:
+    except Exception as e:
+        print(f"Error clearing history: {e}")
         return False
@@ -0,0 +1,965 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from src.core.blob_store import get_blob_store
+from src.core.config import HISTORY_IMG_DIR
+from src.core.history_cache import HistoryCache
+from src.core.history_events import (
+    HistoryEvent,
+    ENTRY_ADDED,
+    IMAGE_ADDED,
+    ENTRY_DELETED,
+    HISTORY_CLEARED,
+)
+
+HISTORY_DB_FILE = "history.db"
+LEGACY_HISTORY_FILE = "history.json"
+# history.json ที่ Import แล้ว (หรือ Import ไม่ได้) ถูกเปลี่ยนชื่อเป็นไฟล์นี้
+LEGACY_BACKUP_SUFFIX = ".bak"
+
+# จำนวน ? สูงสุดต่อ 1 Statement (SQLite รุ่นเก่า / Python บน Windows จำกัดไว้ที่ 999)
+SQL_MAX_VARIABLES = 500
+
+# --- Schema Migrations ---
+# แต่ละ step จะถูกรันตามลำดับ และเก็บเลข version ไว้ใน PRAGMA user_version
+_MIGRATIONS = [
+    # v1: โครงสร้างหลัก (entries / inputs / prompts / generated images)
+    """
+    CREATE TABLE IF NOT EXISTS entries (
+        id INTEGER PRIMARY KEY,
+        timestamp TEXT NOT NULL,
+        provider TEXT,
+        model TEXT,
+        image_model TEXT,
+        input_text TEXT
+    );
+    CREATE TABLE IF NOT EXISTS entry_inputs (
+        entry_id INTEGER NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        PRIMARY KEY (entry_id, position)
+    );
+    CREATE TABLE IF NOT EXISTS prompts (
+        entry_id INTEGER NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (entry_id, position)
+    );
+    CREATE TABLE IF NOT EXISTS generated_images (
+        entry_id INTEGER NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+        prompt_index INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        PRIMARY KEY (entry_id, prompt_index)
+    );
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """,
+    # v2: Full-text search index (สร้างจาก _fts_migration ตาม SQLite ที่มี)
+    lambda conn: _fts_migration(conn),
+    # v3: Content-addressed blobs (refcount ถูกดูแลด้วย Trigger)
+    # - แถวเก่า (blob_hash = NULL) ยังชี้ไปที่ไฟล์เดิม ไม่ถูกนับ refcount
+    """
+    CREATE TABLE IF NOT EXISTS blobs (
+        hash TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        refcount INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS blobs_unreferenced ON blobs (refcount)
+        WHERE refcount <= 0;
+    ALTER TABLE generated_images ADD COLUMN blob_hash TEXT;
+    ALTER TABLE entry_inputs ADD COLUMN blob_hash TEXT;
+    ALTER TABLE entry_inputs ADD COLUMN source_path TEXT;
+
+    CREATE TRIGGER IF NOT EXISTS generated_images_blob_ref
+    AFTER INSERT ON generated_images WHEN new.blob_hash IS NOT NULL BEGIN
+        UPDATE blobs SET refcount = refcount + 1 WHERE hash = new.blob_hash;
+    END;
+    CREATE TRIGGER IF NOT EXISTS generated_images_blob_unref
+    AFTER DELETE ON generated_images WHEN old.blob_hash IS NOT NULL BEGIN
+        UPDATE blobs SET refcount = refcount - 1 WHERE hash = old.blob_hash;
+    END;
+    CREATE TRIGGER IF NOT EXISTS generated_images_blob_swap
+    AFTER UPDATE OF blob_hash ON generated_images
+    WHEN old.blob_hash IS NOT new.blob_hash BEGIN
+        UPDATE blobs SET refcount = refcount - 1 WHERE hash = old.blob_hash;
+        UPDATE blobs SET refcount = refcount + 1 WHERE hash = new.blob_hash;
+    END;
+    CREATE TRIGGER IF NOT EXISTS entry_inputs_blob_ref
+    AFTER INSERT ON entry_inputs WHEN new.blob_hash IS NOT NULL BEGIN
+        UPDATE blobs SET refcount = refcount + 1 WHERE hash = new.blob_hash;
+    END;
+    CREATE TRIGGER IF NOT EXISTS entry_inputs_blob_unref
+    AFTER DELETE ON entry_inputs WHEN old.blob_hash IS NOT NULL BEGIN
+        UPDATE blobs SET refcount = refcount - 1 WHERE hash = old.blob_hash;
+    END;
+    """,
+    # v4: เวลาที่เปิดดูล่าสุด (ใช้เลือก entry ที่จะลบก่อนเมื่อเกิน Disk Budget)
+    """
+    ALTER TABLE entries ADD COLUMN last_viewed_at INTEGER;
+    CREATE INDEX IF NOT EXISTS entries_lru ON entries (COALESCE(last_viewed_at, id));
+    """,
+]
+
+# --- Full-text Search ---
+# ข้อความของ 1 entry ใน Index (prompts ต่อกันเป็นก้อนเดียว คั่นด้วยขึ้นบรรทัด)
+_FTS_ROW_SELECT = """
+    SELECT
+        e.id,
+        COALESCE(e.input_text, ''),
+        COALESCE(
+            (SELECT group_concat(text, char(10))
+             FROM (SELECT text FROM prompts p WHERE p.entry_id = e.id
+                   ORDER BY position)),
+            ''
+        ),
+        COALESCE(e.provider, ''),
+        COALESCE(e.model, ''),
+        COALESCE(e.image_model, '')
+    FROM entries e
+"""
+# น้ำหนักของแต่ละคอลัมน์ตอนจัดอันดับ (input_text, prompts, provider, model, image_model)
+FTS_RANK_WEIGHTS = (2.0, 1.0, 0.5, 0.5, 0.5)
+# trigram ค้นด้วยคำที่สั้นกว่านี้ไม่ได้ -> ใช้ LIKE แทน
+FTS_TRIGRAM_MIN_CHARS = 3
+
+
+def _fts_tokenizer(conn):
+    """
+    เลือก Tokenizer ของ FTS5
+    - trigram (SQLite 3.34+): ค้นแบบ substring ได้ และใช้กับภาษาไทยที่ไม่เว้นวรรคได้
+    - unicode61: ค้นตามคำ/คำขึ้นต้น
+    คืนค่า None ถ้า SQLite ไม่มี FTS5
+    """
+    for tokenizer in ("trigram", "unicode61"):
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE temp.fts_probe "
+                f"USING fts5(x, tokenize='{tokenizer}')"
+            )
+            conn.execute("DROP TABLE temp.fts_probe")
+            return tokenizer
+        except sqlite3.OperationalError:
+            continue
+    return None
+
+
+def _fts_migration(conn):
+    tokenizer = _fts_tokenizer(conn)
+    if tokenizer is None:
+        print("SQLite FTS5 is not available, history search will use LIKE.")
+        return ""
+    return f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+        input_text, prompts, provider, model, image_model,
+        tokenize = '{tokenizer}'
+    );
+    CREATE TRIGGER IF NOT EXISTS entries_fts_delete AFTER DELETE ON entries BEGIN
+        DELETE FROM entries_fts WHERE rowid = old.id;
+    END;
+    INSERT INTO entries_fts (rowid, input_text, prompts, provider, model, image_model)
+    {_FTS_ROW_SELECT};
+    INSERT OR REPLACE INTO meta (key, value) VALUES ('fts_tokenizer', '{tokenizer}');
+    """
+
+
+def _chunked(values, size=SQL_MAX_VARIABLES):
+    """แบ่ง values เป็นชุดละไม่เกิน size (ใช้กับ WHERE ... IN (?,?,...))"""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def _escape_like(text):
+    """ใส่ Escape ให้ % _ และ \\ ในคำค้น (ใช้คู่กับ LIKE ... ESCAPE '\\')"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _iter_json_array(path, chunk_size=64 * 1024):
+    """อ่าน JSON Array ทีละ Item (ไม่ต้องโหลดทั้งไฟล์เข้า Memory)"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        started = False
+        eof = False
+        while True:
+            if not eof:
+                chunk = f.read(chunk_size)
+                if chunk:
+                    buffer += chunk
+                else:
+                    eof = True
+
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    if eof:
+                        return
+                    continue
+                if buffer[0] != "[":
+                    raise ValueError("history file is not a JSON array")
+                buffer = buffer[1:]
+                started = True
+                continue
+
+            if buffer.startswith(","):
+                buffer = buffer[1:].lstrip()
+            if buffer.startswith("]"):
+                return
+            if not buffer:
+                if eof:
+                    return
+                continue
+
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # Item ยังอ่านมาไม่ครบ -> อ่าน Chunk ถัดไป
+                if eof:
+                    raise
+                continue
+            buffer = buffer[end:]
+            yield item
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def _coerce_legacy_item(item):
+    """
+    แปลง entry จาก history.json ให้ Insert ได้ (ค่าที่ขาด/ผิดชนิดถูกแทนด้วยค่าว่าง)
+    Raise ValueError ถ้าใช้ไม่ได้เลย (ไม่ใช่ Object / ไม่มี id ที่เป็นตัวเลข)
+    """
+    if not isinstance(item, dict):
+        raise ValueError("entry is not an object")
+    try:
+        entry_id = int(item["id"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"invalid id {item.get('id')!r}")
+
+    def text_or_none(value):
+        return None if value is None else str(value)
+
+    generated_images = []
+    for img in _as_list(item.get("generated_images")):
+        try:
+            generated_images.append(
+                {"index": int(img["index"]), "path": str(img["path"])}
+            )
+        except (KeyError, TypeError, ValueError):
+            continue  # รูปที่ข้อมูลไม่ครบ -> ข้ามเฉพาะรูปนั้น
+
+    return {
+        "id": entry_id,
+        "timestamp": text_or_none(item.get("timestamp")) or "",
+        "provider": text_or_none(item.get("provider")),
+        "model": text_or_none(item.get("model")),
+        "image_model": text_or_none(item.get("image_model")),
+        "input_text": text_or_none(item.get("input_text")),
+        # prompt ที่เป็น null -> "" (คงตำแหน่งไว้ให้ตรงกับ index ของรูป)
+        "prompts": [
+            "" if p is None else str(p) for p in _as_list(item.get("prompts"))
+        ],
+        "image_paths": [
+            p for p in _as_list(item.get("image_paths")) if isinstance(p, str) and p
+        ],
+        "generated_images": generated_images,
+    }
+
+
+class HistoryStore:
+    """
+    ที่เก็บประวัติแบบ SQLite (WAL mode)
+    - การอัปเดตรูปภาพ 1 รูป = upsert 1 แถว (ไม่ต้องเขียนไฟล์ใหม่ทั้งก้อน)
+    - ใช้ Connection เดียวร่วมกันทุก Thread (ป้องกันด้วย Lock)
+    """
+
+    def __init__(self, db_path=HISTORY_DB_FILE, legacy_json_path=LEGACY_HISTORY_FILE):
+        self.db_path = db_path
+        self.legacy_json_path = legacy_json_path
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._conn = sqlite3.connect(
+            db_path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._apply_migrations()
+        self._fts_tokenizer = self._read_meta("fts_tokenizer")
+        self._migrate_legacy_json()
+        self.cache = HistoryCache(self)
+
+    # --- Setup ---
+    def _apply_migrations(self):
+        with self._lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for step, script in enumerate(_MIGRATIONS[version:], start=version + 1):
+                if callable(script):
+                    script = script(self._conn)
+                self._conn.executescript(
+                    f"BEGIN;\n{script}\nPRAGMA user_version={step};\nCOMMIT;"
+                )
+
+    def _read_meta(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+            return row[0] if row else None
+
+    def _migrate_legacy_json(self):
+        """
+        ย้ายข้อมูลจาก history.json (ทำครั้งเดียว) แบบ Streaming
+        - entry ที่เสีย / ID ซ้ำ จะถูกข้ามทีละตัว (SAVEPOINT) ไม่ทำให้ทั้งไฟล์ล้ม
+        - จบแล้ว (สำเร็จหรืออ่านไฟล์ไม่ได้) เปลี่ยนชื่อเป็น .bak เพื่อไม่ให้ลองซ้ำ
+        - ตั้ง legacy_json_migrated เฉพาะเมื่อ Import สำเร็จ
+        """
+        if self._read_meta("legacy_json_migrated") is not None:
+            return
+        if not self.legacy_json_path:
+            return
+        if not os.path.exists(self.legacy_json_path):
+            # ไม่มีอะไรต้องย้าย (ติดตั้งใหม่) -> ถือว่าเสร็จแล้ว
+            # ยกเว้นมี .bak จาก Import ที่ล้มเหลว (รอให้ผู้ใช้จัดการเอง)
+            if not os.path.exists(self.legacy_json_path + LEGACY_BACKUP_SUFFIX):
+                self._write_meta("legacy_json_migrated", "0")
+            return
+
+        count = 0
+        skipped = []  # (id, เหตุผล)
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                for position, raw in enumerate(_iter_json_array(self.legacy_json_path)):
+                    try:
+                        item = _coerce_legacy_item(raw)
+                    except ValueError as e:
+                        raw_id = raw.get("id") if isinstance(raw, dict) else None
+                        label = f"#{position}" if raw_id is None else raw_id
+                        skipped.append((label, e))
+                        continue
+                    # ข้าม ID ซ้ำ (history.json เดิมอาจมี entry ที่ ID ชนกัน)
+                    duplicate = self._conn.execute(
+                        "SELECT 1 FROM entries WHERE id = ?", (item["id"],)
+                    ).fetchone()
+                    if duplicate:
+                        skipped.append((item["id"], "duplicate id"))
+                        continue
+                    self._conn.execute("SAVEPOINT legacy_entry")
+                    try:
+                        self._insert_entry(item)
+                        self._reindex_entries([item["id"]])
+                    except sqlite3.Error as e:
+                        self._conn.execute("ROLLBACK TO legacy_entry")
+                        skipped.append((item["id"], e))
+                    else:
+                        count += 1
+                    finally:
+                        self._conn.execute("RELEASE legacy_entry")
+                self._write_meta("legacy_json_migrated", str(count))
+                self._conn.execute("COMMIT")
+                migrated = True
+            except Exception as e:
+                # อ่านไฟล์ไม่ได้ทั้งก้อน (เช่น JSON เสีย) -> ไม่ Import อะไรเลย
+                self._conn.execute("ROLLBACK")
+                print(f"Error migrating history.json: {e}")
+                migrated = False
+
+        for entry_id, reason in skipped:
+            print(f"Skipped legacy history entry {entry_id}: {reason}")
+
+        # เก็บไฟล์เดิมไว้เป็น Backup (ไม่ลบทิ้ง) และไม่ให้ถูก Import ซ้ำ
+        backup_path = self.legacy_json_path + LEGACY_BACKUP_SUFFIX
+        try:
+            os.replace(self.legacy_json_path, backup_path)
+        except OSError as e:
+            print(f"Error renaming legacy history file: {e}")
+        if migrated:
+            print(
+                f"Migrated {count} history entries to {self.db_path} "
+                f"({len(skipped)} skipped, original kept as {backup_path})"
+            )
+        else:
+            print(f"Legacy history was not imported, original kept as {backup_path}")
+
+    def _write_meta(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def legacy_migration_done(self):
+        """True เมื่อไม่มี history.json ค้าง และย้ายข้อมูลเดิมเสร็จแล้ว"""
+        if self.legacy_json_path and os.path.exists(self.legacy_json_path):
+            return False
+        return self._read_meta("legacy_json_migrated") is not None
+
+    # --- Change Events ---
+    def add_listener(self, callback):
+        """callback(events) ถูกเรียก 1 ครั้งต่อ 1 Transaction (events = list)"""
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _emit(self, events):
+        # เรียกนอก Lock เพื่อไม่ให้ Listener ที่ช้า/อ่าน Store ต่อ ไปบล็อกคนอื่น
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(events)
+            except Exception as e:
+                print(f"History listener error: {e}")
+
+    # --- Write ---
+    def _register_blobs(self, blobs):
+        """
+        เพิ่มแถวใน blobs (ถ้ายังไม่มี) ก่อน Insert แถวที่อ้างอิง
+        blobs: list ของ (hash, path, size) / ต้องเรียกภายใน Transaction
+        """
+        self._conn.executemany(
+            "INSERT INTO blobs (hash, path, size) VALUES (?, ?, ?) "
+            "ON CONFLICT (hash) DO NOTHING",
+            blobs,
+        )
+
+    def _collect_unreferenced_blobs(self):
+        """
+        ลบแถวของ Blob ที่ไม่มีใครอ้างอิงแล้ว (ยกเว้นตัวที่ยัง pin อยู่)
+        คืนค่า path ของไฟล์ที่ลบได้ / ต้องเรียกภายใน Transaction
+        """
+        blob_store = get_blob_store()
+        rows = [
+            (row["hash"], row["path"])
+            for row in self._conn.execute(
+                "SELECT hash, path FROM blobs WHERE refcount <= 0"
+            )
+            if not blob_store.is_pinned(row["hash"])
+        ]
+        self._conn.executemany(
+            "DELETE FROM blobs WHERE hash = ? AND refcount <= 0",
+            [(digest,) for digest, _ in rows],
+        )
+        return [path for _, path in rows]
+
+    def _insert_entry(self, item, inputs=None):
+        """
+        Insert 1 entry (ต้องเรียกภายใน Transaction)
+        inputs: list ของ (path, blob_hash, source_path) ของรูป Input
+        (None = ใช้ item["image_paths"] ตรงๆ แบบไม่มี Blob)
+        """
+        entry_id = item["id"]
+        if inputs is None:
+            inputs = [(p, None, None) for p in item.get("image_paths") or []]
+        self._conn.execute(
+            """
+            INSERT INTO entries
+                (id, timestamp, provider, model, image_model, input_text)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (
+                entry_id,
+                item.get("timestamp") or "",
+                item.get("provider"),
+                item.get("model"),
+                item.get("image_model"),
+                item.get("input_text"),
+            ),
+        )
+        self._conn.executemany(
+            """
+            INSERT INTO entry_inputs
+                (entry_id, position, path, blob_hash, source_path)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [(entry_id, i, *row) for i, row in enumerate(inputs)],
+        )
+        self._conn.executemany(
+            "INSERT INTO prompts (entry_id, position, text) VALUES (?, ?, ?)",
+            [(entry_id, i, p) for i, p in enumerate(item.get("prompts") or [])],
+        )
+        self._conn.executemany(
+            """
+            INSERT OR REPLACE INTO generated_images (entry_id, prompt_index, path)
+            VALUES (?, ?, ?)
+            """,
+            [
+                (entry_id, img["index"], img["path"])
+                for img in item.get("generated_images") or []
+            ],
+        )
+
+    def _reindex_entries(self, entry_ids):
+        """อัปเดต Search Index ของ entry ที่เปลี่ยน (ต้องเรียกภายใน Transaction)"""
+        if not self._fts_tokenizer or not entry_ids:
+            return
+        for ids in _chunked(entry_ids):
+            placeholders = ",".join("?" * len(ids))
+            self._conn.execute(
+                f"DELETE FROM entries_fts WHERE rowid IN ({placeholders})", ids
+            )
+            self._conn.execute(
+                "INSERT INTO entries_fts "
+                "(rowid, input_text, prompts, provider, model, image_model) "
+                f"{_FTS_ROW_SELECT} WHERE e.id IN ({placeholders})",
+                ids,
+            )
+
+    def _ingest_inputs(self, image_paths):
+        """
+        นำรูป Input เข้า Blob Store (รูปต้นฉบับของผู้ใช้อาจถูกย้าย/ลบภายหลัง)
+        คืนค่า (inputs สำหรับ _insert_entry, blobs ที่ต้อง register)
+        ไฟล์ที่อ่านไม่ได้ -> เก็บ path เดิมไว้เหมือนก่อน
+        """
+        blob_store = get_blob_store()
+        inputs, blobs = [], []
+        for path in image_paths or []:
+            try:
+                digest, blob_path, size = blob_store.put_file(path)
+            except OSError as e:
+                print(f"Error storing input image {path}: {e}")
+                inputs.append((path, None, None))
+                continue
+            inputs.append((blob_path, digest, path))
+            blobs.append((digest, blob_path, size))
+        return inputs, blobs
+
+    def add_entry(self, provider, model, input_text, image_paths, prompts):
+        # อ่าน/เขียนไฟล์ Input นอก Lock (pin ไว้จนกว่าจะ Commit)
+        inputs, blobs = self._ingest_inputs(image_paths)
+        try:
+            entry_id, item = self._add_entry(
+                provider, model, input_text, prompts, inputs, blobs
+            )
+        finally:
+            for digest, _, _ in blobs:
+                get_blob_store().unpin(digest)
+        self._emit([HistoryEvent(ENTRY_ADDED, entry_id, item)])
+        return entry_id
+
+    def _add_entry(self, provider, model, input_text, prompts, inputs, blobs):
+        with self._lock:
+            # ID = timestamp (วินาที) เหมือนเดิม แต่กันชนกันถ้าบันทึกภายในวินาทีเดียวกัน
+            latest = self.get_latest_id() or 0
+            entry_id = max(int(time.time()), latest + 1)
+            item = {
+                "id": entry_id,
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "provider": provider,
+                "model": model,
+                "image_model": None,
+                "input_text": input_text,
+                "image_paths": [path for path, _, _ in inputs],
+                "prompts": prompts,
+                "generated_images": [],
+            }
+            self._conn.execute("BEGIN")
+            try:
+                self._register_blobs(blobs)
+                self._insert_entry(item, inputs)
+                self._reindex_entries([entry_id])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.cache.note_change([entry_id])
+        return entry_id, item
+
+    def upsert_image(
+        self, entry_id, prompt_index, path, image_model=None, blob_hash=None
+    ):
+        """บันทึกรูปภาพ 1 รูป = 1 แถว (คืนค่า False ถ้าไม่พบ entry)"""
+        applied = self.upsert_images(
+            [(entry_id, prompt_index, path, image_model, blob_hash)]
+        )
+        return bool(applied)
+
+    def upsert_images(self, updates):
+        """
+        บันทึกรูปภาพหลายรูปใน Transaction เดียว
+        updates: list ของ (entry_id, prompt_index, path, image_model, blob_hash)
+        คืนค่า list ของรายการที่บันทึกได้จริง (entry ที่ถูกลบไปแล้วจะถูกข้าม)
+        Blob ที่ถูกแทนที่จนไม่มีใครใช้แล้วจะถูกลบไฟล์ทิ้ง
+        """
+        if not updates:
+            return []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                existing = set()
+                for ids in _chunked({u[0] for u in updates}):
+                    placeholders = ",".join("?" * len(ids))
+                    existing.update(
+                        row[0]
+                        for row in self._conn.execute(
+                            f"SELECT id FROM entries WHERE id IN ({placeholders})",
+                            ids,
+                        )
+                    )
+                applied = [u for u in updates if u[0] in existing]
+                self._register_blobs(
+                    [(u[4], u[2], os.path.getsize(u[2])) for u in applied if u[4]]
+                )
+                self._conn.executemany(
+                    """
+                    INSERT INTO generated_images
+                        (entry_id, prompt_index, path, blob_hash)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (entry_id, prompt_index) DO UPDATE
+                        SET path = excluded.path, blob_hash = excluded.blob_hash
+                    """,
+                    [(u[0], u[1], u[2], u[4]) for u in applied],
+                )
+                self._conn.executemany(
+                    "UPDATE entries SET image_model = ? WHERE id = ?",
+                    [(u[3], u[0]) for u in applied if u[3]],
+                )
+                # image_model อยู่ใน Search Index ด้วย
+                self._reindex_entries({u[0] for u in applied if u[3]})
+                unreferenced = self._collect_unreferenced_blobs()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if applied:
+                self.cache.note_change({u[0] for u in applied})
+        self.remove_files(unreferenced)
+        if applied:
+            self._emit(
+                [
+                    HistoryEvent(
+                        IMAGE_ADDED,
+                        entry_id,
+                        {"index": index, "path": path, "image_model": image_model},
+                    )
+                    for entry_id, index, path, image_model, _ in applied
+                ]
+            )
+        return applied
+
+    def delete_entry(self, entry_id):
+        """
+        ลบ entry และคืนค่า path ของไฟล์ที่ลบได้ (ให้คนเรียกลบผ่าน remove_files)
+        - รูปแบบเก่า ({id}_{index}.png) เป็นของ entry นี้คนเดียว
+        - Blob จะถูกคืนมาก็ต่อเมื่อไม่มี entry อื่นใช้ร่วมอยู่
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                paths = [
+                    row["path"]
+                    for row in self._conn.execute(
+                        "SELECT path FROM generated_images "
+                        "WHERE entry_id = ? AND blob_hash IS NULL",
+                        (entry_id,),
+                    )
+                ]
+                # CASCADE -> Trigger ลด refcount ของ Blob ที่ entry นี้อ้างอิง
+                self._conn.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+                paths.extend(self._collect_unreferenced_blobs())
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.cache.note_change([entry_id])
+        self._emit([HistoryEvent(ENTRY_DELETED, entry_id)])
+        return paths
+
+    def touch_entries(self, entry_ids, viewed_at=None):
+        """บันทึกเวลาที่เปิดดู (ไม่นับเป็นการเปลี่ยนแปลง -> ไม่ส่ง Event)"""
+        viewed_at = int(viewed_at or time.time())
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE entries SET last_viewed_at = ? WHERE id = ?",
+                [(viewed_at, entry_id) for entry_id in entry_ids],
+            )
+            self.cache.note_write()
+
+    def clear(self):
+        """
+        ลบทุก entry และคืนค่า path ของไฟล์ที่ลบได้ (เหมือน delete_entry)
+        Blob ที่ Writer ยัง pin ไว้ (กำลังรอ Flush) จะไม่ถูกคืนมา
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                paths = [
+                    row["path"]
+                    for row in self._conn.execute(
+                        "SELECT path FROM generated_images WHERE blob_hash IS NULL"
+                    )
+                ]
+                self._conn.execute("DELETE FROM entries")
+                paths.extend(self._collect_unreferenced_blobs())
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.cache.invalidate_all()
+        self._emit([HistoryEvent(HISTORY_CLEARED)])
+        return paths
+
+    def remove_files(self, paths):
+        """
+        ลบไฟล์ที่ delete_entry / clear / upsert_images คืนมา (คืนค่าจำนวน bytes)
+        เช็คซ้ำภายใต้ Lock: ไฟล์ที่ถูกบันทึกกลับเข้า DB หลังปล่อย Lock ไปแล้ว
+        (เช่น put_bytes ใช้ Blob เดิมซ้ำ) จะไม่ถูกลบ
+        """
+        freed = 0
+        for chunk in _chunked(paths):
+            with self._lock:
+                referenced = self.referenced_paths(chunk)
+                freed += get_blob_store().remove_files(
+                    [path for path in chunk if path not in referenced]
+                )
+        return freed
+
+    # --- Read ---
+    def get_latest_id(self):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(id) FROM entries").fetchone()
+            return row[0]
+
+    def _load_entries(self, rows):
+        """แปลงแถวจาก entries -> dict รูปแบบเดียวกับ history.json เดิม"""
+        entries = [
+            {
+                "id": row["id"],
+                "timestamp": row["timestamp"],
+                "provider": row["provider"],
+                "model": row["model"],
+                "image_model": row["image_model"],
+                "input_text": row["input_text"],
+                "image_paths": [],
+                "prompts": [],
+                "generated_images": [],
+            }
+            for row in rows
+        ]
+        if not entries:
+            return []
+
+        by_id = {e["id"]: e for e in entries}
+        # แบ่งเป็นชุด (ประวัติยาวๆ จะมี id เกินจำนวน ? ที่ SQLite รับได้)
+        for ids in _chunked(by_id):
+            placeholders = ",".join("?" * len(ids))
+            for row in self._conn.execute(
+                "SELECT entry_id, path FROM entry_inputs "
+                f"WHERE entry_id IN ({placeholders}) ORDER BY entry_id, position",
+                ids,
+            ):
+                by_id[row["entry_id"]]["image_paths"].append(row["path"])
+            for row in self._conn.execute(
+                "SELECT entry_id, text FROM prompts "
+                f"WHERE entry_id IN ({placeholders}) ORDER BY entry_id, position",
+                ids,
+            ):
+                by_id[row["entry_id"]]["prompts"].append(row["text"])
+            for row in self._conn.execute(
+                f"SELECT entry_id, prompt_index, path FROM generated_images "
+                f"WHERE entry_id IN ({placeholders}) ORDER BY entry_id, prompt_index",
+                ids,
+            ):
+                by_id[row["entry_id"]]["generated_images"].append(
+                    {"index": row["prompt_index"], "path": row["path"]}
+                )
+        return entries
+
+    # --- Maintenance ---
+    def referenced_paths(self, paths):
+        """คืนค่า set ของ path (จาก paths ที่ให้มา) ที่ยังถูกอ้างอิงใน DB"""
+        referenced = set()
+        # ใช้ ? 3 ชุดต่อ Statement
+        with self._lock:
+            for chunk in _chunked(paths, SQL_MAX_VARIABLES // 3):
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    "SELECT path FROM generated_images "
+                    f"WHERE path IN ({placeholders}) "
+                    "UNION SELECT path FROM entry_inputs "
+                    f"WHERE path IN ({placeholders}) "
+                    f"UNION SELECT path FROM blobs WHERE path IN ({placeholders})",
+                    chunk * 3,
+                ).fetchall()
+                referenced.update(row[0] for row in rows)
+        return referenced
+
+    def expired_entry_ids(self, cutoff_id, limit=50):
+        """entry ที่สร้างก่อน cutoff_id (id = timestamp วินาที) เก่าสุดก่อน"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM entries WHERE id < ? ORDER BY id LIMIT ?",
+                (cutoff_id, limit),
+            ).fetchall()
+            return [row[0] for row in rows]
+
+    def lru_entry_ids(self, limit=50):
+        """entry ที่ไม่ได้เปิดดูนานที่สุดก่อน (ไม่เคยเปิด = นับจากเวลาที่สร้าง)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM entries ORDER BY COALESCE(last_viewed_at, id), id "
+                "LIMIT ?",
+                (limit,),
+            ).fetchall()
+            return [row[0] for row in rows]
+
+    def has_blob(self, digest):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM blobs WHERE hash = ?", (digest,)
+            ).fetchone()
+            return row is not None
+
+    def get_entry(self, entry_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM entries WHERE id = ?", (entry_id,)
+            ).fetchall()
+            entries = self._load_entries(rows)
+            return entries[0] if entries else None
+
+    def _fts_match_expr(self, text):
+        """
+        แปลงคำค้นเป็น FTS5 MATCH expression (ทุกคำต้องเจอ)
+        คืนค่า None ถ้าใช้ Index ไม่ได้ (ไม่มี FTS5 / คำสั้นเกินสำหรับ trigram)
+        """
+        if not self._fts_tokenizer:
+            return None
+        terms = text.split()
+        if not terms:
+            return None
+        if self._fts_tokenizer == "trigram":
+            if any(len(t) < FTS_TRIGRAM_MIN_CHARS for t in terms):
+                return None
+            return " AND ".join('"{}"'.format(t.replace('"', '""')) for t in terms)
+        # unicode61: ค้นแบบคำขึ้นต้น (prefix)
+        return " AND ".join('"{}"*'.format(t.replace('"', '""')) for t in terms)
+
+    def _build_clauses(self, filters):
+        """
+        filters (ไม่บังคับ):
+        - provider / model / image_model: ตรงทั้งคำ
+        - text: ค้นใน input_text, prompts, provider และ model (ผ่าน Search Index)
+        - has_images: True = เฉพาะรายการที่มีรูป
+        - before_id: เฉพาะรายการที่เก่ากว่า id นี้ (ใช้แบ่งหน้าแบบ keyset)
+        """
+        clauses, params = [], []
+        filters = filters or {}
+        for key in ("provider", "model", "image_model"):
+            if filters.get(key):
+                clauses.append(f"e.{key} = ?")
+                params.append(filters[key])
+        if filters.get("text"):
+            match = self._fts_match_expr(filters["text"])
+            if match:
+                clauses.append(
+                    "e.id IN (SELECT rowid FROM entries_fts "
+                    "WHERE entries_fts MATCH ?)"
+                )
+                params.append(match)
+            else:
+                like = f"%{_escape_like(filters['text'])}%"
+                clauses.append(
+                    "(e.input_text LIKE ? ESCAPE '\\' OR EXISTS (SELECT 1 "
+                    "FROM prompts p WHERE p.entry_id = e.id "
+                    "AND p.text LIKE ? ESCAPE '\\'))"
+                )
+                params.extend([like, like])
+        if filters.get("has_images"):
+            clauses.append(
+                "EXISTS (SELECT 1 FROM generated_images g WHERE g.entry_id = e.id)"
+            )
+        if filters.get("before_id") is not None:
+            clauses.append("e.id < ?")
+            params.append(filters["before_id"])
+        return clauses, params
+
+    def _build_filters(self, filters):
+        clauses, params = self._build_clauses(filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def query_entries(self, offset=0, limit=20, filters=None):
+        """ดึงทีละหน้า (ใหม่สุดก่อน) โดยไม่ต้องโหลดทั้งหมด"""
+        where, params = self._build_filters(filters)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT e.* FROM entries e {where} "
+                "ORDER BY e.id DESC LIMIT ? OFFSET ?",
+                [*params, limit, offset],
+            ).fetchall()
+            return self._load_entries(rows)
+
+    def search_entries(self, text, offset=0, limit=20, filters=None):
+        """
+        ค้นหาแบบจัดอันดับ (bm25: ตรงมากสุดก่อน) จาก Search Index
+        ถ้าใช้ Index ไม่ได้ จะกลับไปใช้ LIKE เรียงใหม่สุดก่อนแทน
+        """
+        match = self._fts_match_expr(text)
+        if not match:
+            filters = dict(filters or {}, text=text)
+            return self.query_entries(offset, limit, filters)
+
+        filters = {k: v for k, v in (filters or {}).items() if k != "text"}
+        clauses, params = self._build_clauses(filters)
+        where = "".join(f" AND {c}" for c in clauses)
+        weights = ", ".join(str(w) for w in FTS_RANK_WEIGHTS)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT e.* FROM entries_fts f JOIN entries e ON e.id = f.rowid "
+                f"WHERE entries_fts MATCH ?{where} "
+                f"ORDER BY bm25(entries_fts, {weights}), e.id DESC "
+                "LIMIT ? OFFSET ?",
+                [match, *params, limit, offset],
+            ).fetchall()
+            return self._load_entries(rows)
+
+    def count_entries(self, filters=None):
+        where, params = self._build_filters(filters)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM entries e {where}", params
+            ).fetchone()[0]
+
+    def load_all(self):
+        """โหลดทั้งหมด (ใหม่สุดก่อน)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM entries ORDER BY id DESC"
+            ).fetchall()
+            return self._load_entries(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Singleton (ใช้ Store เดียวทั้ง Process) ---
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_history_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
@@ -0,0 +1,123 @@
+import atexit
+import threading
+
+from src.core.blob_store import get_blob_store
+from src.core.history_store import get_history_store
+
+# รวบ Update ที่เข้ามาภายในช่วงเวลานี้ (วินาที) ให้เป็น Flush เดียว
+FLUSH_WINDOW = 0.3
+# Flush ล้มเหลว (เช่น DB ถูก Lock) -> ลองใหม่หลังจากนี้ (วินาที)
+RETRY_DELAY = 5.0
+
+
+class HistoryWriter:
+    """
+    Write-behind writer สำหรับรูปภาพใน History
+    - เขียนไฟล์รูปลง Blob Store ทันที
+      แต่รวบการบันทึกลง DB ให้เป็น Transaction เดียวต่อรอบ
+    - 1 Flush = 1 Transaction = Store ส่ง Change Event ออกไป 1 ชุด
+    """
+
+    def __init__(self, flush_window=FLUSH_WINDOW):
+        self.flush_window = flush_window
+        # {(entry_id, prompt_index): (path, image_model, blob_hash)}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    # --- Write ---
+    def submit_image(self, entry_id, prompt_index, image_bytes, image_model=None):
+        """เขียนไฟล์รูปแล้วเข้าคิวรอบันทึกลง DB (คืนค่า path ของไฟล์)"""
+        # Blob ถูก pin ไว้จนกว่าจะ Flush (กันถูกลบระหว่างรอ)
+        digest, file_path, _ = get_blob_store().put_bytes(image_bytes, ".png")
+
+        with self._lock:
+            replaced = self._pending.get((entry_id, prompt_index))
+            self._pending[(entry_id, prompt_index)] = (
+                file_path,
+                image_model,
+                digest,
+            )
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if replaced:
+            # Gen ซ้ำก่อน Flush -> รูปเก่าไม่ต้องบันทึกแล้ว
+            self._release([(replaced[2], replaced[0])])
+        return file_path
+
+    def flush(self):
+        """บันทึกทุกอย่างที่ค้างอยู่ลง DB ทันที (ใช้ตอนปิดแอพ / ก่อน Export)"""
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                pending, self._pending = self._pending, {}
+
+            if not pending:
+                return {}
+
+            updates = [
+                (entry_id, index, path, image_model, digest)
+                for (entry_id, index), (path, image_model, digest) in pending.items()
+            ]
+            try:
+                applied = get_history_store().upsert_images(updates)
+            except Exception as e:
+                # Create Tab แสดงไฟล์เหล่านี้อยู่ -> ยัง pin ไว้ แล้วลองใหม่รอบหน้า
+                print(f"Error flushing history images: {e}")
+                self._requeue(pending)
+                return {}
+            # entry ถูกลบไปก่อน Flush -> ไฟล์ที่ไม่มีใครอ้างอิงจะถูกลบทิ้ง
+            self._release([(u[4], u[2]) for u in updates])
+
+            changes = {}
+            for entry_id, index, _, _, _ in applied:
+                changes.setdefault(entry_id, []).append(index)
+            return changes
+
+    def _requeue(self, pending):
+        """ใส่รายการที่ Flush ไม่สำเร็จกลับเข้าคิว (ถ้ายังไม่มีรูปใหม่กว่ามาแทน)"""
+        superseded = []
+        with self._lock:
+            for key, value in pending.items():
+                if key in self._pending:
+                    superseded.append(value)
+                else:
+                    self._pending[key] = value
+            if self._timer is None:
+                self._timer = threading.Timer(RETRY_DELAY, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        self._release([(digest, path) for path, _, digest in superseded])
+
+    def _release(self, blobs):
+        """
+        ปลด pin และลบไฟล์ Blob ที่ไม่ได้ถูกบันทึกลง DB
+        blobs: list ของ (hash, path)
+        """
+        blob_store = get_blob_store()
+        store = get_history_store()
+        orphans = []
+        for digest, path in blobs:
+            blob_store.unpin(digest)
+            if not blob_store.is_pinned(digest) and not store.has_blob(digest):
+                orphans.append(path)
+        store.remove_files(orphans)
+
+
+# --- Singleton ---
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_history_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = HistoryWriter()
+            atexit.register(_writer.flush)
+        return _writer
@@ -0,0 +1,109 @@
+import asyncio
+import importlib.util
+import threading
+
+import httpx
+
+# ค่าต่อ Provider
+# - connect / read: Timeout (วินาที) / max_connections: ต่อ Host
+# - http2: ใช้เมื่อติดตั้ง h2 แล้วเท่านั้น (Ollama ในเครื่องเป็น http:// ไม่ได้ใช้)
+HTTP_PROFILES = {
+    "ollama": {
+        "connect": 5.0,
+        "read": 120.0,
+        "max_connections": 8,
+        "follow_redirects": False,
+        "http2": False,
+    },
+    "pollinations": {
+        "connect": 10.0,
+        "read": 60.0,
+        "max_connections": 10,
+        "follow_redirects": True,
+        "http2": True,
+    },
+}
+DEFAULT_HTTP_PROFILE = {
+    "connect": 10.0,
+    "read": 60.0,
+    "max_connections": 10,
+    "follow_redirects": True,
+    "http2": True,
+}
+# Connection ว่างนานเกินนี้ถูกปิด (วินาที)
+KEEPALIVE_EXPIRY = 30.0
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _build_client(name):
+    profile = HTTP_PROFILES.get(name, DEFAULT_HTTP_PROFILE)
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(profile["read"], connect=profile["connect"]),
+        limits=httpx.Limits(
+            max_connections=profile["max_connections"],
+            max_keepalive_connections=profile["max_connections"],
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        http2=profile["http2"] and HTTP2_AVAILABLE,
+        follow_redirects=profile["follow_redirects"],
+    )
+
+
+class HttpClientRegistry:
+    """
+    httpx.AsyncClient ที่ใช้ร่วมกันทั้งแอป (1 ตัวต่อ Provider)
+    -> Connection ถูกเก็บไว้ใช้ต่อ (Keep-Alive) ไม่ต้อง Handshake ใหม่ทุก Request
+    Client ผูกกับ Event Loop ที่สร้าง: ถ้า Loop เปลี่ยน / Client ถูกปิด จะสร้างใหม่ให้
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}  # {name: (client, loop)}
+
+    def get(self, name):
+        """Client ของ Provider (เรียกภายใน Coroutine เท่านั้น)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._clients.get(name)
+            if entry:
+                client, client_loop = entry
+                if client_loop is loop and not client.is_closed:
+                    return client
+            client = _build_client(name)
+            self._clients[name] = (client, loop)
+            return client
+
+    async def aclose(self):
+        """ปิดทุก Client ของ Loop ปัจจุบัน (เรียกตอนปิดแอป)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            closing = [c for c, l in self._clients.values() if l is loop]
+            self._clients = {
+                name: entry
+                for name, entry in self._clients.items()
+                if entry[1] is not loop
+            }
+        for client in closing:
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"Error closing HTTP client: {e}")
+
+
+# --- Singleton ---
+_http_clients = None
+_http_clients_lock = threading.Lock()
+
+
+def get_http_clients():
+    global _http_clients
+    with _http_clients_lock:
+        if _http_clients is None:
+            _http_clients = HttpClientRegistry()
+        return _http_clients
+
+
+def get_http_client(name):
+    """ทางลัด: get_http_clients().get(name)"""
+    return get_http_clients().get(name)
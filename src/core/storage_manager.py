@@ -0,0 +1,40 @@
+import json
+import os
+
+STORAGE_SETTINGS_FILE = "storage_settings.json"
+
+DEFAULT_STORAGE_SETTINGS = {
+    "disk_budget_mb": 0,  # 0 = ไม่จำกัดพื้นที่
+    "retention_days": 0,  # 0 = เก็บตลอดไป
+    "auto_cleanup": True,  # รัน Maintenance เบื้องหลังอัตโนมัติ
+}
+
+
+def load_storage_settings():
+    """โหลดค่า Setting ของพื้นที่เก็บ History"""
+    if not os.path.exists(STORAGE_SETTINGS_FILE):
+        return dict(DEFAULT_STORAGE_SETTINGS)
+    try:
+        with open(STORAGE_SETTINGS_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+            # Merge กับ Default เผื่อ key หาย
+            return {**DEFAULT_STORAGE_SETTINGS, **data}
+    except Exception as e:
+        print(f"Error loading storage settings: {e}")
+        return dict(DEFAULT_STORAGE_SETTINGS)
+
+
+def save_storage_settings(disk_budget_mb, retention_days, auto_cleanup=True):
+    """บันทึกค่าลงไฟล์ JSON"""
+    data = {
+        "disk_budget_mb": max(0, int(disk_budget_mb)),
+        "retention_days": max(0, int(retention_days)),
+        "auto_cleanup": bool(auto_cleanup),
+    }
+    try:
+        with open(STORAGE_SETTINGS_FILE, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+        return True
+    except Exception as e:
+        print(f"Error saving storage settings: {e}")
+        return False
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageOps
+
+from src.core.config import DEFAULT_BACKGROUND_MODEL, IMAGE_GEN_MODELS_MAP
+from src.logic.compositing import CANVAS_SIZE, encode_png, load_background
+from src.logic.segmentation_cache import SegmentationCache
+
+# ฉากหลังที่ AI สร้างจาก Template (ใช้ LRU บน Disk แบบเดียวกับ Cache ของ rembg)
+BACKGROUND_CACHE_DIR = os.path.join("cache", "backgrounds")
+BACKGROUND_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# จำนวนฉากหลังที่ Decode ค้างไว้ใน Memory (ไฟล์ที่ผู้ใช้เลือกเอง)
+DECODED_CACHE_SIZE = 4
+
+# Prompt ที่ส่งไปสร้างฉากหลังเปล่า (สินค้าจะถูกวางทีหลังในเครื่อง)
+BACKGROUND_PROMPT = (
+    "Empty product photography background with no product in frame, "
+    "leave space for a product in the center. Scene: {prompt}"
+)
+
+
+def background_model_for(edit_model):
+    """
+    โมเดลที่ใช้สร้างฉากหลังจาก Prompt (generate_content) คู่กับโมเดล Edit ที่เลือก
+    Imagen Edit (capability) ใช้ได้แค่ Edit -> ใช้ DEFAULT_BACKGROUND_MODEL แทน
+    """
+    generation_models = {
+        m["id"] for models in IMAGE_GEN_MODELS_MAP.values() for m in models
+    }
+    if edit_model in generation_models and not edit_model.startswith("imagen"):
+        return edit_model
+    return DEFAULT_BACKGROUND_MODEL
+
+
+class BackgroundCache:
+    """
+    ฉากหลังของ Virtual Studio
+    - ไฟล์ที่ผู้ใช้เลือก: Decode + ย่อครั้งเดียว แล้วใช้ Object เดิมทั้ง Batch / Preview
+      (ห้ามแก้ไขรูปที่ได้ไป: compose_product ทำสำเนาก่อนวางอยู่แล้ว)
+    - ฉากที่ AI สร้างจาก Template: เก็บบน Disk ตาม (prompt, model, ขนาด)
+      -> สินค้ากี่ชิ้นก็สร้างฉากแค่ครั้งเดียว แล้ววางสินค้าในเครื่อง
+    """
+
+    def __init__(
+        self, cache_dir=BACKGROUND_CACHE_DIR, max_bytes=BACKGROUND_CACHE_MAX_BYTES
+    ):
+        self._store = SegmentationCache(cache_dir, max_bytes)
+        self._lock = threading.Lock()
+        self._decoded = OrderedDict()  # {(path, mtime, canvas_size): PIL}
+        self._generating = {}  # {key: asyncio.Lock} กันสร้างฉากเดียวกันซ้อนกัน
+
+    def load_custom(self, bg_path, canvas_size=CANVAS_SIZE):
+        """ฉากหลังจากไฟล์ (Decode ใหม่เฉพาะตอนไฟล์เปลี่ยน)"""
+        key = (bg_path, os.path.getmtime(bg_path), tuple(canvas_size))
+        with self._lock:
+            background = self._decoded.get(key)
+            if background is not None:
+                self._decoded.move_to_end(key)
+                return background
+
+        background = load_background(bg_path, canvas_size)
+        with self._lock:
+            self._decoded[key] = background
+            while len(self._decoded) > DECODED_CACHE_SIZE:
+                self._decoded.popitem(last=False)
+        return background
+
+    @staticmethod
+    def key_for(prompt, model, size):
+        raw = f"{model}\n{size[0]}x{size[1]}\n{prompt}".encode("utf-8")
+        return f"bg_{hashlib.sha256(raw).hexdigest()}"
+
+    def get_generated(self, prompt, model, size=CANVAS_SIZE):
+        """ฉากที่เคยสร้างไว้ (None ถ้ายังไม่มี)"""
+        data = self._store.get(self.key_for(prompt, model, size))
+        if data is None:
+            return None
+        try:
+            return Image.open(io.BytesIO(data)).convert("RGB")
+        except Exception as e:
+            print(f"Error reading cached background: {e}")
+            return None
+
+    async def get_or_generate(self, prompt, model, generate_fn, size=CANVAS_SIZE):
+        """
+        คืนฉากหลังของ (prompt, model, size) ถ้าไม่มีจะเรียก
+        await generate_fn(full_prompt, model) -> bytes หรือ str (ข้อความ Error)
+        คืนค่า (PIL Image, None) หรือ (None, ข้อความ Error)
+        """
+        key = self.key_for(prompt, model, size)
+        lock = self._generating.setdefault(key, asyncio.Lock())
+        async with lock:
+            background = await asyncio.to_thread(
+                self.get_generated, prompt, model, size
+            )
+            if background is not None:
+                return background, None
+
+            result = await generate_fn(BACKGROUND_PROMPT.format(prompt=prompt), model)
+            if not isinstance(result, (bytes, bytearray)):
+                return None, str(result)
+
+            def fit_and_store():
+                image = Image.open(io.BytesIO(result)).convert("RGB")
+                image = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+                self._store.put(key, encode_png(image, compress_level=1))
+                return image
+
+            return await asyncio.to_thread(fit_and_store), None
+
+
+# --- Singleton ---
+_background_cache = None
+_background_cache_lock = threading.Lock()
+
+
+def get_background_cache():
+    global _background_cache
+    with _background_cache_lock:
+        if _background_cache is None:
+            _background_cache = BackgroundCache()
+        return _background_cache
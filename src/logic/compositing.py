@@ -0,0 +1,137 @@
+import io
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+# ขนาด Canvas เริ่มต้น (ตอนใช้ฉากหลังที่ AI สร้าง)
+CANVAS_SIZE = (1024, 1024)
+# ระยะห่างจากขอบ (px) ตอนวางสินค้าแบบ bottom / bottom_left / bottom_right
+EDGE_MARGIN = 50
+# ด้านยาวสุดของภาพ Preview ในเครื่อง (เล็ก -> วาดใหม่ได้ทันทีที่เลื่อน Slider)
+PREVIEW_SIZE = 384
+
+# ค่าเริ่มต้นของ Mask = ผลลัพธ์เดียวกับ Loop getpixel/putpixel เดิมทุก Pixel
+# (Mask = 255 - alpha ของสินค้า / ไม่ตัด Threshold, ไม่ขยายขอบ, ไม่ Feather)
+DEFAULT_ALPHA_THRESHOLD = None
+DEFAULT_DILATE_PX = 0
+DEFAULT_FEATHER_PX = 0
+
+
+def load_background(bg_path=None, canvas_size=CANVAS_SIZE):
+    """ฉากหลังจากไฟล์ (ย่อไม่เกิน canvas_size) หรือพื้นขาวถ้าไม่มีไฟล์"""
+    if bg_path:
+        bg_img = Image.open(bg_path).convert("RGB")
+        bg_img.thumbnail(canvas_size)
+        return bg_img
+    return Image.new("RGB", canvas_size, (255, 255, 255))
+
+
+def load_preview_background(background=None, preview_size=PREVIEW_SIZE):
+    """
+    ฉากหลังขนาดเล็กสำหรับ Preview + อัตราส่วนเทียบ Canvas ตอน Render จริง
+    - background: ฉากหลังขนาดจริง (PIL) / None = ลายตารางหมากรุก แทนฉากที่ AI จะสร้าง
+    """
+    placeholder = background is None
+    if placeholder:
+        background = load_background(None)
+    real_width = background.width
+    background = background.copy()
+    background.thumbnail((preview_size, preview_size))
+    if placeholder:
+        draw = ImageDraw.Draw(background)
+        tile = max(8, preview_size // 24)
+        for y in range(0, background.height, tile):
+            for x in range((y // tile) % 2 * tile, background.width, tile * 2):
+                draw.rectangle((x, y, x + tile - 1, y + tile - 1), fill=(230, 230, 230))
+    return background, background.width / real_width
+
+
+def place_product(canvas_size, product_size, position="center", margin=EDGE_MARGIN):
+    """คำนวณมุมซ้ายบน (x, y) ของสินค้าตามตำแหน่งที่เลือก"""
+    cw, ch = canvas_size
+    pw, ph = product_size
+    x, y = (cw - pw) // 2, (ch - ph) // 2
+
+    if position == "bottom":
+        y = ch - ph - margin
+    elif position == "bottom_left":
+        x = margin
+        y = ch - ph - margin
+    elif position == "bottom_right":
+        x = cw - pw - margin
+        y = ch - ph - margin
+    return x, y
+
+
+def threshold_alpha(alpha, threshold):
+    """alpha > threshold -> 255 / นอกนั้น 0 (ใช้ Lookup Table ทีเดียวทั้งภาพ)"""
+    lut = [0] * (threshold + 1) + [255] * (255 - threshold)
+    return alpha.point(lut)
+
+
+def build_edit_mask(
+    alpha,
+    canvas_size,
+    offset,
+    threshold=DEFAULT_ALPHA_THRESHOLD,
+    dilate=DEFAULT_DILATE_PX,
+    feather=DEFAULT_FEATHER_PX,
+):
+    """
+    สร้าง Mask สำหรับ AI Edit (255 = ให้ AI วาดใหม่, 0 = เก็บสินค้าไว้)
+    - threshold: ตัด alpha ให้เป็น 0/255 (None = ใช้ alpha แบบนุ่มตามเดิม)
+    - dilate: ขยายพื้นที่สินค้าออก (px) กัน AI กินขอบสินค้า
+    - feather: เบลอขอบ Mask (px) ให้รอยต่อเนียนขึ้น
+    """
+    keep = Image.new("L", canvas_size, 0)
+    if threshold is not None:
+        alpha = threshold_alpha(alpha, threshold)
+    keep.paste(alpha, offset)
+    if dilate > 0:
+        keep = keep.filter(ImageFilter.MaxFilter(dilate * 2 + 1))
+    if feather > 0:
+        keep = keep.filter(ImageFilter.GaussianBlur(feather))
+    return ImageChops.invert(keep)
+
+
+def compose_product(
+    product,
+    background,
+    scale=0.8,
+    position="center",
+    threshold=DEFAULT_ALPHA_THRESHOLD,
+    dilate=DEFAULT_DILATE_PX,
+    feather=DEFAULT_FEATHER_PX,
+    margin=EDGE_MARGIN,
+):
+    """
+    วางสินค้า (RGBA ที่ตัดพื้นหลังแล้ว) ลงบนฉากหลัง
+    คืนค่า (ภาพรวม RGB, Mask L) ขนาดเท่าฉากหลัง
+    """
+    product = product.convert("RGBA")
+    canvas_size = background.size
+
+    target_w = int(canvas_size[0] * scale)
+    target_h = int(canvas_size[1] * scale)
+    product.thumbnail((target_w, target_h), Image.Resampling.LANCZOS)
+
+    offset = place_product(canvas_size, product.size, position, margin)
+    alpha = product.getchannel("A")
+
+    composite = background.copy()
+    composite.paste(product, offset, alpha)
+    mask = build_edit_mask(alpha, canvas_size, offset, threshold, dilate, feather)
+    return composite, mask
+
+
+def encode_png(img, compress_level=6):
+    """PIL -> PNG bytes (compress_level ต่ำ = เร็วกว่า แต่ไฟล์ใหญ่กว่า)"""
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def as_png_bytes(image):
+    """รับ PIL Image หรือ bytes (PNG อยู่แล้ว) -> PNG bytes (encode เฉพาะเมื่อจำเป็น)"""
+    if isinstance(image, (bytes, bytearray)):
+        return bytes(image)
+    return encode_png(image)
@@ -1,20 +1,8 @@
 import io
 import requests
-from rembg import remove
 from PIL import Image
 
 
-# 1. ฟังก์ชันลบพื้นหลัง (Local - ฟรี)
-def remove_background(image_bytes: bytes) -> bytes:
-    try:
-        # input ต้องเป็น bytes -> output เป็น bytes (PNG)
-        result = remove(image_bytes)
-        return result
-    except Exception as e:
-        print(f"Error removing background: {e}")
-        return None
-
-
 HF_API_URL = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-xl-base-1.0"
 HF_TOKEN = "hf_xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
 
@@ -1,18 +1,40 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import List, Optional, Union
 
 
 class BaseImageProvider(ABC):
+    # Provider ที่แก้รูปเดิมได้ (Inpainting) ให้ตั้งเป็น True และ Override edit_image
+    supports_edit = False
+
     @abstractmethod
     def set_api_key(self, api_key: str):
         pass
 
     @abstractmethod
     async def generate_image(
-        self, prompt: str, model: str, ratio: str = "1:1"
+        self,
+        prompt: str,
+        model: str,
+        ref_image_paths: list = [],
+        ratio: str = "1:1",
+        references: Optional[list] = None,
     ) -> Optional[bytes]:
         """
-        Input: Prompt, Model, Ratio
+        Input: Prompt, Model, รูป Reference (Path หรือ ReferenceImage ที่เตรียมแล้ว), Ratio
         Output: Image bytes
         """
         pass
+
+    async def edit_image(
+        self,
+        base_image,
+        mask_image,
+        prompt: str,
+        model: str,
+        number_of_images: int = 1,
+    ) -> Union[List[bytes], str]:
+        """
+        Input: รูปต้นฉบับ + Mask (PIL หรือ PNG bytes), Prompt, Model, จำนวนรูป
+        Output: list ของ Image bytes หรือข้อความ Error
+        """
+        return f"Error: {type(self).__name__} does not support image editing."
@@ -1,11 +1,36 @@
+import asyncio
 from google import genai
 from google.genai import types
-import PIL.Image
 import io
 from .base_image import BaseImageProvider
+from src.core.config import IMAGE_MODEL_CONCURRENCY, DEFAULT_IMAGE_CONCURRENCY
+from src.logic.compositing import as_png_bytes
+from src.logic.reference_images import get_reference_images, max_side_for
+
+# Semaphore ต่อโมเดล (ใช้ร่วมกันทุก Tab เพราะ Quota ผูกกับ Key/โมเดล ไม่ใช่หน้าจอ)
+_model_semaphores = {}
+
+
+def model_semaphore(model):
+    semaphore = _model_semaphores.get(model)
+    if semaphore is None:
+        limit = IMAGE_MODEL_CONCURRENCY.get(model, DEFAULT_IMAGE_CONCURRENCY)
+        semaphore = _model_semaphores[model] = asyncio.Semaphore(limit)
+    return semaphore
+
+
+def _part_to_png(part):
+    """รูปจาก Response -> PNG bytes (ถ้าเป็น PNG อยู่แล้วใช้ bytes เดิม ไม่ Decode)"""
+    if part.inline_data.mime_type == "image/png":
+        return part.inline_data.data
+    img_byte_arr = io.BytesIO()
+    part.as_image().save(img_byte_arr, format="PNG")
+    return img_byte_arr.getvalue()
 
 
 class GeminiImageProvider(BaseImageProvider):
+    supports_edit = True
+
     def __init__(self):
         self.api_key = None
         self.client = None
@@ -15,7 +40,12 @@ class GeminiImageProvider(BaseImageProvider):
         self.client = genai.Client(api_key=self.api_key)
 
     async def generate_image(
-        self, prompt: str, model: str, ref_image_paths: list = [], ratio: str = "1:1"
+        self,
+        prompt: str,
+        model: str,
+        ref_image_paths: list = [],
+        ratio: str = "1:1",
+        references: list = None,
     ):
         if not self.client:
             return "Error: API Key is missing."
@@ -24,24 +54,23 @@ class GeminiImageProvider(BaseImageProvider):
             print(f"Generating image with {model} (Multimodal)...")
 
             # 1. เตรียม Contents (Prompt + Images)
-            contents = [prompt]
-
-            # โหลดรูปภาพ Reference ทั้งหมดใส่เข้าไปใน List
-            for path in ref_image_paths:
-                try:
-                    img = PIL.Image.open(path)
-                    contents.append(img)
-                    print(f"Added reference image: {path}")
-                except Exception as e:
-                    print(f"Error loading ref image {path}: {e}")
-
-            # 2. เรียก API (generate_content)
-            # ใช้ Logic ตามตัวอย่างที่คุณให้มา
-            response = self.client.models.generate_content(
-                model=model,
-                contents=contents,
-                # config=types.GenerateContentConfig(...) # ใส่ Config เพิ่มได้ถ้าต้องการ
-            )
+            # references = รูปที่เตรียมไว้แล้วทั้ง Batch (ไม่มี -> เตรียมจาก Path ผ่าน Cache)
+            if references is None:
+                references = await asyncio.to_thread(
+                    get_reference_images().prepare_all,
+                    ref_image_paths,
+                    max_side_for("gemini"),
+                )
+            contents = [prompt] + [ref.as_genai_part() for ref in references]
+
+            # 2. เรียก API (generate_content) ผ่าน Async Client
+            # -> หลาย Prompt รอผลพร้อมกันจริง (จำกัดจำนวนต่อโมเดลด้วย Semaphore)
+            async with model_semaphore(model):
+                response = await self.client.aio.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    # config=types.GenerateContentConfig(...) # ใส่ Config เพิ่มได้ถ้าต้องการ
+                )
 
             # 3. วนลูปหา Part ที่เป็นรูปภาพ
             # ตามตัวอย่าง: part.inline_data หรือ part.as_image()
@@ -54,13 +83,8 @@ class GeminiImageProvider(BaseImageProvider):
                         if hasattr(part, "inline_data") and part.inline_data:
                             print("Image detected in response.")
 
-                            # แปลงเป็น BytesIO
-                            generated_img = part.as_image()
-                            # หมายเหตุ: .as_image() คืนค่าเป็น PIL.Image
-
-                            img_byte_arr = io.BytesIO()
-                            generated_img.save(img_byte_arr, format="PNG")
-                            return img_byte_arr.getvalue()
+                            # แปลงเป็น PNG ใน Thread (ไม่บล็อก Event Loop)
+                            return await asyncio.to_thread(_part_to_png, part)
 
                     except Exception as img_err:
                         print(f"Error extracting image part: {img_err}")
@@ -79,39 +103,115 @@ class GeminiImageProvider(BaseImageProvider):
                 return f"Provider Error: {error_msg}"
             pass
 
+    async def edit_image(
+        self,
+        base_image,
+        mask_image,
+        prompt,
+        model="imagen-3.0-capability-001",
+        number_of_images=1,
+    ):
+        """
+        ใช้สำหรับเปลี่ยนพื้นหลังโดยเฉพาะ (Inpainting)
+        - base_image / mask_image: PIL Image หรือ PNG bytes
+          (encode PNG ครั้งเดียวตรงนี้ตอนส่งขึ้น API / bytes ส่งต่อไปเลยไม่ Decode)
+        - mask: 255 = ให้ AI วาดใหม่, 0 = เก็บสินค้าไว้
+        คืนค่า list ของ PNG bytes (number_of_images รูป) หรือ str (ข้อความ Error)
+        """
+        if not self.client:
+            return "Error: API Key is missing."
 
-async def edit_image(
-    self, base_image_bytes, mask_bytes, prompt, model="imagen-3.0-capability-001"
-):
-    """
-    ใช้สำหรับเปลี่ยนพื้นหลังโดยเฉพาะ (Inpainting)
-    """
-    if not self.client:
-        return "Error: API Key is missing."
-
-    try:
-        print(f"Editing image with model: {model} | prompt: {prompt}")
-
-        img_pil = PIL.Image.open(io.BytesIO(base_image_bytes))
-        mask_pil = PIL.Image.open(io.BytesIO(mask_bytes))
-
-        # ใช้ชื่อ model ที่รับเข้ามา
-        response = self.client.models.edit_image(
-            model=model,
-            image=img_pil,
-            mask=mask_pil,
-            prompt=prompt,
-            config=types.EditImageConfig(
-                number_of_images=1,
-                safety_filter_level="BLOCK_ONLY_HIGH",
-                output_mime_type="image/png",
-            ),
-        )
+        try:
+            print(
+                f"Editing image with model: {model} | prompt: {prompt} "
+                f"| variants: {number_of_images}"
+            )
+
+            # Encode (ถ้าจำเป็น) ใน Thread -> ไม่บล็อก Event Loop
+            base_png, mask_png = await asyncio.to_thread(
+                lambda: (as_png_bytes(base_image), as_png_bytes(mask_image))
+            )
+
+            if model.startswith("imagen"):
+                images = await self._edit_with_imagen(
+                    base_png, mask_png, prompt, model, number_of_images
+                )
+            else:
+                images = await self._edit_with_gemini(
+                    base_png, mask_png, prompt, model, number_of_images
+                )
 
-        if response.generated_images:
-            return response.generated_images[0].image.image_bytes
-        else:
+            if images:
+                return images
             return "Error: No edited image returned."
 
-    except Exception as e:
-        return f"Provider Error (Edit): {str(e)}"
+        except Exception as e:
+            return f"Provider Error (Edit): {str(e)}"
+
+    async def _edit_with_imagen(self, base_png, mask_png, prompt, model, count):
+        """Imagen (capability model): ได้หลายรูปใน Request เดียว"""
+        reference_images = [
+            types.RawReferenceImage(
+                reference_id=1,
+                reference_image=types.Image(
+                    image_bytes=base_png, mime_type="image/png"
+                ),
+            ),
+            types.MaskReferenceImage(
+                reference_id=2,
+                reference_image=types.Image(
+                    image_bytes=mask_png, mime_type="image/png"
+                ),
+                config=types.MaskReferenceConfig(
+                    mask_mode="MASK_MODE_USER_PROVIDED", mask_dilation=0.0
+                ),
+            ),
+        ]
+        async with model_semaphore(model):
+            response = await self.client.aio.models.edit_image(
+                model=model,
+                prompt=prompt,
+                reference_images=reference_images,
+                config=types.EditImageConfig(
+                    edit_mode="EDIT_MODE_INPAINT_INSERTION",
+                    number_of_images=count,
+                    safety_filter_level="BLOCK_ONLY_HIGH",
+                    output_mime_type="image/png",
+                ),
+            )
+        return [g.image.image_bytes for g in response.generated_images or []]
+
+    async def _edit_with_gemini(self, base_png, mask_png, prompt, model, count):
+        """
+        Gemini Image: ส่งรูป + Mask ผ่าน generate_content
+        (1 Request = 1 รูป -> ยิงพร้อมกัน count ครั้ง ภายใต้ Semaphore ของโมเดล)
+        """
+        contents = [
+            "Edit the first image. The second image is a mask: keep the product "
+            "in the black area exactly as it is and repaint only the white area. "
+            f"New background: {prompt}",
+            types.Part.from_bytes(data=base_png, mime_type="image/png"),
+            types.Part.from_bytes(data=mask_png, mime_type="image/png"),
+        ]
+
+        async def one():
+            async with model_semaphore(model):
+                response = await self.client.aio.models.generate_content(
+                    model=model, contents=contents
+                )
+            if not (response.candidates and response.candidates[0].content.parts):
+                return None
+            for part in response.candidates[0].content.parts:
+                if getattr(part, "inline_data", None):
+                    return await asyncio.to_thread(_part_to_png, part)
+            return None
+
+        results = await asyncio.gather(
+            *(one() for _ in range(count)), return_exceptions=True
+        )
+        images = [r for r in results if isinstance(r, bytes)]
+        if not images:
+            errors = [r for r in results if isinstance(r, Exception)]
+            if errors:
+                raise errors[0]
+        return images
@@ -1,4 +1,4 @@
-import httpx
+from src.core.http_clients import get_http_client
 import random
 import urllib.parse
 from .base_image import BaseImageProvider
@@ -10,7 +10,12 @@ class PollinationsProvider(BaseImageProvider):
 
     # --- แก้ไขบรรทัดนี้: เพิ่ม ref_image_paths เข้าไปรับค่า ---
     async def generate_image(
-        self, prompt: str, model: str, ref_image_paths: list = [], ratio: str = "1:1"
+        self,
+        prompt: str,
+        model: str,
+        ref_image_paths: list = [],
+        ratio: str = "1:1",
+        references: list = None,  # Pollinations ไม่รับรูป Reference
     ):
 
         # 1. จัดการขนาดภาพ
@@ -39,14 +44,14 @@ class PollinationsProvider(BaseImageProvider):
         print(f"Requesting Pollinations: {url}")
 
         # 5. ยิง Request
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            try:
-                response = await client.get(url, timeout=60.0)
-
-                if response.status_code == 200:
-                    return response.content
-                else:
-                    return f"Error {response.status_code}: {response.text}"
-            except Exception as e:
-                print(f"Pollinations Error: {e}")
-                return f"Connection Error: {str(e)}"
+        client = get_http_client("pollinations")
+        try:
+            response = await client.get(url)
+
+            if response.status_code == 200:
+                return response.content
+            else:
+                return f"Error {response.status_code}: {response.text}"
+        except Exception as e:
+            print(f"Pollinations Error: {e}")
+            return f"Connection Error: {str(e)}"
@@ -1,6 +1,7 @@
+import asyncio
 import google.generativeai as genai
 from typing import List
-import PIL.Image  # ต้องใช้ PIL ในการจัดการรูปภาพ
+from src.logic.reference_images import get_reference_images, max_side_for
 from .base import LLMProvider
 
 
@@ -44,13 +45,13 @@ class GeminiProvider(LLMProvider):
             # เตรียม Contents
             contents = [system_instruction]
 
-            # โหลดรูปภาพจาก Path
-            for path in image_paths:
-                try:
-                    img = PIL.Image.open(path)
-                    contents.append(img)
-                except Exception as e:
-                    print(f"Error loading image {path}: {e}")
+            # รูปจาก Path: หมุนตาม EXIF + ย่อ + encode ครั้งเดียว (Cache ใช้ซ้ำตอนสร้างรูป)
+            references = await asyncio.to_thread(
+                get_reference_images().prepare_all,
+                image_paths,
+                max_side_for("gemini"),
+            )
+            contents.extend(ref.as_blob() for ref in references)
 
             # เลือกโมเดล
             model = genai.GenerativeModel(model_name)
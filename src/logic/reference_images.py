@@ -0,0 +1,129 @@
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+
+from PIL import Image, ImageOps
+
+# ด้านยาวสุดที่แต่ละ Provider ใช้ประโยชน์ได้จริง (ใหญ่กว่านี้ก็ถูกย่อที่ Server อยู่ดี)
+REFERENCE_MAX_SIDE = {
+    "gemini": 1536,
+    "ollama": 1024,
+}
+DEFAULT_REFERENCE_MAX_SIDE = 1536
+# จำนวนรูปที่เตรียมแล้วเก็บไว้ใน Memory (ใช้ซ้ำข้ามขั้น Prompt -> Image ของ Input เดิม)
+REFERENCE_CACHE_SIZE = 32
+JPEG_QUALITY = 90
+
+
+def max_side_for(provider):
+    return REFERENCE_MAX_SIDE.get(provider, DEFAULT_REFERENCE_MAX_SIDE)
+
+
+@dataclass(frozen=True)
+class ReferenceImage:
+    """รูป Reference ที่หมุนตาม EXIF + ย่อ + encode แล้ว (ส่งให้ทุก Request ได้เลย)"""
+
+    path: str
+    digest: str
+    mime_type: str
+    data: bytes
+    size: tuple
+
+    @cached_property
+    def b64(self):
+        """Base64 สำหรับ API ที่รับรูปเป็น String (เช่น Ollama)"""
+        return base64.b64encode(self.data).decode("utf-8")
+
+    def as_genai_part(self):
+        """Part ของ google-genai (GeminiImageProvider)"""
+        from google.genai import types
+
+        return types.Part.from_bytes(data=self.data, mime_type=self.mime_type)
+
+    def as_blob(self):
+        """Blob ของ google-generativeai (GeminiProvider)"""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def _encode(image_bytes, max_side):
+    img = Image.open(io.BytesIO(image_bytes))
+    img.draft("RGB", (max_side, max_side))  # JPEG: Decode ที่ขนาดเล็กได้เลย
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    has_alpha = img.mode in ("RGBA", "LA") or "transparency" in img.info
+    if has_alpha:
+        # มีพื้นโปร่งใส -> PNG (JPEG จะทำให้พื้นหลังกลายเป็นสีดำ)
+        img.save(buffer, format="PNG")
+        return "image/png", buffer.getvalue(), img.size
+    img.convert("RGB").save(buffer, format="JPEG", quality=JPEG_QUALITY)
+    return "image/jpeg", buffer.getvalue(), img.size
+
+
+class ReferenceImageCache:
+    """
+    เตรียมรูป Reference ครั้งเดียวต่อไฟล์ (Key = hash ของเนื้อไฟล์ + ขนาดที่ย่อ)
+    -> N Prompt x M รูป เหลือการ Decode/ย่อ/Encode แค่ M ครั้ง
+    """
+
+    def __init__(self, max_items=REFERENCE_CACHE_SIZE):
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # {(digest, max_side): ReferenceImage}
+
+    def prepare(self, path, max_side=DEFAULT_REFERENCE_MAX_SIDE):
+        """ReferenceImage ของไฟล์ (None ถ้าอ่านไม่ได้)"""
+        try:
+            with open(path, "rb") as f:
+                image_bytes = f.read()
+        except OSError as e:
+            print(f"Error loading ref image {path}: {e}")
+            return None
+
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        key = (digest, max_side)
+        with self._lock:
+            reference = self._items.get(key)
+            if reference is not None:
+                self._items.move_to_end(key)
+                return reference
+
+        try:
+            mime_type, data, size = _encode(image_bytes, max_side)
+        except Exception as e:
+            print(f"Error preparing ref image {path}: {e}")
+            return None
+
+        reference = ReferenceImage(path, digest, mime_type, data, size)
+        with self._lock:
+            self._items[key] = reference
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return reference
+
+    def prepare_all(self, paths, max_side=DEFAULT_REFERENCE_MAX_SIDE):
+        """เตรียมทุกไฟล์ (ข้ามไฟล์ที่เสีย) เรียกครั้งเดียวต่อ Batch แล้วใช้ list เดิมทุก Request"""
+        references = []
+        for path in paths or []:
+            reference = self.prepare(path, max_side)
+            if reference is not None:
+                references.append(reference)
+        return references
+
+
+# --- Singleton ---
+_reference_images = None
+_reference_images_lock = threading.Lock()
+
+
+def get_reference_images():
+    global _reference_images
+    with _reference_images_lock:
+        if _reference_images is None:
+            _reference_images = ReferenceImageCache()
+        return _reference_images
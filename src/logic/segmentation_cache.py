@@ -0,0 +1,118 @@
+import hashlib
+import os
+import threading
+
+# ผลตัดพื้นหลัง (PNG RGBA: alpha = Mask ของสินค้า) เก็บไว้ข้าม Session
+SEGMENTATION_CACHE_DIR = os.path.join("cache", "segmentation")
+# ขนาดรวมสูงสุด (เกินแล้วลบไฟล์ที่ไม่ได้ใช้นานที่สุดก่อน)
+SEGMENTATION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+class SegmentationCache:
+    """
+    Cache ผลลัพธ์ของ rembg บน Disk
+    - Key = hash ของไฟล์ต้นฉบับ + ชื่อโมเดล + ขนาดที่ย่อก่อนส่งเข้าโมเดล
+      (เปลี่ยนแค่ฉากหลัง / ขนาด / ตำแหน่ง -> ใช้ผลเดิมได้ ไม่ต้องตัดใหม่)
+    - LRU ตาม mtime (ถูกใช้ = แตะ mtime ใหม่)
+    """
+
+    def __init__(
+        self, cache_dir=SEGMENTATION_CACHE_DIR, max_bytes=SEGMENTATION_CACHE_MAX_BYTES
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None  # None = ยังไม่ได้นับ (นับตอนเขียนครั้งแรก)
+
+    @staticmethod
+    def key_for(input_bytes, model_name, max_side):
+        digest = hashlib.sha256(input_bytes).hexdigest()
+        return f"{digest}_{model_name}_{max_side}"
+
+    def _path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def get(self, key):
+        """คืนค่า PNG bytes ของผลตัดพื้นหลัง (None ถ้าไม่มี)"""
+        path = self._path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)  # ขยับขึ้นเป็นตัวที่ใช้ล่าสุด
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, png_bytes):
+        path = self._path_for(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(png_bytes)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing segmentation cache: {e}")
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += len(png_bytes)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((path, st.st_size, st.st_mtime))
+        return files
+
+    def _evict(self):
+        """ลบไฟล์ที่ไม่ได้ใช้นานที่สุดจนเหลือ 90% ของโควตา (ต้องถือ Lock)"""
+        files = self._scan()
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for path, size, _ in sorted(files, key=lambda f: f[2]):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+        self._total_bytes = total
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in self._scan():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes = 0
+
+
+# --- Singleton ---
+_segmentation_cache = None
+_segmentation_cache_lock = threading.Lock()
+
+
+def get_segmentation_cache():
+    global _segmentation_cache
+    with _segmentation_cache_lock:
+        if _segmentation_cache is None:
+            _segmentation_cache = SegmentationCache()
+        return _segmentation_cache
@@ -0,0 +1,111 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import onnxruntime as ort
+from rembg.sessions import sessions_class
+
+from src.core.config import (
+    SEGMENTATION_TIERS,
+    DEFAULT_SEGMENTATION_TIER,
+    SEGMENTATION_POOL_SIZE,
+    SEGMENTATION_INTRA_OP_THREADS,
+)
+
+
+def model_for_tier(tier):
+    """ชื่อโมเดล rembg ของ Tier (Tier ที่ไม่รู้จัก -> ใช้ค่าเริ่มต้น)"""
+    info = SEGMENTATION_TIERS.get(tier) or SEGMENTATION_TIERS[DEFAULT_SEGMENTATION_TIER]
+    return info["model"]
+
+
+def input_size_for_tier(tier):
+    """ขนาด Input ที่โมเดลของ Tier ใช้จริง (rembg ย่อรูปเป็นขนาดนี้ก่อนเข้าโมเดลเสมอ)"""
+    info = SEGMENTATION_TIERS.get(tier) or SEGMENTATION_TIERS[DEFAULT_SEGMENTATION_TIER]
+    return info["input_size"]
+
+
+class SegmentationService:
+    """
+    Pool ของ rembg Session (ONNX) ภายใน 1 Process (Worker แต่ละตัวมีของตัวเอง)
+    - โหลดโมเดลครั้งเดียว แล้วยืม/คืน Session ผ่าน borrow()
+    - แต่ละโมเดลมีได้สูงสุด pool_size Session -> ตัดพื้นหลังหลายรูปพร้อมกันได้
+      โดยไม่ต้องรอคิว Session เดียว (เกินนั้นจะรอจนมีคนคืน)
+    """
+
+    def __init__(
+        self,
+        pool_size=SEGMENTATION_POOL_SIZE,
+        intra_op_threads=SEGMENTATION_INTRA_OP_THREADS,
+    ):
+        self.pool_size = max(1, pool_size)
+        if intra_op_threads <= 0:
+            # แบ่ง Core ให้ทุก Session ในคิวใช้พร้อมกันได้โดยไม่แย่งกันเกินไป
+            intra_op_threads = max(1, (os.cpu_count() or 2) // self.pool_size)
+        self.intra_op_threads = intra_op_threads
+        self._cond = threading.Condition()
+        self._idle = {}  # {model_name: [session]}
+        self._created = {}  # {model_name: จำนวน Session ที่สร้างแล้ว}
+
+    def _create_session(self, model_name):
+        session_class = next(
+            (sc for sc in sessions_class if sc.name() == model_name), None
+        )
+        if session_class is None:
+            raise ValueError(f"Unknown rembg model: {model_name}")
+        sess_opts = ort.SessionOptions()
+        sess_opts.intra_op_num_threads = self.intra_op_threads
+        sess_opts.inter_op_num_threads = 1
+        print(
+            f"Loading rembg model {model_name} "
+            f"(intra-op threads: {self.intra_op_threads})"
+        )
+        return session_class(model_name, sess_opts)
+
+    @contextmanager
+    def borrow(self, tier=DEFAULT_SEGMENTATION_TIER):
+        """ยืม Session ของ Tier นี้ (คืนอัตโนมัติเมื่อออกจาก with)"""
+        model_name = model_for_tier(tier)
+        session = None
+        must_create = False
+        with self._cond:
+            while True:
+                idle = self._idle.setdefault(model_name, [])
+                if idle:
+                    session = idle.pop()
+                    break
+                if self._created.get(model_name, 0) < self.pool_size:
+                    # จองที่ไว้ก่อน แล้วค่อยโหลดโมเดลนอก Lock (ใช้เวลานาน)
+                    self._created[model_name] = self._created.get(model_name, 0) + 1
+                    must_create = True
+                    break
+                self._cond.wait()
+
+        if must_create:
+            try:
+                session = self._create_session(model_name)
+            except Exception:
+                with self._cond:
+                    self._created[model_name] -= 1
+                    self._cond.notify()
+                raise
+
+        try:
+            yield session
+        finally:
+            with self._cond:
+                self._idle[model_name].append(session)
+                self._cond.notify()
+
+    def warm_up(self, tier=DEFAULT_SEGMENTATION_TIER):
+        """โหลดโมเดลเตรียมไว้ 1 Session (เรียกใน Background ก่อนใช้งานจริง)"""
+        with self.borrow(tier):
+            pass
+
+    def predict_mask(self, image, tier=DEFAULT_SEGMENTATION_TIER):
+        """
+        คืนค่า Mask ของสินค้า (PIL "L" ขนาดเท่า image) จากโมเดลโดยตรง
+        ไม่ผ่าน encode/decode และไม่ตัดรูปที่ความละเอียดเต็ม (ใช้กับโหมดเร็ว)
+        """
+        with self.borrow(tier) as session:
+            return session.predict(image.convert("RGB"))[0]
@@ -0,0 +1,257 @@
+import multiprocessing as mp
+import os
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image
+
+from src.core.config import (
+    DEFAULT_SEGMENTATION_TIER,
+    SEGMENTATION_WORKERS,
+    SEGMENTATION_TIMEOUT,
+)
+
+# ความถี่ที่ Thread ฝั่งแอปเช็คผล / สถานะยกเลิก / Worker ค้าง (วินาที)
+POLL_INTERVAL = 0.1
+
+
+class SegmentationCancelled(Exception):
+    """งานถูกยกเลิกด้วย cancel() ระหว่างรอผล"""
+
+
+def _worker_main(conn, intra_op_threads):
+    """
+    Loop ของ Worker Process: รับงานผ่าน Pipe (แค่ชื่อ Shared Memory + ขนาด)
+    อ่านรูปจาก Shared Memory ตรงๆ แล้วเขียน Mask กลับลง Block เดียวกัน
+    """
+    # โหลด rembg / onnxruntime เฉพาะใน Worker (Process หลักไม่ต้องแบกโมเดล)
+    from src.logic.segmentation_service import SegmentationService
+
+    service = SegmentationService(pool_size=1, intra_op_threads=intra_op_threads)
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+
+        op, shm_name, shape, tier = message
+        try:
+            if op == "warm_up":
+                service.warm_up(tier)
+            else:
+                _predict_into(service, shm_name, shape, tier)
+            conn.send((True, None))
+        except Exception as e:
+            conn.send((False, str(e)))
+
+
+def _predict_into(service, shm_name, shape, tier):
+    h, w = shape
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        pixels = np.ndarray((h, w, 3), dtype=np.uint8, buffer=shm.buf)
+        mask = service.predict_mask(Image.fromarray(pixels), tier)
+        if mask.size != (w, h):
+            mask = mask.resize((w, h), Image.Resampling.BILINEAR)
+        out = np.ndarray((h, w), dtype=np.uint8, buffer=shm.buf, offset=h * w * 3)
+        out[:] = np.asarray(mask.convert("L"))
+        # ต้องปล่อย View ทั้งหมดก่อน close() ไม่งั้น Buffer ยังถูกอ้างอิงอยู่
+        del pixels, out
+    finally:
+        shm.close()
+
+
+class _Worker:
+    def __init__(self, ctx, intra_op_threads):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, intra_op_threads),
+            name="segmentation-worker",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(timeout=1)
+        except Exception as e:
+            print(f"Error stopping segmentation worker: {e}")
+        self.conn.close()
+
+
+class SegmentationWorkerPool:
+    """
+    ตัดพื้นหลังใน Worker Process แยก (ไม่แย่ง CPU / GIL กับ Event Loop ของ UI)
+    - รูปส่งผ่าน multiprocessing.shared_memory: Pipe ส่งแค่ชื่อ Block ไม่ Pickle รูป
+    - Worker ที่ค้างเกิน timeout ถูก Kill แล้วสร้างใหม่อัตโนมัติในงานถัดไป
+    - cancel(): งานที่รอผลอยู่ทั้งหมดหยุดทันที (Worker ที่ทำงานนั้นถูก Kill)
+    """
+
+    def __init__(self, num_workers=SEGMENTATION_WORKERS, timeout=SEGMENTATION_TIMEOUT):
+        cpu_count = os.cpu_count() or 2
+        if num_workers <= 0:
+            # เหลือ 1 Core ไว้ให้ UI
+            num_workers = max(1, min(4, cpu_count - 1))
+        self.num_workers = num_workers
+        self.intra_op_threads = max(1, cpu_count // num_workers)
+        self.timeout = timeout
+        # spawn: ไม่ Fork Thread ของ Flet / onnxruntime ติดไปด้วย
+        self._ctx = mp.get_context("spawn")
+        self._cond = threading.Condition()
+        self._idle = []
+        self._started = 0
+        self._generation = 0  # เพิ่มทุกครั้งที่ cancel()
+
+    @contextmanager
+    def _borrow(self, generation):
+        worker = None
+        with self._cond:
+            while True:
+                if generation != self._generation:
+                    raise SegmentationCancelled()
+                if self._idle:
+                    worker = self._idle.pop()
+                    if worker.is_alive():
+                        break
+                    # ตายไประหว่างว่าง -> ทิ้งแล้วสร้างใหม่แทน
+                    worker.kill()
+                    self._started -= 1
+                    continue
+                if self._started < self.num_workers:
+                    self._started += 1
+                    break
+                self._cond.wait(POLL_INTERVAL)
+
+        if worker is None:
+            try:
+                worker = _Worker(self._ctx, self.intra_op_threads)
+            except Exception:
+                with self._cond:
+                    self._started -= 1
+                    self._cond.notify()
+                raise
+
+        try:
+            yield worker
+        finally:
+            with self._cond:
+                if worker.is_alive():
+                    self._idle.append(worker)
+                else:
+                    self._started -= 1
+                self._cond.notify()
+
+    def _wait_reply(self, worker, generation, timeout):
+        """รอผลจาก Worker (Kill Worker ถ้าค้าง / ถูกยกเลิก / ตาย)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if worker.conn.poll(POLL_INTERVAL):
+                ok, error = worker.conn.recv()
+                if not ok:
+                    raise RuntimeError(error)
+                return
+            if generation != self._generation:
+                worker.kill()
+                raise SegmentationCancelled()
+            if not worker.is_alive():
+                worker.kill()
+                raise RuntimeError("Segmentation worker exited unexpectedly.")
+            if deadline is not None and time.monotonic() > deadline:
+                print(f"Segmentation worker hung for {timeout}s, restarting it.")
+                worker.kill()
+                raise TimeoutError(f"Segmentation timed out after {timeout}s")
+
+    def predict_mask(self, image, tier=DEFAULT_SEGMENTATION_TIER):
+        """PIL Image -> Mask "L" ขนาดเท่า image (รอผลแบบ Block: เรียกจาก Thread)"""
+        generation = self._generation
+        pixels = np.asarray(image.convert("RGB"))
+        h, w = pixels.shape[:2]
+        # Block เดียว: รูป RGB (h*w*3) ตามด้วย Mask ที่ Worker เขียนกลับ (h*w)
+        shm = shared_memory.SharedMemory(create=True, size=h * w * 4)
+        try:
+            np.ndarray((h, w, 3), dtype=np.uint8, buffer=shm.buf)[:] = pixels
+            with self._borrow(generation) as worker:
+                worker.conn.send(("predict", shm.name, (h, w), tier))
+                self._wait_reply(worker, generation, self.timeout)
+            out = np.ndarray((h, w), dtype=np.uint8, buffer=shm.buf, offset=h * w * 3)
+            mask = Image.fromarray(out.copy())
+            del out
+            return mask
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def warm_up(self, tier=DEFAULT_SEGMENTATION_TIER):
+        """เปิด Worker ให้ครบและโหลดโมเดลของ Tier นี้ในทุกตัวพร้อมกัน"""
+        generation = self._generation
+        workers = []
+        with self._cond:
+            workers.extend(self._idle)
+            self._idle.clear()
+            while self._started < self.num_workers:
+                workers.append(_Worker(self._ctx, self.intra_op_threads))
+                self._started += 1
+
+        error = None
+        try:
+            for worker in workers:
+                worker.conn.send(("warm_up", None, None, tier))
+            # รอให้ครบทุกตัว (ห้ามทิ้งคำตอบค้างใน Pipe ไม่งั้นงานถัดไปจะอ่านผิดตัว)
+            for worker in workers:
+                try:
+                    # โหลดครั้งแรกอาจต้องดาวน์โหลดโมเดล -> ไม่จับเวลาค้าง
+                    self._wait_reply(worker, generation, None)
+                except Exception as e:
+                    error = error or e
+        finally:
+            with self._cond:
+                for worker in workers:
+                    if worker.is_alive():
+                        self._idle.append(worker)
+                    else:
+                        self._started -= 1
+                self._cond.notify_all()
+        if error:
+            raise error
+
+    def cancel(self):
+        """ยกเลิกงานทั้งหมดที่กำลังรอผล (งานที่ส่งเข้ามาหลังจากนี้ทำงานตามปกติ)"""
+        with self._cond:
+            self._generation += 1
+            self._cond.notify_all()
+
+    def shutdown(self):
+        """ปิด Worker ที่ว่างอยู่ทั้งหมด (ตัวที่กำลังทำงานจะถูกปิดเมื่อแอปปิด)"""
+        with self._cond:
+            workers, self._idle = self._idle, []
+            self._started -= len(workers)
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.kill()
+
+
+# --- Singleton ---
+_segmentation_workers = None
+_segmentation_workers_lock = threading.Lock()
+
+
+def get_segmentation_workers():
+    global _segmentation_workers
+    with _segmentation_workers_lock:
+        if _segmentation_workers is None:
+            _segmentation_workers = SegmentationWorkerPool()
+        return _segmentation_workers
@@ -0,0 +1,164 @@
+import asyncio
+import inspect
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+# จำนวน Worker ที่ตัดพื้นหลัง + จัดวาง (CPU) พร้อมกัน
+# rembg (onnxruntime) และ PIL ปล่อย GIL ระหว่างคำนวณ จึงกระจายไปหลาย Core ได้ด้วย Thread
+PREPARE_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+# จำนวน Request ไปยัง AI Edit ที่รอผลพร้อมกันได้สูงสุด
+EDIT_CONCURRENCY = 4
+# ขนาดคิวระหว่าง Stage (คิวเต็ม -> Stage ก่อนหน้ารอ ไม่เตรียมรูปค้างไว้ใน Memory เกินจำเป็น)
+QUEUE_SIZE = 4
+
+_DONE = object()  # Sentinel บอก Worker ว่าหมดงานแล้ว
+
+
+@dataclass
+class StudioJob:
+    index: int
+    file_path: str
+
+
+@dataclass
+class StudioResult:
+    index: int
+    file_path: str
+    output_bytes: bytes = None
+    error: str = None
+    variants: list = None  # ทุกรูปที่ได้ (output_bytes = รูปแรก)
+
+
+class StudioPipeline:
+    """
+    Render หลายสินค้าแบบ Pipeline (Stage ทำงานซ้อนกัน แทนการทำทีละไฟล์จนจบ)
+    1. prepare (Thread Pool): prepare_fn(file_path) -> (base, mask)
+       เป็น PIL Image ในหน่วยความจำ (ไม่ encode ระหว่าง Stage)
+    2. edit (async, จำกัดจำนวน): await edit_fn(base, mask)
+       -> bytes, list ของ bytes (หลายแบบ) หรือ str (ข้อความ Error)
+    ผลลัพธ์แต่ละไฟล์ถูกส่งให้ on_result(StudioResult) ทันทีที่เสร็จ (ไม่เรียงตามลำดับ)
+    """
+
+    def __init__(
+        self,
+        prepare_fn,
+        edit_fn,
+        on_result=None,
+        prepare_workers=PREPARE_WORKERS,
+        edit_concurrency=EDIT_CONCURRENCY,
+        queue_size=QUEUE_SIZE,
+    ):
+        self.prepare_fn = prepare_fn
+        self.edit_fn = edit_fn
+        self.on_result = on_result
+        self.prepare_workers = prepare_workers
+        self.edit_concurrency = edit_concurrency
+        self.queue_size = queue_size
+        self._cancelled = False
+
+    def cancel(self):
+        """หยุดรับงานใหม่ (งานที่กำลังทำอยู่จะทำจนจบ Stage นั้น)"""
+        self._cancelled = True
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    async def run(self, file_paths):
+        """รันทั้ง Batch และคืนค่า list ของ StudioResult (เรียงตามลำดับไฟล์)"""
+        prepare_queue = asyncio.Queue(self.queue_size)
+        edit_queue = asyncio.Queue(self.queue_size)
+        results = []
+
+        with ThreadPoolExecutor(
+            max_workers=self.prepare_workers, thread_name_prefix="studio-prepare"
+        ) as executor:
+            feeder = asyncio.create_task(self._feed(file_paths, prepare_queue))
+            preparers = [
+                asyncio.create_task(
+                    self._prepare_worker(executor, prepare_queue, edit_queue, results)
+                )
+                for _ in range(self.prepare_workers)
+            ]
+            editors = [
+                asyncio.create_task(self._edit_worker(edit_queue, results))
+                for _ in range(self.edit_concurrency)
+            ]
+
+            await feeder
+            await asyncio.gather(*preparers)
+            for _ in editors:
+                await edit_queue.put(_DONE)
+            await asyncio.gather(*editors)
+
+        return sorted(results, key=lambda r: r.index)
+
+    async def _feed(self, file_paths, prepare_queue):
+        for index, file_path in enumerate(file_paths):
+            if self._cancelled:
+                break
+            await prepare_queue.put(StudioJob(index, file_path))
+        for _ in range(self.prepare_workers):
+            await prepare_queue.put(_DONE)
+
+    async def _prepare_worker(self, executor, prepare_queue, edit_queue, results):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await prepare_queue.get()
+            if job is _DONE:
+                return
+            if self._cancelled:
+                continue
+            try:
+                base, mask = await loop.run_in_executor(
+                    executor, self.prepare_fn, job.file_path
+                )
+            except Exception as e:
+                base, mask = str(e), None
+
+            if mask is None:
+                # prepare_fn คืนข้อความ Error มาแทนรูป
+                await self._emit(
+                    StudioResult(job.index, job.file_path, error=str(base)),
+                    results,
+                )
+                continue
+            await edit_queue.put((job, base, mask))
+
+    async def _edit_worker(self, edit_queue, results):
+        while True:
+            item = await edit_queue.get()
+            if item is _DONE:
+                return
+            job, base, mask = item
+            if self._cancelled:
+                continue
+            try:
+                output = await self.edit_fn(base, mask)
+            except Exception as e:
+                output = f"Error: {e}"
+
+            if isinstance(output, (bytes, bytearray)):
+                output = [output]
+            if isinstance(output, list) and output:
+                result = StudioResult(
+                    job.index, job.file_path, output_bytes=output[0], variants=output
+                )
+            else:
+                result = StudioResult(job.index, job.file_path, error=str(output))
+            await self._emit(result, results)
+
+    async def _emit(self, result, results):
+        if self._cancelled and result.error:
+            # งานที่ล้มเพราะถูกยกเลิก ไม่ต้องแจ้งเป็น Error
+            return
+        results.append(result)
+        if not self.on_result:
+            return
+        try:
+            callback_result = self.on_result(result)
+            if inspect.isawaitable(callback_result):
+                await callback_result
+        except Exception as e:
+            print(f"Studio result callback error: {e}")
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from src.core.history_store import HISTORY_IMG_DIR
+
+# Sidecar cache อยู่ใต้ history_images (ลบตามไปด้วยตอน Clear All)
+THUMB_DIR = os.path.join(HISTORY_IMG_DIR, ".thumbs")
+
+# ขนาดคงที่ (px ด้านยาวสุด) -> ขอขนาดอื่นจะถูกปัดขึ้นเป็นขนาดที่ใกล้ที่สุด
+THUMB_SIZE_SMALL = 128
+THUMB_SIZE_MEDIUM = 256
+THUMB_SIZE_LARGE = 512
+THUMB_SIZES = (THUMB_SIZE_SMALL, THUMB_SIZE_MEDIUM, THUMB_SIZE_LARGE)
+
+THUMB_QUALITY = 80
+
+
+class ThumbnailCache:
+    """
+    สร้างและเก็บ Thumbnail (WebP) ของรูปใน history_images
+    - Key = path + mtime + size ของไฟล์ต้นฉบับ (ไฟล์ถูกเขียนทับ -> ได้ Key ใหม่)
+    - สร้างใน Worker Pool เบื้องหลัง ไม่บล็อก UI
+    """
+
+    def __init__(self, cache_dir=THUMB_DIR, max_workers=2):
+        self.cache_dir = cache_dir
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="thumbnail"
+        )
+        self._lock = threading.Lock()
+        self._in_flight = {}  # {thumb_path: Future}
+
+    @staticmethod
+    def normalize_size(size):
+        for fixed in THUMB_SIZES:
+            if size <= fixed:
+                return fixed
+        return THUMB_SIZES[-1]
+
+    def thumb_path_for(self, image_path, size):
+        """คืนค่า path ของ Thumbnail (None ถ้าไม่มีไฟล์ต้นฉบับ)"""
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            return None
+        size = self.normalize_size(size)
+        raw_key = f"{os.path.abspath(image_path)}|{st.st_mtime_ns}|{st.st_size}"
+        key = hashlib.sha1(raw_key.encode("utf-8")).hexdigest()[:24]
+        return os.path.join(self.cache_dir, f"{key}_{size}.webp")
+
+    def get_cached(self, image_path, size):
+        """คืน path ถ้ามี Thumbnail แล้ว (ไม่สร้างใหม่)"""
+        thumb_path = self.thumb_path_for(image_path, size)
+        if thumb_path and os.path.exists(thumb_path):
+            return thumb_path
+        return None
+
+    def generate(self, image_path, size):
+        """สร้าง Thumbnail แบบ Sync (คืนค่า path หรือ None ถ้าไม่สำเร็จ)"""
+        thumb_path = self.thumb_path_for(image_path, size)
+        if not thumb_path:
+            return None
+        if os.path.exists(thumb_path):
+            return thumb_path
+
+        size = self.normalize_size(size)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with Image.open(image_path) as img:
+                # draft() ให้ JPEG decode ที่ขนาดเล็กได้เลย (PNG จะไม่มีผล)
+                img.draft("RGB", (size, size))
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail((size, size), Image.Resampling.LANCZOS)
+                if img.mode not in ("RGB", "RGBA"):
+                    img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+                # เขียนไฟล์ชั่วคราวก่อนแล้วค่อย rename (กันอ่านไฟล์ที่เขียนไม่เสร็จ)
+                tmp_path = f"{thumb_path}.{threading.get_ident()}.tmp"
+                img.save(tmp_path, format="WEBP", quality=THUMB_QUALITY, method=4)
+            os.replace(tmp_path, thumb_path)
+            return thumb_path
+        except Exception as e:
+            print(f"Error creating thumbnail for {image_path}: {e}")
+            return None
+
+    def request(self, image_path, size, callback=None):
+        """
+        ขอ Thumbnail แบบ Async
+        callback(thumb_path) จะถูกเรียกจาก Worker Thread เมื่อสร้างเสร็จ
+        """
+        thumb_path = self.thumb_path_for(image_path, size)
+        if not thumb_path or os.path.exists(thumb_path):
+            # ไม่มีไฟล์ต้นฉบับ (None) หรือมี Thumbnail อยู่แล้ว
+            if callback:
+                callback(thumb_path)
+            return None
+
+        with self._lock:
+            future = self._in_flight.get(thumb_path)
+            if future is None:
+                future = self._executor.submit(self.generate, image_path, size)
+                self._in_flight[thumb_path] = future
+                future.add_done_callback(lambda _: self._forget(thumb_path))
+
+        if callback:
+            future.add_done_callback(lambda f: callback(f.result()))
+        return future
+
+    def _forget(self, thumb_path):
+        with self._lock:
+            self._in_flight.pop(thumb_path, None)
+
+
+# --- Singleton ---
+_thumbnail_cache = None
+_thumbnail_lock = threading.Lock()
+
+
+def get_thumbnail_cache():
+    global _thumbnail_cache
+    with _thumbnail_lock:
+        if _thumbnail_cache is None:
+            _thumbnail_cache = ThumbnailCache()
+        return _thumbnail_cache
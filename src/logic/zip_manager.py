@@ -16,9 +16,10 @@ def create_images_zip(path, prompt_boxes):
     try:
         with zipfile.ZipFile(path, "w") as zipf:
             for i, box in enumerate(prompt_boxes):
-                if box.current_image_bytes:
+                image_bytes = box.get_image_bytes()
+                if image_bytes:
                     filename = f"image_{i+1}.png"
-                    zipf.writestr(filename, box.current_image_bytes)
+                    zipf.writestr(filename, image_bytes)
                     images_found += 1
 
         if images_found == 0:
@@ -46,8 +47,9 @@ def create_project_zip(path, prompt_boxes, input_files):
                 zipf.writestr(f"outputs/prompt_{i+1}.txt", box.prompt_text)
 
                 # Save Generated Image
-                if box.current_image_bytes:
-                    zipf.writestr(f"outputs/image_{i+1}.png", box.current_image_bytes)
+                image_bytes = box.get_image_bytes()
+                if image_bytes:
+                    zipf.writestr(f"outputs/image_{i+1}.png", image_bytes)
 
         return True, "บันทึก Full Project เรียบร้อย"
     except Exception as err:
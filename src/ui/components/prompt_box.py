@@ -1,6 +1,8 @@
 import flet as ft
 from src.core.styles import AppStyle
 from src.ui.components.toast import CustomToast
+from src.logic.thumbnails import get_thumbnail_cache, THUMB_SIZE_LARGE
+from src.core.asset_server import asset_url
 import base64
 
 
@@ -13,6 +15,8 @@ class PromptBox(ft.Container):
         self.toast = CustomToast(page)
 
         self.current_image_bytes = None
+        # รูปที่อยู่บน Disk (Gallery): โชว์แค่ Thumbnail และโหลดตัวเต็มเมื่อเปิด/ดาวน์โหลด
+        self.image_path = None
 
         # ... (ส่วน Setup UI: header, body, controls... เหมือนเดิมทุกอย่าง) ...
         # (ขอข้ามโค้ดส่วน UI Setup เพื่อความกระชับ ให้คงโค้ดเดิมไว้)
@@ -33,17 +37,18 @@ class PromptBox(ft.Container):
         self.margin = ft.margin.only(bottom=10)
 
         # (Header UI ... เหมือนเดิม)
+        self.index_text = ft.Text(
+            f"Prompt #{index}",
+            size=12,
+            weight=ft.FontWeight.BOLD,
+            color=AppStyle.TEXT_SECONDARY,
+        )
         self.header = ft.Container(
             bgcolor=AppStyle.PROMPT_HEADER_BG,
             padding=ft.padding.symmetric(horizontal=15, vertical=8),
             content=ft.Row(
                 controls=[
-                    ft.Text(
-                        f"Prompt #{index}",
-                        size=12,
-                        weight=ft.FontWeight.BOLD,
-                        color=AppStyle.TEXT_SECONDARY,
-                    ),
+                    self.index_text,
                     ft.Container(
                         content=ft.Row(
                             [
@@ -82,6 +87,20 @@ class PromptBox(ft.Container):
             fit=ft.ImageFit.CONTAIN,
             border_radius=8,
         )
+        # คลิกที่รูปเพื่อดูภาพขนาดเต็ม
+        self.image_holder = ft.Container(
+            content=self.image_control,
+            on_click=self.open_full_image,
+            tooltip="คลิกเพื่อดูภาพขนาดเต็ม",
+        )
+        self.full_image_dialog = ft.AlertDialog(
+            content=ft.Image(src_base64=None, fit=ft.ImageFit.CONTAIN),
+            actions=[
+                ft.TextButton(
+                    "ปิด", on_click=lambda e: self.page.close(self.full_image_dialog)
+                )
+            ],
+        )
         self.save_img_btn = ft.ElevatedButton(
             "Download Image",
             icon=AppStyle.ICON_SAVE,
@@ -110,7 +129,7 @@ class PromptBox(ft.Container):
                     ft.Container(height=10),
                     ft.Column(
                         [
-                            self.image_control,
+                            self.image_holder,
                             self.error_text,
                             ft.Container(height=5),
                             self.save_img_btn,
@@ -122,6 +141,25 @@ class PromptBox(ft.Container):
         )
         self.content = ft.Column(spacing=0, controls=[self.header, self.body])
 
+    def release(self):
+        """ถอด FilePicker ออกจาก Overlay (เรียกก่อนทิ้ง PromptBox)"""
+        if self.page and self.save_file_picker in self.page.overlay:
+            self.page.overlay.remove(self.save_file_picker)
+
+    def set_prompt_text(self, prompt_text, run_update=True):
+        """เปลี่ยนข้อความ Prompt (Streaming: เติมทีละ Token แล้ว update เป็นช่วงๆ)"""
+        self.prompt_text = prompt_text
+        self.text_content.value = prompt_text
+        if run_update:
+            self.update()
+
+    def set_index(self, index, run_update=True):
+        """เปลี่ยนลำดับของ Prompt (เช่น เรียงเลขใหม่หลังตัดกล่องที่ Error ทิ้ง)"""
+        self.index = index
+        self.index_text.value = f"Prompt #{index}"
+        if run_update:
+            self.update()
+
     def copy_to_clipboard(self, e):
         self.page.set_clipboard(self.prompt_text)
         self.toast.show("คัดลอก Prompt เรียบร้อย")
@@ -130,6 +168,7 @@ class PromptBox(ft.Container):
     def set_image(self, image_bytes, run_update=True):
         if image_bytes:
             self.current_image_bytes = image_bytes
+            self.image_path = None
             b64_img = base64.b64encode(image_bytes).decode("utf-8")
             self.image_control.src_base64 = b64_img
             self.image_control.visible = True
@@ -140,9 +179,76 @@ class PromptBox(ft.Container):
             if run_update:
                 self.update()
 
+    def set_image_file(
+        self, image_path, thumb_size=THUMB_SIZE_LARGE, run_update=True
+    ):
+        """โชว์รูปจากไฟล์ด้วย Thumbnail (ไม่โหลดรูปเต็มจนกว่าจะเปิดดู/ดาวน์โหลด)"""
+        self.current_image_bytes = None
+        self.image_path = image_path
+        self.save_img_btn.visible = True
+        self.error_text.visible = False
+
+        thumb_cache = get_thumbnail_cache()
+        thumb_path = thumb_cache.get_cached(image_path, thumb_size)
+        if thumb_path:
+            self.show_thumbnail(thumb_path, run_update=run_update)
+        else:
+            # ยังไม่มี Thumbnail -> สร้างใน Background แล้วค่อยโชว์
+            thumb_cache.request(
+                image_path,
+                thumb_size,
+                callback=lambda path: self.show_thumbnail(path, run_update=True),
+            )
+            if run_update:
+                self.update()
+
+    def show_thumbnail(self, thumb_path, run_update=True):
+        if not thumb_path:
+            return
+        try:
+            # อ้างอิงรูปผ่าน URL (ไม่ต้องส่ง bytes ผ่าน Websocket)
+            self.image_control.src_base64 = None
+            self.image_control.src = asset_url(thumb_path)
+            self.image_control.visible = True
+            if run_update and self.page:
+                self.update()
+        except Exception as e:
+            # Control อาจถูกถอดออกจากหน้าไปแล้ว (เช่น ลบ Card ระหว่างสร้าง Thumbnail)
+            print(f"Thumbnail display skipped: {e}")
+
+    def get_image_bytes(self):
+        """คืนค่ารูปขนาดเต็ม (อ่านจาก Disk ถ้าเป็นรูปจาก Gallery)"""
+        if self.current_image_bytes:
+            return self.current_image_bytes
+        if self.image_path:
+            try:
+                with open(self.image_path, "rb") as f:
+                    return f.read()
+            except Exception as e:
+                print(f"Error reading image {self.image_path}: {e}")
+        return None
+
+    def has_image(self):
+        return bool(self.current_image_bytes or self.image_path)
+
+    def open_full_image(self, e):
+        full_image = self.full_image_dialog.content
+        url = asset_url(self.image_path) if self.image_path else None
+        if url:
+            full_image.src_base64 = None
+            full_image.src = url
+        elif self.current_image_bytes:
+            full_image.src_base64 = base64.b64encode(self.current_image_bytes).decode(
+                "utf-8"
+            )
+        else:
+            return
+        self.page.open(self.full_image_dialog)
+
     # --- แก้ไขฟังก์ชันนี้: เพิ่ม run_update ---
     def set_error(self, error_message, run_update=True):
         self.current_image_bytes = None
+        self.image_path = None
         self.image_control.visible = False
         self.save_img_btn.visible = False
         self.error_text.value = f"⚠️ {error_message}"
@@ -153,7 +259,7 @@ class PromptBox(ft.Container):
 
     # ... (Save Logic เหมือนเดิม) ...
     def open_save_dialog(self, e):
-        if self.current_image_bytes:
+        if self.has_image():
             # 1. เช็คความชัวร์ว่า Picker อยู่ใน Overlay ไหม
             if self.save_file_picker not in self.page.overlay:
                 self.page.overlay.append(self.save_file_picker)
@@ -170,10 +276,10 @@ class PromptBox(ft.Container):
             )
 
     def on_save_file_result(self, e: ft.FilePickerResultEvent):
-        if e.path and self.current_image_bytes:
+        if e.path and self.has_image():
             try:
                 with open(e.path, "wb") as f:
-                    f.write(self.current_image_bytes)
+                    f.write(self.get_image_bytes())
                 self.toast.show(f"บันทึกรูปภาพเรียบร้อย")
             except Exception as err:
                 self.toast.show(f"บันทึกไม่สำเร็จ: {err}", is_error=True)
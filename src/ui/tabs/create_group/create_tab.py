@@ -6,17 +6,19 @@ import requests  # ใช้สำหรับดึงข้อมูลจา
 from src.core.key_manager import get_api_keys
 from src.core.history_manager import (
     save_to_history,
-    update_history_images,
+    queue_history_image,
+    flush_history,
     get_latest_history_id,
 )
 from src.core.styles import AppStyle
 from src.logic.zip_manager import create_images_zip, create_project_zip
+from src.logic.reference_images import get_reference_images, max_side_for
 
 # Providers
 from src.logic.providers.gemini_provider import GeminiProvider
 from src.logic.image_providers.gemini_image import GeminiImageProvider
 from src.logic.image_providers.pollinations import PollinationsProvider
-from src.logic.providers.ollama_provider import OllamaProvider
+from src.logic.providers.ollama_provider import OllamaProvider, format_prompt
 
 # Components & Parts
 from src.ui.components.toast import CustomToast
@@ -26,6 +28,9 @@ from src.ui.tabs.parts.config_part import ConfigPart
 from src.core.config import AI_MODELS_MAP, IMAGE_GEN_MODELS_MAP
 from src.core.ollama_manager import load_ollama_settings
 
+# ช่วงเวลา (วินาที) ระหว่างการ update UI ตอน Stream Prompt (กันส่ง Websocket ทุก Token)
+STREAM_UPDATE_INTERVAL = 0.1
+
 
 class CreateTab(ft.Column):
     def __init__(self, page: ft.Page):
@@ -211,7 +216,8 @@ class CreateTab(ft.Column):
                 self.ollama_provider.base_url = settings.get(
                     "base_url", "http://localhost:11434"
                 )
-                prompts = await self.ollama_provider.generate_prompts_from_image(
+                # Stream: สร้าง PromptBox รอไว้ แล้วเติมข้อความทีละ Token
+                prompts = await self.stream_ollama_prompts(
                     model=self.config_part.model_dropdown.value,
                     image_paths=self.input_part.selected_files,
                     user_input=self.input_part.prompt_input.value,
@@ -226,8 +232,9 @@ class CreateTab(ft.Column):
             if not prompts or (len(prompts) == 1 and "Error" in prompts[0]):
                 raise ValueError(prompts[0] if prompts else "No response")
 
-            for i, p in enumerate(prompts):
-                self.output_list.controls.append(PromptBox(self.page, p, i + 1))
+            if not self.output_list.controls:
+                for i, p in enumerate(prompts):
+                    self.output_list.controls.append(PromptBox(self.page, p, i + 1))
 
             self.current_history_id = save_to_history(
                 selected_provider,
@@ -236,7 +243,7 @@ class CreateTab(ft.Column):
                 self.input_part.selected_files,
                 prompts,
             )
-            self.page.pubsub.send_all("refresh_gallery")
+            # Gallery รับ Event "entry_added" จาก History Store เอง
             self.toast.show(f"สร้างสำเร็จ {len(prompts)} รายการ")
             self.config_part.generate_image_btn.visible = True
 
@@ -246,6 +253,72 @@ class CreateTab(ft.Column):
         finally:
             self.set_loading(False)
 
+    async def stream_ollama_prompts(
+        self, model, image_paths, user_input, style, ratio, count
+    ):
+        """
+        สร้าง PromptBox ทุก Variation ทันที แล้วเติม Token จาก Ollama แบบ Live
+        - ทุก Variation Stream พร้อมกัน / UI update ทุก STREAM_UPDATE_INTERVAL
+        - จบแล้วค่อยทำความสะอาด + จัดรูปแบบ (Style, Ratio) และตัดกล่องที่ Error ทิ้ง
+        """
+        self.status_text.value = "Waiting for first token..."
+        boxes = [PromptBox(self.page, "", i + 1) for i in range(count)]
+        self.output_list.controls.extend(boxes)
+        self.update_if_mounted()
+
+        images_b64 = await self.ollama_provider.prepare_images(image_paths)
+        texts = [""] * count
+        errors = [None] * count
+        dirty = set()
+
+        async def consume(index):
+            try:
+                async for token in self.ollama_provider.stream_prompt(
+                    model, user_input, index, images_b64
+                ):
+                    texts[index] += token
+                    boxes[index].set_prompt_text(texts[index], run_update=False)
+                    dirty.add(index)
+            except Exception as e:
+                errors[index] = f"Error: {e}"
+                boxes[index].set_error(errors[index], run_update=False)
+                dirty.add(index)
+
+        async def flush_loop():
+            while True:
+                await asyncio.sleep(STREAM_UPDATE_INTERVAL)
+                if dirty:
+                    dirty.clear()
+                    self.status_text.value = "Streaming prompts..."
+                    self.update_if_mounted()
+
+        print(f"Ollama streaming {count} prompts...")
+        flusher = asyncio.create_task(flush_loop())
+        try:
+            await asyncio.gather(*(consume(i) for i in range(count)))
+        finally:
+            flusher.cancel()
+
+        prompts = []
+        for box, text, error in zip(boxes, texts, errors):
+            if error or not text.strip():
+                # กรองกล่องที่ Error หรือว่างเปล่าทิ้ง (เหมือนแบบไม่ Stream)
+                box.release()
+                if box in self.output_list.controls:
+                    self.output_list.controls.remove(box)
+                continue
+            final_prompt = format_prompt(text, style, ratio)
+            box.set_prompt_text(final_prompt, run_update=False)
+            # เรียงเลขใหม่ให้ต่อกัน (ตรงกับลำดับที่บันทึกลง History)
+            box.set_index(len(prompts) + 1, run_update=False)
+            prompts.append(final_prompt)
+        self.update_if_mounted()
+
+        if not prompts:
+            first_error = next((err for err in errors if err), None)
+            return [first_error or "No prompts generated."]
+        return prompts
+
     # Step 2: Image Gen
     async def on_click_gen_images(self, e):
         prompt_boxes = [
@@ -270,6 +343,13 @@ class CreateTab(ft.Column):
         self.set_loading(True, "Generating Images...")
         self.update()
 
+        # เตรียมรูป Reference ครั้งเดียว แล้วส่งชุดเดียวกันให้ทุก Prompt
+        references = await asyncio.to_thread(
+            get_reference_images().prepare_all,
+            self.input_part.selected_files,
+            max_side_for("gemini"),
+        )
+
         tasks = []
         for i, box in enumerate(prompt_boxes):
             tasks.append(
@@ -278,33 +358,49 @@ class CreateTab(ft.Column):
                     prompt_box=box,
                     model=self.config_part.img_model_dropdown.value,
                     index=i + 1,
+                    references=references,
                 )
             )
 
         await asyncio.gather(*tasks)
+        # บันทึกรูปที่ยังค้างในคิวให้ครบก่อนจบ Batch
+        await asyncio.to_thread(flush_history)
         self.set_loading(False)
         self.toast.show("สร้างรูปภาพครบแล้ว!")
         self.download_all_btn.visible = True
         self.download_project_btn.visible = True
         self.update()
 
-    async def generate_single_image(self, provider, prompt_box, model, index=0):
+    async def generate_single_image(
+        self, provider, prompt_box, model, index=0, references=None
+    ):
         try:
             result = await provider.generate_image(
                 prompt=prompt_box.prompt_text,
                 model=model,
                 ref_image_paths=self.input_part.selected_files,
                 ratio=self.input_part.ratio_dropdown.value,
+                references=references,
             )
 
             if isinstance(result, bytes):
-                prompt_box.set_image(result)
                 target_id = self.current_history_id
                 if not target_id:
                     target_id = get_latest_history_id()
+                image_path = None
                 if target_id:
-                    update_history_images(target_id, index, result, image_model=model)
-                    self.page.pubsub.send_all("refresh_gallery")
+                    image_path = await asyncio.to_thread(
+                        queue_history_image,
+                        target_id,
+                        index,
+                        result,
+                        image_model=model,
+                    )
+                if image_path:
+                    # อ้างอิงไฟล์ผ่าน URL ไม่ต้องถือ bytes ไว้ใน Control
+                    prompt_box.set_image_file(image_path)
+                else:
+                    prompt_box.set_image(result)
             elif isinstance(result, str):
                 prompt_box.set_error(result)
         except Exception as e:
@@ -312,6 +408,13 @@ class CreateTab(ft.Column):
             prompt_box.set_error(f"App Error: {str(e)}")
 
     # Helpers
+    def update_if_mounted(self):
+        """update() แบบไม่ล้ม ถ้าผู้ใช้สลับ Tab ไประหว่างงาน Async"""
+        try:
+            self.update()
+        except Exception as e:
+            print(f"Create tab update skipped: {e}")
+
     def set_loading(self, is_loading, text=""):
         self.config_part.generate_text_btn.disabled = is_loading
         self.config_part.generate_image_btn.disabled = is_loading
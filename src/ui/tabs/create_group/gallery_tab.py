@@ -1,36 +1,98 @@
+import threading
+
 import flet as ft
 from src.core.history_manager import (
-    load_history,
+    query_history,
+    search_history,
+    get_history_item,
+    touch_history_item,
+    flush_history,
     delete_history_item,
     clear_all_history,
+    subscribe_history_changes,
+    unsubscribe_history_changes,
+)
+from src.core.history_events import (
+    ENTRY_ADDED,
+    IMAGE_ADDED,
+    ENTRY_DELETED,
+    HISTORY_CLEARED,
 )
 from src.core.styles import AppStyle
 from src.ui.components.toast import CustomToast
 from src.ui.components.prompt_box import PromptBox
 from src.logic.zip_manager import create_zip_from_history_item
 
+# จำนวน entry ต่อ 1 หน้า (โหลดเพิ่มเมื่อเลื่อนใกล้ท้าย List)
+PAGE_SIZE = 20
+# ระยะ (px) จากท้าย List ที่จะเริ่มโหลดหน้าถัดไป
+LOAD_MORE_THRESHOLD = 600
+# พับ Card แล้วทิ้งเนื้อหา (Prompt/รูป) เพื่อคืน Memory
+FREE_COLLAPSED_BODIES = True
+
 
 class GalleryTab(ft.Column):
     def __init__(self, page: ft.Page):
         super().__init__()
         self.page = page
         self.expand = True
-        self.scroll = ft.ScrollMode.AUTO
         self.toast = CustomToast(page)
         self.item_to_delete = None
         self.item_to_zip = None
 
         # เก็บ References ของ Card ไว้เพื่อลบเฉพาะจุดได้ {history_id: card_control}
         self.cards_map = {}
+        # สถานะการแบ่งหน้า (keyset: โหลดรายการที่ id เก่ากว่าตัวสุดท้ายที่มี)
+        self.oldest_loaded_id = None
+        self.has_more = False
+        self.is_loading_page = False
+        # คำค้นที่ใช้อยู่ ("" = แสดงทั้งหมด)
+        # ผลค้นหาเรียงตามความตรง (ไม่ใช่ id) จึงแบ่งหน้าด้วย offset แทน
+        self.search_text = ""
+        self.search_offset = 0
+        # กัน Thread ที่สร้างเนื้อหา Card ชนกับการพับ/กาง Card
+        self.card_body_lock = threading.Lock()
+        # ทุกงานที่แก้ history_list / cards_map ต้องถือ Lock นี้
+        # (Event จาก Store มาจาก Thread ของผู้เขียน -> เข้าคิวแล้วให้ Drain ตัวเดียวทำ)
+        self.list_lock = threading.RLock()
+        self.pending_events = []
+        self.pending_lock = threading.Lock()
+        self.drain_scheduled = False
 
         # 1. สร้าง Picker
         self.save_zip_picker = ft.FilePicker(on_result=self.on_save_zip_result)
         self.page.overlay.append(self.save_zip_picker)
 
-        self.history_list = ft.Column(spacing=20)
+        # ListView จะ Render เฉพาะ Card ที่อยู่ในจอ และโหลดหน้าถัดไปเมื่อเลื่อนถึงท้าย
+        self.history_list = ft.ListView(
+            spacing=20,
+            expand=True,
+            on_scroll=self.on_list_scroll,
+            on_scroll_interval=100,
+        )
+        self.load_more_footer = ft.Container(
+            content=ft.TextButton(
+                "โหลดเพิ่ม", icon=ft.Icons.EXPAND_MORE, on_click=self.load_next_page
+            ),
+            alignment=ft.alignment.center,
+        )
         self.no_data_text = ft.Text(
             "ยังไม่มีประวัติการสร้าง", size=16, color=AppStyle.TEXT_SECONDARY
         )
+        self.search_field = ft.TextField(
+            hint_text="ค้นหา Prompt / ข้อความ / Provider / Model",
+            prefix_icon=ft.Icons.SEARCH,
+            dense=True,
+            expand=True,
+            on_submit=self.on_search,
+            on_change=self.on_search_change,
+            suffix=ft.IconButton(
+                ft.Icons.CLOSE,
+                icon_size=16,
+                tooltip="ล้างคำค้น",
+                on_click=self.clear_search,
+            ),
+        )
 
         self.clear_btn = ft.ElevatedButton(
             "Clear All",
@@ -42,7 +104,7 @@ class GalleryTab(ft.Column):
             icon=AppStyle.ICON_REFRESH,
             tooltip="โหลดข้อมูลใหม่",
             icon_color=AppStyle.BTN_PRIMARY,
-            on_click=lambda _: self.refresh_gallery(force=True),
+            on_click=lambda _: self.refresh_gallery(),
         )
 
         self.controls = [
@@ -61,6 +123,7 @@ class GalleryTab(ft.Column):
                 ],
                 alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
             ),
+            ft.Row([self.search_field]),
             ft.Divider(),
             self.history_list,
         ]
@@ -96,58 +159,216 @@ class GalleryTab(ft.Column):
         )
 
     def did_mount(self):
-        self.refresh_gallery(force=True)
-        self.page.pubsub.subscribe(self.on_message)
+        self.refresh_gallery()
+        # รับ Change Event จาก History Store โดยตรง (1 ชุดต่อ 1 Transaction)
+        subscribe_history_changes(self.on_history_events)
 
     def will_unmount(self):
-        self.page.pubsub.unsubscribe_all()
-
-    def on_message(self, message):
-        if message == "refresh_gallery":
-            # โหลดแบบเงียบๆ ไม่ต้อง Force Clear
-            self.refresh_gallery(force=False)
+        unsubscribe_history_changes(self.on_history_events)
 
-    def refresh_gallery(self, force=False):
+    def on_history_events(self, events):
+        """
+        Listener ของ Store: ถูกเรียกจาก Thread ที่เขียน (Writer / to_thread)
+        -> แค่เข้าคิว แล้วให้ Drain ตัวเดียวเป็นคนแก้ UI
+        """
+        with self.pending_lock:
+            self.pending_events.extend(events)
+            if self.drain_scheduled:
+                return
+            self.drain_scheduled = True
+        self.page.run_thread(self.drain_history_events)
+
+    def drain_history_events(self):
+        """Patch เฉพาะ Card ที่ได้รับผลกระทบ (ไม่อ่าน History ใหม่)"""
+        with self.list_lock:
+            while True:
+                with self.pending_lock:
+                    events = self.pending_events
+                    self.pending_events = []
+                    if not events:
+                        self.drain_scheduled = False
+                        break
+                for event in events:
+                    self.apply_history_event(event)
+            self.show_empty_state_if_needed()
+            try:
+                self.update()
+            except Exception as e:
+                print(f"Gallery update skipped: {e}")
+
+    def apply_history_event(self, event):
+        if event.kind == ENTRY_ADDED:
+            self.patch_card(event.entry_id, event.payload)
+        elif event.kind == IMAGE_ADDED:
+            self.apply_image_added(event.entry_id, event.payload)
+        elif event.kind == ENTRY_DELETED:
+            self.patch_card(event.entry_id, None)
+        elif event.kind == HISTORY_CLEARED:
+            self.reset_cards()
+            self.has_more = False
+
+    def apply_image_added(self, entry_id, payload):
+        card = self.cards_map.get(entry_id)
+        if not card:
+            return  # Card ยังไม่ถูกโหลด (อยู่หน้าที่ยังไม่ได้เลื่อนไปถึง)
+        parts = card.data
+
+        if payload.get("image_model") and not parts["has_image_badge"]:
+            parts["info_row"].controls.append(
+                self.create_image_model_badge(payload["image_model"])
+            )
+            parts["has_image_badge"] = True
+
+        # ถ้ากาง Card อยู่ -> ใส่รูปให้ PromptBox ตัวนั้นเลย (ถ้ายังไม่กาง จะโหลดตอนกาง)
+        with self.card_body_lock:
+            if not parts["body_state"]["built"]:
+                return
+            for control in parts["prompts_col"].controls:
+                if isinstance(control, PromptBox) and control.index == payload["index"]:
+                    control.set_image_file(payload["path"], run_update=False)
+                    break
+
+    def refresh_gallery(self):
         """
-        Smart Refresh:
-        - force=True: ลบทุกอย่างแล้วโหลดใหม่ (ใช้ตอนเปิดแอพ หรือกดปุ่ม Refresh)
-        - force=False: (ใช้ตอน Auto Update) จะเช็คก่อนว่ามีอะไรใหม่ไหม ถ้ามีแค่เพิ่มเข้าไป
+        ลบทุกอย่างแล้วโหลดหน้าแรกใหม่ (ตอนเปิด Tab / กดปุ่ม Refresh / ค้นหาใหม่)
+        การเปลี่ยนแปลงระหว่างใช้งานมาทาง Event ของ Store (drain_history_events)
         """
-        data = load_history()
+        with self.list_lock:
+            self.reset_cards()
+            self.has_more = True
+            self.load_next_page()
+
+    def load_next_page(self, e=None):
+        with self.list_lock:
+            self._load_next_page()
+
+    def _load_next_page(self):
+        if self.is_loading_page or not self.has_more:
+            return
+        self.is_loading_page = True
+        try:
+            if self.search_text:
+                page_items = search_history(
+                    self.search_text, offset=self.search_offset, limit=PAGE_SIZE
+                )
+                self.search_offset += len(page_items)
+            else:
+                filters = {}
+                if self.oldest_loaded_id is not None:
+                    filters["before_id"] = self.oldest_loaded_id
+                page_items = query_history(limit=PAGE_SIZE, filters=filters)
+
+            self.remove_list_footer()
+            for item in page_items:
+                if item["id"] not in self.cards_map:
+                    self.add_card_to_ui(item)
+            if page_items:
+                self.oldest_loaded_id = page_items[-1]["id"]
+            self.has_more = len(page_items) == PAGE_SIZE
+
+            if self.has_more:
+                # เผื่อกรณีหน้าแรกสั้นกว่าจอ (ไม่มี Scroll Event) ให้กดโหลดเพิ่มเองได้
+                self.history_list.controls.append(self.load_more_footer)
+            self.show_empty_state_if_needed()
+            self.update()
+        finally:
+            self.is_loading_page = False
+
+    def on_search(self, e):
+        text = self.search_field.value.strip()
+        if text == self.search_text:
+            return
+        self.search_text = text
+        self.no_data_text.value = (
+            "ไม่พบรายการที่ค้นหา" if text else "ยังไม่มีประวัติการสร้าง"
+        )
+        self.refresh_gallery()
+
+    def on_search_change(self, e):
+        # ลบคำค้นจนว่าง -> กลับไปแสดงทั้งหมดทันที (ค้นหาจริงตอนกด Enter)
+        if not self.search_field.value.strip() and self.search_text:
+            self.on_search(e)
 
-        if not data:
+    def clear_search(self, e):
+        self.search_field.value = ""
+        self.search_field.update()
+        self.on_search(e)
+
+    def on_list_scroll(self, e: ft.OnScrollEvent):
+        if not self.has_more or self.is_loading_page:
+            return
+        if e.pixels >= e.max_scroll_extent - LOAD_MORE_THRESHOLD:
+            self.load_next_page()
+
+    def remove_list_footer(self):
+        """ลบ Text "ไม่มีข้อมูล" / ปุ่มโหลดเพิ่ม ที่อยู่ท้าย List"""
+        card_ids = {id(card) for card in self.cards_map.values()}
+        self.history_list.controls = [
+            c for c in self.history_list.controls if id(c) in card_ids
+        ]
+
+    def reset_cards(self):
+        """ล้าง Card ทั้งหมดใน List (คืน FilePicker ของ Card ที่กางอยู่ก่อนทิ้ง)"""
+        for card in self.cards_map.values():
+            self.release_card(card)
+        self.history_list.controls.clear()
+        self.cards_map = {}
+        self.oldest_loaded_id = None
+        self.search_offset = 0
+
+    def release_card(self, card):
+        """Card ถูกลบ/แทนที่ -> คืน FilePicker ของ PromptBox ในเนื้อหา"""
+        parts = card.data
+        with self.card_body_lock:
+            # งานสร้างเนื้อหาที่ยังค้างอยู่จะเห็น generation ใหม่แล้วทิ้งผลเอง
+            parts["body_state"]["built"] = False
+            parts["body_state"]["generation"] += 1
+            self.release_card_body(parts["prompts_col"], run_update=False)
+
+    def show_empty_state_if_needed(self):
+        if not self.cards_map and not self.has_more:
             self.history_list.controls.clear()
             self.history_list.controls.append(
                 ft.Container(
                     content=self.no_data_text, alignment=ft.alignment.center, padding=50
                 )
             )
-            self.cards_map = {}
-            self.update()
-            return
 
-        # เอา Text "ไม่มีข้อมูล" ออก ถ้ามีข้อมูลมาแล้ว
-        if len(self.history_list.controls) == 1 and isinstance(
-            self.history_list.controls[0].content, ft.Text
+    def patch_card(self, entry_id, item):
+        """อัปเดต Card ของ entry เดียว (เพิ่ม / แทนที่ / ลบ)"""
+        old_card = self.cards_map.get(entry_id)
+        if item is None:
+            # ถูกลบไปแล้ว
+            if old_card in self.history_list.controls:
+                self.history_list.controls.remove(old_card)
+            if self.search_text and entry_id in self.cards_map:
+                self.search_offset -= 1  # ผลค้นหาที่เหลือเลื่อนขึ้นมา 1 ตำแหน่ง
+            if old_card:
+                self.release_card(old_card)
+            self.cards_map.pop(entry_id, None)
+        elif old_card in self.history_list.controls:
+            # มีอยู่แล้ว -> สร้าง Card ใหม่แทนที่ตำแหน่งเดิม
+            index = self.history_list.controls.index(old_card)
+            self.history_list.controls.remove(old_card)
+            self.release_card(old_card)
+            self.add_card_to_ui(item, index=index)
+        elif self.search_text:
+            # กำลังดูผลค้นหา -> ไม่แทรกรายการใหม่ (กด Refresh / ค้นใหม่เพื่ออัปเดตผล)
+            return
+        elif (
+            self.oldest_loaded_id is None
+            or entry_id > self.oldest_loaded_id
+            or not self.has_more
         ):
-            self.history_list.controls.clear()
-
-        if force:
-            # แบบเดิม: ลบสร้างใหม่หมด (อาจกระพริบ แต่ชัวร์)
-            self.history_list.controls.clear()
-            self.cards_map = {}
-            for item in data:
-                self.add_card_to_ui(item)
-        else:
-            # แบบใหม่: Smart Add (เพิ่มเฉพาะตัวที่ยังไม่มี)
-            # data[0] คือตัวใหม่สุด
-            # เช็คว่า ID ของตัวใหม่สุด มีอยู่ใน UI หรือยัง
-            newest_item = data[0]
-            if newest_item["id"] not in self.cards_map:
-                # ถ้ายังไม่มี ให้แทรกไว้บนสุด (index 0)
-                self.add_card_to_ui(newest_item, index=0)
-
-        self.update()
+            # ตัวใหม่ที่อยู่ในช่วงที่โหลดแล้ว -> แทรกตามลำดับ id (ใหม่สุดก่อน)
+            self.remove_list_footer()
+            index = sum(1 for other_id in self.cards_map if other_id > entry_id)
+            self.add_card_to_ui(item, index=index)
+            if self.oldest_loaded_id is None:
+                self.oldest_loaded_id = entry_id
+            if self.has_more:
+                self.history_list.controls.append(self.load_more_footer)
+        # ถ้าเก่ากว่าหน้าที่โหลดไว้ -> ปล่อยให้ load_next_page ดึงมาเอง
 
     def add_card_to_ui(self, item, index=None):
         card = self.create_history_card(item)
@@ -159,23 +380,10 @@ class GalleryTab(ft.Column):
             self.history_list.controls.append(card)
 
     def create_history_card(self, item):
+        # เนื้อหา (Prompt + รูป) จะสร้างตอนกางครั้งแรกเท่านั้น -> ตอนนี้สร้างแค่ Header
         prompts_col = ft.Column()
-        img_map = {}
-        if "generated_images" in item:
-            for img in item["generated_images"]:
-                img_map[img["index"]] = img["path"]
-
-        for i, p in enumerate(item["prompts"]):
-            idx = i + 1
-            pbox = PromptBox(self.page, prompt_text=p, index=idx)
-            if idx in img_map:
-                try:
-                    with open(img_map[idx], "rb") as f:
-                        img_bytes = f.read()
-                        pbox.set_image(img_bytes, run_update=False)
-                except:
-                    pass
-            prompts_col.controls.append(pbox)
+        # generation เพิ่มทุกครั้งที่กาง/พับ -> ผลสร้างที่ช้ากว่ารอบปัจจุบันจะถูกทิ้ง
+        body_state = {"built": False, "generation": 0}
 
         # Badges
         model_badges = [
@@ -191,18 +399,24 @@ class GalleryTab(ft.Column):
             )
         ]
         if item.get("image_model"):
-            model_badges.append(
-                ft.Container(
-                    content=ft.Text(
-                        f"Img: {item['image_model']}",
-                        size=10,
-                        color="onTertiaryContainer",
-                    ),
-                    bgcolor="tertiaryContainer",
-                    padding=5,
-                    border_radius=5,
-                )
-            )
+            model_badges.append(self.create_image_model_badge(item["image_model"]))
+
+        info_row = ft.Row(
+            [
+                ft.Icon(
+                    ft.Icons.ACCESS_TIME,
+                    size=16,
+                    color=AppStyle.TEXT_SECONDARY,
+                ),
+                ft.Text(
+                    item["timestamp"],
+                    color=AppStyle.TEXT_SECONDARY,
+                    size=12,
+                ),
+                ft.Container(width=5),
+                *model_badges,
+            ]
+        )
 
         card = ft.Card(
             content=ft.Container(
@@ -211,22 +425,7 @@ class GalleryTab(ft.Column):
                     [
                         ft.Row(
                             [
-                                ft.Row(
-                                    [
-                                        ft.Icon(
-                                            ft.Icons.ACCESS_TIME,
-                                            size=16,
-                                            color=AppStyle.TEXT_SECONDARY,
-                                        ),
-                                        ft.Text(
-                                            item["timestamp"],
-                                            color=AppStyle.TEXT_SECONDARY,
-                                            size=12,
-                                        ),
-                                        ft.Container(width=5),
-                                        *model_badges,
-                                    ]
-                                ),
+                                info_row,
                                 ft.Row(
                                     [
                                         ft.IconButton(
@@ -266,13 +465,107 @@ class GalleryTab(ft.Column):
                             ),
                             controls=[prompts_col],
                             initially_expanded=False,
+                            on_change=lambda e: self.on_card_toggle(
+                                e, item["id"], prompts_col, body_state
+                            ),
                         ),
                     ]
                 ),
             )
         )
+        # เก็บ Reference ไว้ Patch ตาม Event โดยไม่ต้องสร้าง Card ใหม่
+        card.data = {
+            "info_row": info_row,
+            "prompts_col": prompts_col,
+            "body_state": body_state,
+            "has_image_badge": bool(item.get("image_model")),
+        }
         return card
 
+    def create_image_model_badge(self, image_model):
+        return ft.Container(
+            content=ft.Text(
+                f"Img: {image_model}",
+                size=10,
+                color="onTertiaryContainer",
+            ),
+            bgcolor="tertiaryContainer",
+            padding=5,
+            border_radius=5,
+        )
+
+    # --- Lazy Card Body ---
+    def on_card_toggle(self, e, entry_id, prompts_col, body_state):
+        is_expanded = e.data == "true"
+        with self.card_body_lock:
+            if is_expanded and not body_state["built"]:
+                body_state["built"] = True
+                body_state["generation"] += 1
+                generation = body_state["generation"]
+                prompts_col.controls = [
+                    ft.Container(
+                        content=ft.ProgressRing(width=24, height=24),
+                        alignment=ft.alignment.center,
+                        padding=20,
+                    )
+                ]
+            elif not is_expanded and FREE_COLLAPSED_BODIES and body_state["built"]:
+                # พับแล้วคืน Memory (กางใหม่จะสร้างใหม่)
+                body_state["built"] = False
+                body_state["generation"] += 1
+                self.release_card_body(prompts_col)
+                return
+            else:
+                return
+        prompts_col.update()
+        # สร้าง PromptBox ใน Background (ไม่บล็อก UI)
+        self.page.run_thread(
+            self.build_card_body, entry_id, prompts_col, body_state, generation
+        )
+
+    def build_card_body(self, entry_id, prompts_col, body_state, generation):
+        # ดึงข้อมูลล่าสุด (อาจมีรูปเพิ่มหลังสร้าง Card)
+        item = get_history_item(entry_id)
+        if not item:
+            return
+        # เปิดดูแล้ว -> ถูกลบทีหลังสุดเมื่อเกิน Disk Budget
+        touch_history_item(entry_id)
+
+        img_map = {}
+        if "generated_images" in item:
+            for img in item["generated_images"]:
+                img_map[img["index"]] = img["path"]
+
+        boxes = []
+        for i, p in enumerate(item["prompts"]):
+            idx = i + 1
+            pbox = PromptBox(self.page, prompt_text=p, index=idx)
+            if idx in img_map:
+                # โชว์ Thumbnail (ไม่อ่านรูปเต็มจนกว่าจะเปิดดู/ดาวน์โหลด)
+                pbox.set_image_file(img_map[idx], run_update=False)
+            boxes.append(pbox)
+
+        with self.card_body_lock:
+            if not body_state["built"] or body_state["generation"] != generation:
+                # Card ถูกพับ (หรือกางใหม่) ระหว่างสร้าง -> ทิ้งผลนี้ และคืน FilePicker
+                for pbox in boxes:
+                    pbox.release()
+                return
+            prompts_col.controls = boxes
+        try:
+            prompts_col.update()
+        except Exception as e:
+            # Card ถูกลบ/ถอดออกไประหว่างสร้าง
+            print(f"Card body update skipped: {e}")
+
+    def release_card_body(self, prompts_col, run_update=True):
+        for control in prompts_col.controls:
+            if isinstance(control, PromptBox):
+                control.release()
+        prompts_col.controls = []
+        if run_update:
+            prompts_col.update()
+
     # ... (Zip Logic เหมือนเดิม) ...
     def download_project_zip(self, item):
         self.item_to_zip = item
@@ -281,7 +574,10 @@ class GalleryTab(ft.Column):
 
     def on_save_zip_result(self, e):
         if e.path and self.item_to_zip:
-            success, msg = create_zip_from_history_item(e.path, self.item_to_zip)
+            # Flush รูปที่ค้างในคิวก่อน แล้วดึงข้อมูลล่าสุดมา Export
+            flush_history()
+            item = get_history_item(self.item_to_zip["id"]) or self.item_to_zip
+            success, msg = create_zip_from_history_item(e.path, item)
             self.toast.show(msg, is_error=not success)
             self.item_to_zip = None
 
@@ -299,32 +595,18 @@ class GalleryTab(ft.Column):
         target_id = self.item_to_delete
         if target_id:
             # 1. ลบจาก Database/File
-            delete_history_item(target_id)
-
-            # 2. ลบเฉพาะ Card นั้นออกจาก UI (ไม่ต้อง refresh_gallery ทั้งหมด)
-            if target_id in self.cards_map:
-                card_to_remove = self.cards_map[target_id]
-                try:
-                    self.history_list.controls.remove(card_to_remove)
-                    del self.cards_map[target_id]  # ลบออกจาก Map ด้วย
-
-                    # ถ้าลบจนหมดเกลี้ยง ให้โชว์ Text ว่าง
-                    if not self.history_list.controls:
-                        self.history_list.controls.append(
-                            ft.Container(
-                                content=self.no_data_text,
-                                alignment=ft.alignment.center,
-                                padding=50,
-                            )
-                        )
-
+            if delete_history_item(target_id):
+                with self.list_lock:
+                    # 2. เอา Card ออกเลย (Event "entry_deleted" ที่ตามมาจะข้ามไป)
+                    self.patch_card(target_id, None)
+                    # ถ้าลบจนหมดหน้า ให้โหลดหน้าถัดไป / ถ้าหมดจริงให้โชว์ Text ว่าง
+                    if not self.cards_map and self.has_more:
+                        self.load_next_page()
+                    self.show_empty_state_if_needed()
                     self.history_list.update()  # อัปเดตแค่ List
-                    self.toast.show("ลบรายการเรียบร้อย")
-                except ValueError:
-                    # กันเหนียวเผื่อหาไม่เจอจริงๆ ค่อยโหลดใหม่
-                    self.refresh_gallery(force=True)
+                self.toast.show("ลบรายการเรียบร้อย")
             else:
-                self.refresh_gallery(force=True)
+                self.refresh_gallery()
 
         self.page.close(self.delete_confirm_dialog)
 
@@ -333,13 +615,14 @@ class GalleryTab(ft.Column):
 
     def confirm_clear_all(self, e):
         clear_all_history()
-        self.history_list.controls.clear()
-        self.cards_map = {}
-        self.history_list.controls.append(
-            ft.Container(
-                content=self.no_data_text, alignment=ft.alignment.center, padding=50
+        with self.list_lock:
+            self.reset_cards()
+            self.has_more = False
+            self.history_list.controls.append(
+                ft.Container(
+                    content=self.no_data_text, alignment=ft.alignment.center, padding=50
+                )
             )
-        )
-        self.history_list.update()
+            self.history_list.update()
         self.toast.show("ลบประวัติทั้งหมดเรียบร้อย")
         self.page.close(self.clear_all_confirm_dialog)
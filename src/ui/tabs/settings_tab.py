@@ -1,10 +1,12 @@
 import flet as ft
-import httpx
+from src.core.http_clients import get_http_client
 from src.core.config import AI_MODELS_MAP, IMAGE_GEN_MODELS_MAP
 from src.ui.components.toast import CustomToast
 from src.core.key_manager import save_api_keys, get_api_keys
 from src.core.styles import AppStyle
 from src.core.ollama_manager import load_ollama_settings, save_ollama_settings
+from src.core.storage_manager import load_storage_settings, save_storage_settings
+from src.core.history_maintenance import get_history_maintenance
 
 
 class SettingsTab(ft.Column):
@@ -69,7 +71,34 @@ class SettingsTab(ft.Column):
             # scroll=ft.ScrollMode.AUTO  <--- ลบบรรทัดนี้ทิ้ง! Container scroll ไม่ได้
         )
 
-        # --- 3. Main Action Buttons ---
+        # --- 3. History Storage ---
+        self.storage_settings = load_storage_settings()
+        self.budget_field = ft.TextField(
+            label="Disk Budget (MB)",
+            value=str(self.storage_settings["disk_budget_mb"]),
+            icon=ft.Icons.STORAGE,
+            keyboard_type=ft.KeyboardType.NUMBER,
+            expand=True,
+            helper_text="0 = ไม่จำกัด (เกินแล้วจะลบรายการที่ไม่ได้เปิดดูนานที่สุดก่อน)",
+        )
+        self.retention_field = ft.TextField(
+            label="Retention (Days)",
+            value=str(self.storage_settings["retention_days"]),
+            icon=ft.Icons.HISTORY,
+            keyboard_type=ft.KeyboardType.NUMBER,
+            expand=True,
+            helper_text="0 = เก็บตลอดไป",
+        )
+        self.auto_cleanup_switch = ft.Switch(
+            label="Auto Cleanup (Background)",
+            value=self.storage_settings["auto_cleanup"],
+        )
+        self.cleanup_btn = ft.ElevatedButton(
+            "Clean Up Now", icon=ft.Icons.CLEANING_SERVICES, on_click=self.run_cleanup
+        )
+        self.cleanup_status = ft.Text("", size=12, color=ft.Colors.GREY_400)
+
+        # --- 4. Main Action Buttons ---
         self.save_btn = ft.ElevatedButton(
             text="Save All Settings",
             icon=ft.Icons.SAVE,
@@ -79,7 +108,7 @@ class SettingsTab(ft.Column):
             ),
         )
 
-        # --- 4. Tables (Read-only info) ---
+        # --- 5. Tables (Read-only info) ---
         self.text_model_table = self.create_model_table(
             AI_MODELS_MAP, "Supported Cloud Models (Text)"
         )
@@ -123,6 +152,23 @@ class SettingsTab(ft.Column):
                     ),
                 )
             ),
+            ft.Container(height=10),
+            ft.Card(
+                content=ft.Container(
+                    padding=20,
+                    content=ft.Column(
+                        [
+                            ft.Text("History Storage", size=18, weight="bold"),
+                            ft.Row([self.budget_field, self.retention_field]),
+                            ft.Row(
+                                [self.auto_cleanup_switch, self.cleanup_btn],
+                                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                            ),
+                            self.cleanup_status,
+                        ]
+                    ),
+                )
+            ),
             ft.Container(height=20),
             ft.Row([self.save_btn], alignment=ft.MainAxisAlignment.CENTER),
             ft.Divider(height=40),
@@ -192,8 +238,8 @@ class SettingsTab(ft.Column):
         self.update()
 
         try:
-            async with httpx.AsyncClient(timeout=3.0) as client:
-                response = await client.get(url)
+            client = get_http_client("ollama")
+            response = await client.get(url, timeout=3.0)
 
             if response.status_code == 200:
                 data = response.json()
@@ -247,8 +293,20 @@ class SettingsTab(ft.Column):
             ollama_success = False
             print(ex)
 
-        # 3. Feedback
-        if keys_success and ollama_success:
+        # 3. Save Storage Config
+        try:
+            storage_success = save_storage_settings(
+                int(self.budget_field.value or 0),
+                int(self.retention_field.value or 0),
+                self.auto_cleanup_switch.value,
+            )
+        except ValueError:
+            storage_success = False
+            self.toast.show("Disk Budget / Retention ต้องเป็นตัวเลข", is_error=True)
+            return
+
+        # 4. Feedback
+        if keys_success and ollama_success and storage_success:
             self.toast.show("บันทึกการตั้งค่าทั้งหมดเรียบร้อย!")
             # อัปเดต UI field เผื่อ auto-fill
             self.image_key_field.value = img_key
@@ -256,6 +314,24 @@ class SettingsTab(ft.Column):
         else:
             self.toast.show("เกิดข้อผิดพลาดในการบันทึก", is_error=True)
 
+    def run_cleanup(self, e):
+        self.cleanup_btn.disabled = True
+        self.cleanup_status.value = "กำลังจัดการพื้นที่..."
+        self.update()
+        # รันใน Background (โฟลเดอร์ใหญ่ใช้เวลานาน) แล้วค่อยแสดงผล
+        get_history_maintenance().run_in_background(self.on_cleanup_done)
+
+    def on_cleanup_done(self, report):
+        self.cleanup_btn.disabled = False
+        if report:
+            self.cleanup_status.value = report.summary()
+        else:
+            self.cleanup_status.value = "ไม่สำเร็จ หรือมีรอบอื่นทำงานอยู่ (ลองใหม่ภายหลัง)"
+        try:
+            self.update()
+        except Exception as ex:
+            print(f"Settings update skipped: {ex}")
+
     def create_model_table(self, data_map, title):
         rows = []
         for provider, models in data_map.items():
@@ -1,14 +1,43 @@
 import flet as ft
 import asyncio
+import base64
+import functools
 import io
-from rembg import remove, new_session  # Import new_session เพิ่ม
+import os
+import time
 from PIL import Image
 from src.core.styles import AppStyle
 from src.ui.components.toast import CustomToast
 from src.core.key_manager import get_api_keys
 from src.logic.image_providers.gemini_image import GeminiImageProvider
 from src.core.template_manager import load_templates, save_templates
-from src.core.config import IMAGE_EDIT_MODELS_MAP
+from src.core.config import (
+    IMAGE_EDIT_MODELS_MAP,
+    STUDIO_OUTPUT_DIR,
+    SEGMENTATION_TIERS,
+    DEFAULT_SEGMENTATION_TIER,
+)
+from src.core.asset_server import asset_url
+from src.logic.compositing import (
+    load_background,
+    load_preview_background,
+    compose_product,
+    encode_png,
+    EDGE_MARGIN,
+    PREVIEW_SIZE,
+)
+from src.logic.studio_pipeline import StudioPipeline
+from src.logic.background_cache import get_background_cache, background_model_for
+from src.logic.segmentation_cache import get_segmentation_cache
+from src.logic.segmentation_service import model_for_tier, input_size_for_tier
+from src.logic.segmentation_workers import (
+    get_segmentation_workers,
+    SegmentationCancelled,
+)
+from src.logic.matting import guided_upsample, apply_alpha
+
+# ขนาดด้านยาวสุดก่อนส่งเข้าโมเดลตัดพื้นหลัง (เป็นส่วนหนึ่งของ Cache Key)
+MAX_INPUT_SIDE = 1500
 
 
 class VirtualStudioTab(ft.Column):
@@ -23,10 +52,17 @@ class VirtualStudioTab(ft.Column):
 
         self.selected_files = []
         self.custom_bg_path = None
+        self.finished_count = 0
 
         # --- Performance Optimization ---
-        # เก็บ Session ของ rembg ไว้ใช้ซ้ำ (ไม่ต้องโหลดใหม่ทุกรอบ)
-        self.rembg_session = None
+        # rembg รันใน Worker Process แยก (segmentation_workers) UI ไม่ค้างตอนตัดพื้นหลัง
+        self.rembg_ready_tier = None
+        self.pipeline = None
+
+        # Preview ในเครื่อง: Cut-out ของไฟล์แรก + ฉากหลังขนาดเล็ก (ไม่เรียก API)
+        self.preview_product = None
+        self.preview_bg = None
+        self.preview_ratio = 1.0
 
         # --- 1. Templates ---
         self.templates = load_templates()
@@ -55,6 +91,23 @@ class VirtualStudioTab(ft.Column):
             on_click=lambda _: self.file_picker.pick_files(allow_multiple=True),
         )
         self.preview_row = ft.Row(scroll=ft.ScrollMode.AUTO, height=80)
+        self.segmentation_dropdown = ft.Dropdown(
+            label="โมเดลตัดพื้นหลัง (เร็ว / คุณภาพ)",
+            options=[
+                ft.dropdown.Option(key=tier, text=info["name"])
+                for tier, info in SEGMENTATION_TIERS.items()
+            ],
+            value=DEFAULT_SEGMENTATION_TIER,
+            on_change=self.on_tier_change,
+            text_size=12,
+            border_color=AppStyle.BORDER_DIM,
+        )
+        # โหมดเร็ว: ตัดพื้นหลังที่ขนาด Input ของโมเดล แล้วขยาย Mask ด้วย Guided Filter
+        self.fast_matting_switch = ft.Switch(
+            label="ตัดพื้นหลังแบบเร็ว (Low-res + Guided Upsample)",
+            value=True,
+            active_color=AppStyle.BTN_PRIMARY,
+        )
 
         # --- 3. Composition ---
         self.scale_slider = ft.Slider(
@@ -64,6 +117,7 @@ class VirtualStudioTab(ft.Column):
             divisions=7,
             label="ขนาดสินค้า: {value}",
             active_color=AppStyle.BTN_PRIMARY,
+            on_change=self.render_preview,
         )
         self.pos_dropdown = ft.Dropdown(
             label="ตำแหน่งจัดวาง",
@@ -74,6 +128,7 @@ class VirtualStudioTab(ft.Column):
                 ft.dropdown.Option("bottom_right", "ขวาล่าง (Right)"),
             ],
             value="center",
+            on_change=self.render_preview,
             text_size=12,
             border_color=AppStyle.BORDER_DIM,
             expand=True,
@@ -98,6 +153,13 @@ class VirtualStudioTab(ft.Column):
             min_lines=2,
             border_color=AppStyle.BORDER_DIM,
         )
+        # สร้างฉากจาก Prompt ครั้งเดียว (Cache ตาม prompt/model/ขนาด) แล้ววางสินค้าเอง
+        self.reuse_bg_switch = ft.Switch(
+            label="สร้างฉากครั้งเดียว ใช้กับทุกสินค้า (ไม่ Edit ทีละรูป)",
+            value=False,
+            active_color=AppStyle.BTN_PRIMARY,
+            on_change=self.on_reuse_bg_change,
+        )
 
         self.bg_upload_btn = ft.ElevatedButton(
             "เลือกรูปพื้นหลัง (Background)",
@@ -126,6 +188,15 @@ class VirtualStudioTab(ft.Column):
             text_size=12,
             border_color=AppStyle.BORDER_DIM,
         )
+        # จำนวนแบบต่อสินค้า (Imagen ได้ทุกแบบใน Request เดียว)
+        self.variants_dropdown = ft.Dropdown(
+            label="จำนวนแบบ / สินค้า",
+            options=[ft.dropdown.Option(str(n)) for n in (1, 2, 3, 4)],
+            value="1",
+            width=130,
+            text_size=12,
+            border_color=AppStyle.BORDER_DIM,
+        )
 
         # --- 6. Generate Action ---
         self.generate_btn = ft.ElevatedButton(
@@ -134,9 +205,15 @@ class VirtualStudioTab(ft.Column):
             style=ft.ButtonStyle(
                 bgcolor=AppStyle.BTN_PRIMARY, color=AppStyle.BTN_ON_PRIMARY, padding=20
             ),
-            on_click=self.on_click_generate,
+            on_click=self.open_confirm_render,
             width=300,
         )
+        self.cancel_btn = ft.TextButton(
+            "Stop",
+            icon=ft.Icons.STOP_CIRCLE_OUTLINED,
+            on_click=self.on_click_cancel,
+            visible=False,
+        )
 
         self.output_grid = ft.GridView(
             runs_count=2,
@@ -151,6 +228,21 @@ class VirtualStudioTab(ft.Column):
         )
         self.progress_bar = ft.ProgressBar(visible=False, color=AppStyle.LOADING)
 
+        # --- 7. Local Preview ---
+        self.studio_preview = ft.Image(
+            src_base64="",
+            width=PREVIEW_SIZE,
+            height=PREVIEW_SIZE,
+            fit=ft.ImageFit.CONTAIN,
+            visible=False,
+            border_radius=8,
+        )
+        self.preview_hint = ft.Text(
+            "อัปโหลดสินค้าเพื่อดู Preview (ปรับขนาด/ตำแหน่งได้ทันที ไม่เสีย API)",
+            size=12,
+            color="onSurfaceVariant",
+        )
+
         # --- Layout ---
         self.controls = [
             ft.Container(height=10),
@@ -169,6 +261,8 @@ class VirtualStudioTab(ft.Column):
                                 ft.Text("Step 1: Product", weight="bold"),
                                 self.upload_btn,
                                 self.preview_row,
+                                self.segmentation_dropdown,
+                                self.fast_matting_switch,
                                 ft.Divider(),
                                 ft.Text("Step 2: Composition", weight="bold"),
                                 self.scale_slider,
@@ -181,16 +275,21 @@ class VirtualStudioTab(ft.Column):
                                 ft.Row(
                                     [self.template_dropdown, self.btn_save_template]
                                 ),
+                                self.reuse_bg_switch,
                                 self.bg_upload_btn,
                                 self.bg_preview,
                                 ft.Divider(),
                                 ft.Text("Step 4: AI Settings", weight="bold"),
-                                self.model_dropdown,
+                                ft.Row([self.model_dropdown, self.variants_dropdown]),
                                 ft.Container(height=20),
                                 ft.Container(
                                     content=self.generate_btn,
                                     alignment=ft.alignment.center,
                                 ),
+                                ft.Container(
+                                    content=self.cancel_btn,
+                                    alignment=ft.alignment.center,
+                                ),
                                 ft.Container(height=10),
                                 self.progress_bar,
                                 ft.Container(
@@ -207,6 +306,10 @@ class VirtualStudioTab(ft.Column):
                         padding=20,
                         content=ft.Column(
                             [
+                                ft.Text("Preview (Local)", size=20, weight="bold"),
+                                self.preview_hint,
+                                self.studio_preview,
+                                ft.Divider(),
                                 ft.Text("Studio Results", size=20, weight="bold"),
                                 self.output_grid,
                             ]
@@ -230,6 +333,18 @@ class VirtualStudioTab(ft.Column):
                 ft.TextButton("Save", on_click=self.save_current_template),
             ],
         )
+        self.confirm_render_text = ft.Text()
+        self.confirm_render_dialog = ft.AlertDialog(
+            title=ft.Text("Render with AI?"),
+            content=self.confirm_render_text,
+            actions=[
+                ft.TextButton(
+                    "Cancel",
+                    on_click=lambda e: self.page.close(self.confirm_render_dialog),
+                ),
+                ft.TextButton("Render", on_click=self.on_confirm_render),
+            ],
+        )
 
     def did_mount(self):
         self.page.overlay.extend([self.file_picker, self.bg_file_picker])
@@ -239,15 +354,86 @@ class VirtualStudioTab(ft.Column):
         self.page.run_task(self.init_rembg)
 
     async def init_rembg(self):
-        """โหลดโมเดลตัดพื้นหลังเตรียมไว้"""
-        if self.rembg_session is None:
+        """โหลดโมเดลตัดพื้นหลังของ Tier ที่เลือกเตรียมไว้"""
+        tier = self.segmentation_dropdown.value
+        if self.rembg_ready_tier != tier:
             self.status_text.value = "Initializing AI Models..."
             self.update()
-            # โหลดโมเดล u2net (มาตรฐาน)
-            self.rembg_session = await asyncio.to_thread(new_session, "u2net")
+            try:
+                await asyncio.to_thread(get_segmentation_workers().warm_up, tier)
+            except Exception as e:
+                self.status_text.value = f"Model load failed: {e}"
+                self.update()
+                return
+            self.rembg_ready_tier = tier
             self.status_text.value = "Ready"
             self.update()
 
+    def on_tier_change(self, e):
+        self.page.run_task(self.init_rembg)
+        self.page.run_thread(self.prepare_preview)
+
+    # --- Local Preview ---
+    def prepare_preview(self):
+        """
+        เตรียม Cut-out ของไฟล์แรก (ใช้ Cache Mask เดียวกับตอน Render)
+        และฉากหลังขนาดเล็ก แล้ววาด Preview (รันใน Thread)
+        """
+        if not self.selected_files:
+            return
+        try:
+            with open(self.selected_files[0], "rb") as f:
+                input_bytes = f.read()
+            background, ratio = load_preview_background(self.current_background())
+            product = self.cutout_fast(
+                input_bytes, background.size, 1.0, self.segmentation_dropdown.value
+            )
+        except Exception as e:
+            print(f"Error preparing studio preview: {e}")
+            return
+        self.preview_product = product
+        self.preview_bg = background
+        self.preview_ratio = ratio
+        self.render_preview()
+
+    def current_background(self):
+        """ฉากหลังขนาดจริงที่มีอยู่แล้วในเครื่อง (None = ยังไม่มี / ให้ AI สร้าง)"""
+        cache = get_background_cache()
+        if self.bg_tabs.selected_index == 1:
+            if self.custom_bg_path:
+                return cache.load_custom(self.custom_bg_path)
+            return None
+        if self.reuse_bg_switch.value and self.prompt_field.value:
+            return cache.get_generated(
+                self.prompt_field.value, background_model_for(self.model_dropdown.value)
+            )
+        return None
+
+    def reuse_background(self):
+        return self.bg_tabs.selected_index == 0 and self.reuse_bg_switch.value
+
+    def render_preview(self, e=None):
+        """วางสินค้าตามขนาด/ตำแหน่งปัจจุบันบนภาพเล็ก (ไม่กี่ ms -> ตาม Slider ทัน)"""
+        product, background = self.preview_product, self.preview_bg
+        if product is None or background is None:
+            return
+        composite, _ = compose_product(
+            product,
+            background,
+            self.scale_slider.value,
+            self.pos_dropdown.value,
+            margin=round(EDGE_MARGIN * self.preview_ratio),
+        )
+        self.studio_preview.src_base64 = base64.b64encode(
+            encode_png(composite, compress_level=1)
+        ).decode()
+        self.studio_preview.visible = True
+        if self.preview_hint.visible:
+            self.preview_hint.visible = False
+            self.update()
+        else:
+            self.studio_preview.update()
+
     # --- Handlers (ส่วนเดิม) ---
     def on_files_picked(self, e):
         if e.files:
@@ -264,6 +450,7 @@ class VirtualStudioTab(ft.Column):
                     )
                 )
             self.update()
+            self.page.run_thread(self.prepare_preview)
 
     def on_bg_picked(self, e):
         if e.files:
@@ -271,15 +458,25 @@ class VirtualStudioTab(ft.Column):
             self.bg_preview.src = self.custom_bg_path
             self.bg_preview.visible = True
             self.update()
+            self.page.run_thread(self.prepare_preview)
 
     def on_tab_change(self, e):
         is_ai_mode = self.bg_tabs.selected_index == 0
         self.prompt_field.visible = is_ai_mode
         self.template_dropdown.visible = is_ai_mode
         self.btn_save_template.visible = is_ai_mode
+        self.reuse_bg_switch.visible = is_ai_mode
+        # ฉากเดียวใช้ทุกสินค้า -> ได้ผลแบบเดียว (วางสินค้าในเครื่อง ไม่เรียก AI Edit)
+        self.variants_dropdown.disabled = self.reuse_background()
         self.bg_upload_btn.visible = not is_ai_mode
         self.bg_preview.visible = (not is_ai_mode) and (self.custom_bg_path is not None)
         self.update()
+        self.page.run_thread(self.prepare_preview)
+
+    def on_reuse_bg_change(self, e):
+        self.variants_dropdown.disabled = self.reuse_background()
+        self.update()
+        self.page.run_thread(self.prepare_preview)
 
     def on_template_change(self, e):
         selected = self.template_dropdown.value
@@ -307,6 +504,32 @@ class VirtualStudioTab(ft.Column):
             self.update()
 
     # --- MAIN LOGIC (Optimized) ---
+    def open_confirm_render(self, e):
+        """ยืนยันก่อนเรียก AI (1 ไฟล์ = 1 API Call) ปรับตำแหน่งดูจาก Preview ได้ฟรี"""
+        if not self.selected_files:
+            self.toast.show("กรุณาเลือกรูปสินค้า", is_error=True)
+            return
+        count = len(self.selected_files)
+        model = self.model_dropdown.value
+        if self.reuse_background():
+            # ฉากเดียวใช้ทุกสินค้า: เรียก API แค่ตอนยังไม่มีฉากใน Cache
+            model = background_model_for(model)
+            calls = "at most 1 API call (background is generated once)"
+        elif self.model_dropdown.value.startswith("imagen"):
+            calls = f"{count} API call(s)"
+        else:
+            # Gemini Image: 1 Request ต่อ 1 แบบ
+            calls = f"{count * int(self.variants_dropdown.value)} API call(s)"
+        self.confirm_render_text.value = (
+            f"Render {count} image(s) with {model}?\n"
+            f"This will use {calls}."
+        )
+        self.page.open(self.confirm_render_dialog)
+
+    def on_confirm_render(self, e):
+        self.page.close(self.confirm_render_dialog)
+        self.page.run_task(self.on_click_generate, e)
+
     async def on_click_generate(self, e):
         if not self.selected_files:
             self.toast.show("กรุณาเลือกรูปสินค้า", is_error=True)
@@ -317,12 +540,13 @@ class VirtualStudioTab(ft.Column):
             return
 
         self.generate_btn.disabled = True
+        self.cancel_btn.visible = True
         self.progress_bar.visible = True
         self.output_grid.controls.clear()
         self.gemini_image.set_api_key(keys.get("gemini_image_key"))
 
         # รอ session ถ้ายังไม่พร้อม
-        if self.rembg_session is None:
+        if self.rembg_ready_tier != self.segmentation_dropdown.value:
             self.status_text.value = "Loading RemBG Model (First run only)..."
             self.update()
             await self.init_rembg()
@@ -331,144 +555,214 @@ class VirtualStudioTab(ft.Column):
         if use_custom_bg and not self.custom_bg_path:
             self.toast.show("กรุณาเลือกรูปพื้นหลัง", is_error=True)
             self.generate_btn.disabled = False
+            self.cancel_btn.visible = False
             self.progress_bar.visible = False
             self.update()
             return
 
-        total = len(self.selected_files)
-
-        for i, file_path in enumerate(self.selected_files):
-            self.status_text.value = f"Processing {i+1}/{total}..."
+        final_prompt = (
+            self.prompt_field.value
+            if not use_custom_bg
+            else "blending object into background, realistic lighting, shadows, high quality"
+        )
+        edit_model = self.model_dropdown.value
+        variants = int(self.variants_dropdown.value)
+        reuse_bg = not use_custom_bg and self.reuse_bg_switch.value
+        if reuse_bg:
+            variants = 1  # วางสินค้าบนฉากเดิมในเครื่อง -> ได้ผลลัพธ์แบบเดียว
+
+        # ฉากหลังเตรียมครั้งเดียวต่อ Batch (ทุกสินค้าใช้ Object เดียวกัน)
+        cache = get_background_cache()
+        if use_custom_bg:
+            background = await asyncio.to_thread(
+                cache.load_custom, self.custom_bg_path
+            )
+        elif reuse_bg:
+            self.status_text.value = "Preparing background..."
             self.update()
+            # Imagen Edit สร้างรูปจาก Prompt ไม่ได้ -> สร้างฉากด้วยโมเดล Generate
+            background, error = await cache.get_or_generate(
+                final_prompt,
+                background_model_for(edit_model),
+                self.gemini_image.generate_image,
+            )
+            if background is None:
+                self.toast.show(f"Background failed: {error}", is_error=True)
+                self.status_text.value = "Ready"
+                self.generate_btn.disabled = False
+                self.cancel_btn.visible = False
+                self.progress_bar.visible = False
+                self.update()
+                return
+            self.page.run_thread(self.prepare_preview)
+        else:
+            background = load_background(None)
 
-            try:
-                base_bytes, mask_bytes = await asyncio.to_thread(
-                    self.process_single_product,
-                    file_path,
-                    self.scale_slider.value,
-                    self.pos_dropdown.value,
-                    use_custom_bg,
-                    self.custom_bg_path,
-                )
+        total = len(self.selected_files)
+        self.finished_count = 0
+        self.status_text.value = f"Processing 0/{total}..."
+        self.update()
 
-                if mask_bytes is None:
-                    raise Exception(base_bytes)
+        async def edit_fn(base_image, mask_image):
+            if reuse_bg:
+                # ฉากสร้างไว้แล้ว -> ภาพที่วางสินค้าแล้วคือผลลัพธ์เลย ไม่ต้องเรียก API
+                return await asyncio.to_thread(encode_png, base_image)
+            return await self.gemini_image.edit_image(
+                base_image=base_image,
+                mask_image=mask_image,
+                prompt=final_prompt,
+                model=edit_model,
+                number_of_images=variants,
+            )
+
+        # ตัดพื้นหลัง/จัดวาง (หลาย Core) กับเรียก AI Edit (หลาย Request) ทำงานซ้อนกัน
+        self.pipeline = StudioPipeline(
+            prepare_fn=functools.partial(
+                self.process_single_product,
+                scale=self.scale_slider.value,
+                position=self.pos_dropdown.value,
+                background=background,
+                tier=self.segmentation_dropdown.value,
+                fast_matting=self.fast_matting_switch.value,
+            ),
+            edit_fn=edit_fn,
+            on_result=lambda result: self.on_studio_result(result, total),
+        )
+        await self.pipeline.run(list(self.selected_files))
 
-                final_prompt = (
-                    self.prompt_field.value
-                    if not use_custom_bg
-                    else "blending object into background, realistic lighting, shadows, high quality"
-                )
+        self.status_text.value = "Stopped" if self.pipeline.cancelled else "Done!"
+        self.pipeline = None
+        self.generate_btn.disabled = False
+        self.cancel_btn.visible = False
+        self.progress_bar.visible = False
+        self.update()
 
-                result_bytes = await self.gemini_image.edit_image(
-                    base_image_bytes=base_bytes,
-                    mask_bytes=mask_bytes,
-                    prompt=final_prompt,
-                    model=self.model_dropdown.value,
-                )
+    def on_click_cancel(self, e):
+        """หยุด Batch: ไม่รับไฟล์ใหม่ + Kill งานตัดพื้นหลังที่กำลังรันอยู่"""
+        if self.pipeline:
+            self.pipeline.cancel()
+            get_segmentation_workers().cancel()
+            self.status_text.value = "Stopping..."
+            self.update()
 
-                if isinstance(result_bytes, str):
-                    self.toast.show(f"Failed: {result_bytes}", is_error=True)
-                else:
-                    import base64
-
-                    b64_img = base64.b64encode(result_bytes).decode("utf-8")
-                    self.output_grid.controls.append(
-                        ft.Container(
-                            content=ft.Image(
-                                src_base64=b64_img,
-                                fit=ft.ImageFit.CONTAIN,
-                                border_radius=8,
-                            ),
-                            border=ft.border.all(1, AppStyle.BORDER_DIM),
+    async def on_studio_result(self, result, total):
+        """แสดงผลทันทีที่แต่ละรูปเสร็จ (ไม่ต้องรอทั้ง Batch)"""
+        self.finished_count += 1
+        self.status_text.value = f"Processing {self.finished_count}/{total}..."
+
+        if result.error:
+            print(f"Studio error ({result.file_path}): {result.error}")
+            self.toast.show(f"Failed: {result.error}", is_error=True)
+        else:
+            # เก็บผลลัพธ์ (ทุกแบบ) ลง Disk แล้วให้ ft.Image โหลดผ่าน URL
+            for variant, image_bytes in enumerate(result.variants):
+                output_path = await asyncio.to_thread(
+                    self.save_output_image, image_bytes, result.index, variant
+                )
+                self.output_grid.controls.append(
+                    ft.Container(
+                        content=ft.Image(
+                            src=asset_url(output_path),
+                            fit=ft.ImageFit.CONTAIN,
                             border_radius=8,
-                            padding=5,
-                            bgcolor="surfaceVariant",
-                        )
+                        ),
+                        border=ft.border.all(1, AppStyle.BORDER_DIM),
+                        border_radius=8,
+                        padding=5,
+                        bgcolor="surfaceVariant",
                     )
-                    self.update()
-
-            except Exception as err:
-                print(err)
-
-        self.generate_btn.disabled = False
-        self.progress_bar.visible = False
-        self.status_text.value = "Done!"
+                )
         self.update()
 
+    def save_output_image(self, image_bytes, index, variant=0):
+        os.makedirs(STUDIO_OUTPUT_DIR, exist_ok=True)
+        filename = f"{int(time.time() * 1000)}_{index + 1}_{variant + 1}.png"
+        output_path = os.path.join(STUDIO_OUTPUT_DIR, filename)
+        with open(output_path, "wb") as f:
+            f.write(image_bytes)
+        return output_path
+
+    def cutout_full(self, input_bytes, tier):
+        """ตัดพื้นหลังด้วย rembg ที่ความละเอียด (ไม่เกิน) MAX_INPUT_SIDE -> PIL RGBA"""
+        # 1. เคยตัดพื้นหลังรูปนี้แล้ว (โมเดล/ขนาดเดียวกัน) -> ใช้ผลเดิม ข้าม rembg
+        cache = get_segmentation_cache()
+        cache_key = cache.key_for(input_bytes, model_for_tier(tier), MAX_INPUT_SIDE)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return Image.open(io.BytesIO(cached))
+
+        # 2. OPTIMIZATION: Load & Resize Input Image ก่อนส่งเข้า Rembg
+        # ลดขนาดรูปลงก่อนตัดพื้นหลัง ช่วยลดภาระ CPU ได้มหาศาล (แก้ปัญหาจอค้าง)
+        original_pil = Image.open(io.BytesIO(input_bytes))
+
+        # ถ้าภาพใหญ่เกิน 1500px ให้ย่อลง (คุณภาพยังดีอยู่สำหรับการ Gen AI ต่อ)
+        if original_pil.width > MAX_INPUT_SIDE or original_pil.height > MAX_INPUT_SIDE:
+            original_pil.draft("RGB", (MAX_INPUT_SIDE, MAX_INPUT_SIDE))
+            original_pil.thumbnail((MAX_INPUT_SIDE, MAX_INPUT_SIDE))
+
+        # Remove Background: ส่ง Pixel ให้ Worker Process ผ่าน Shared Memory
+        # (ไม่ต้อง encode เป็น PNG / หลายรูปตัดพร้อมกันได้ตามจำนวน Worker)
+        original_pil = original_pil.convert("RGB")
+        mask = get_segmentation_workers().predict_mask(original_pil, tier)
+        subject = apply_alpha(original_pil, mask)
+        # Cache เป็นไฟล์ใน Disk ของเราเอง -> บีบอัดน้อย เน้นเร็ว
+        cache.put(cache_key, encode_png(subject, compress_level=1))
+        return subject
+
+    def cutout_fast(self, input_bytes, canvas_size, scale, tier):
+        """
+        โหมดเร็ว: รันโมเดลที่ขนาด Input จริงของโมเดล (เช่น 320px) แล้วขยาย Mask
+        ด้วย Guided Filter ไปเท่าขนาดที่จะวางบน Canvas และใส่ให้ Pixel ต้นฉบับ
+        (Cache เก็บแค่ Mask ขนาดเล็ก -> เปลี่ยนขนาด/ตำแหน่งสินค้าก็ใช้ซ้ำได้)
+        """
+        # ขนาดที่สินค้าจะถูกวางจริง (compose_product จะไม่ต้องย่อซ้ำ)
+        target = (int(canvas_size[0] * scale), int(canvas_size[1] * scale))
+        original_pil = Image.open(io.BytesIO(input_bytes))
+        original_pil.draft("RGB", target)  # JPEG: Decode ที่ขนาดเล็กลงได้เลย
+        working = original_pil.convert("RGB")
+        working.thumbnail(target, Image.Resampling.LANCZOS)
+
+        cache = get_segmentation_cache()
+        input_size = input_size_for_tier(tier)
+        cache_key = cache.key_for(
+            input_bytes, f"{model_for_tier(tier)}-mask", input_size
+        )
+        mask_png = cache.get(cache_key)
+        if mask_png is not None:
+            low_mask = Image.open(io.BytesIO(mask_png))
+        else:
+            model_input = working.resize(
+                (input_size, input_size), Image.Resampling.LANCZOS
+            )
+            low_mask = get_segmentation_workers().predict_mask(model_input, tier)
+            cache.put(cache_key, encode_png(low_mask, compress_level=1))
+
+        return apply_alpha(working, guided_upsample(low_mask, working))
+
     def process_single_product(
-        self, file_path, scale, position, use_custom_bg, bg_path
+        self,
+        file_path,
+        scale,
+        position,
+        background,
+        tier=DEFAULT_SEGMENTATION_TIER,
+        fast_matting=False,
     ):
         try:
-            # 1. OPTIMIZATION: Load & Resize Input Image ก่อนส่งเข้า Rembg
-            # การลดขนาดรูปลงก่อนตัดพื้นหลัง จะช่วยลดภาระ CPU ได้มหาศาล (แก้ปัญหาจอค้าง)
-
             with open(file_path, "rb") as f:
                 input_bytes = f.read()
 
-            # แปลงเป็น PIL เพื่อย่อขนาด
-            original_pil = Image.open(io.BytesIO(input_bytes))
-
-            # ถ้าภาพใหญ่เกิน 1500px ให้ย่อลง (คุณภาพยังดีอยู่สำหรับการ Gen AI ต่อ)
-            if original_pil.width > 1500 or original_pil.height > 1500:
-                original_pil.thumbnail((1500, 1500))
-
-            # แปลงกลับเป็น bytes เพื่อส่ง rembg
-            buffered = io.BytesIO()
-            original_pil.save(buffered, format="PNG")
-            optimized_input_bytes = buffered.getvalue()
-
-            # 2. Remove Background (ใช้ Session ที่เตรียมไว้)
-            subject_no_bg = remove(optimized_input_bytes, session=self.rembg_session)
-
-            # (ส่วน Logic การจัดวาง Composition เหมือนเดิม)
-            img_pil = Image.open(io.BytesIO(subject_no_bg)).convert("RGBA")
-
-            CANVAS_SIZE = (1024, 1024)
-            bg_img = None
-            if use_custom_bg and bg_path:
-                bg_img = Image.open(bg_path).convert("RGB")
-                bg_img.thumbnail((1024, 1024))
-                CANVAS_SIZE = bg_img.size
+            if fast_matting:
+                img_pil = self.cutout_fast(input_bytes, background.size, scale, tier)
             else:
-                bg_img = Image.new("RGB", CANVAS_SIZE, (255, 255, 255))
-
-            target_w = int(CANVAS_SIZE[0] * scale)
-            target_h = int(CANVAS_SIZE[1] * scale)
-            img_pil.thumbnail((target_w, target_h), Image.Resampling.LANCZOS)
-
-            pw, ph = img_pil.size
-            cw, ch = CANVAS_SIZE
-            x, y = (cw - pw) // 2, (ch - ph) // 2
-
-            if position == "bottom":
-                y = ch - ph - 50
-            elif position == "bottom_left":
-                x = 50
-                y = ch - ph - 50
-            elif position == "bottom_right":
-                x = cw - pw - 50
-                y = ch - ph - 50
-
-            final_comp = bg_img.copy()
-            final_comp.paste(img_pil, (x, y), img_pil)
-
-            mask = Image.new("L", CANVAS_SIZE, 255)
-            product_mask = Image.new("L", img_pil.size, 0)
-            for px in range(img_pil.width):
-                for py in range(img_pil.height):
-                    if img_pil.getpixel((px, py))[3] > 0:
-                        product_mask.putpixel((px, py), 0)
-                    else:
-                        product_mask.putpixel((px, py), 255)
-            mask.paste(product_mask, (x, y), img_pil)
-
-            base_io = io.BytesIO()
-            final_comp.save(base_io, format="PNG")
-            mask_io = io.BytesIO()
-            mask.save(mask_io, format="PNG")
-
-            return base_io.getvalue(), mask_io.getvalue()
+                img_pil = self.cutout_full(input_bytes, tier)
+
+            # 3. Composition + Mask (Vectorized ทั้งภาพ ไม่วน Loop ทีละ Pixel)
+            # ส่งต่อเป็น PIL -> encode PNG ครั้งเดียวตอนส่งขึ้น API
+            # (background ใช้ร่วมกันทั้ง Batch: compose_product ทำสำเนาก่อนวาง)
+            return compose_product(img_pil, background, scale, position)
 
+        except SegmentationCancelled:
+            return "Cancelled", None
         except Exception as e:
             return str(e), None